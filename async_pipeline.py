@@ -0,0 +1,287 @@
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from decimal import Decimal
+from typing import Iterable
+
+import pika
+from pika.adapters.asyncio_connection import AsyncioConnection
+from psycopg_pool import AsyncConnectionPool, ConnectionPool
+from pydantic import BaseModel
+
+from balance_waiter import wait_for_balances_async
+from config import Settings, get_settings
+from database import bulk_create_or_update_subscribers_with_related_data
+from db_pool import close_pools, get_brt_pool, open_async_brt_pool
+from msisdn_allocator import MsisdnAllocator
+from rabbitmq_sender import (
+    DEFAULT_CONFIRM_TIMEOUT_S,
+    DEFAULT_MAX_IN_FLIGHT,
+    TEST_CDR_EXCHANGE,
+    TEST_CDR_ROUTING_KEY,
+)
+from scenarios import ALL_SCENARIOS, E2EScenario
+from statement_registry import statement_stats
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCENARIO_CONCURRENCY = 8
+
+
+class AsyncRabbitMQPublisher:
+    """
+    Publisher на asyncio-адаптере pika с publisher confirms. Каждое сообщение получает future,
+    который разрешается ack/nack брокера, так что ожидание подтверждений не блокирует цикл событий.
+    """
+
+    def __init__(self, settings: Settings | None = None, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT):
+        self._settings = settings or get_settings()
+        self._max_in_flight = max_in_flight
+        self._connection: AsyncioConnection | None = None
+        self._channel = None
+        self._in_flight: asyncio.Semaphore | None = None
+        self._pending: dict[int, asyncio.Future] = {}
+        self._returned: set[int] = set()
+        self._next_delivery_tag = 1
+        self._closed_future: asyncio.Future | None = None
+        self.published_count = 0
+
+    async def connect(self):
+        loop = asyncio.get_running_loop()
+        opened = loop.create_future()
+        self._closed_future = loop.create_future()
+
+        def on_open_error(_connection, error):
+            if not opened.done():
+                opened.set_exception(pika.exceptions.AMQPConnectionError(error))
+
+        def on_close(_connection, reason):
+            self._fail_pending(reason)
+            if not opened.done():
+                opened.set_exception(pika.exceptions.AMQPConnectionError(reason))
+            if not self._closed_future.done():
+                self._closed_future.set_result(reason)
+
+        logger.info(
+            f"Асинхронное подключение к RabbitMQ: host={self._settings.rabbitmq_host}, "
+            f"port={self._settings.rabbitmq_port}"
+        )
+        self._connection = AsyncioConnection(
+            pika.ConnectionParameters(
+                host=self._settings.rabbitmq_host,
+                port=self._settings.rabbitmq_port,
+                credentials=pika.PlainCredentials(self._settings.rabbitmq_user, self._settings.rabbitmq_pass),
+            ),
+            on_open_callback=lambda connection: opened.set_result(connection),
+            on_open_error_callback=on_open_error,
+            on_close_callback=on_close,
+            custom_ioloop=loop,
+        )
+        await opened
+
+        channel_opened = loop.create_future()
+        self._connection.channel(on_open_callback=channel_opened.set_result)
+        channel = await channel_opened
+        channel.add_on_close_callback(lambda _channel, reason: self._fail_pending(reason))
+        channel.add_on_return_callback(self._on_return)
+
+        selected = loop.create_future()
+        channel.confirm_delivery(ack_nack_callback=self._on_confirm, callback=selected.set_result)
+        await selected
+        self._channel = channel
+        self._in_flight = asyncio.Semaphore(self._max_in_flight)
+        logger.info("Асинхронный канал RabbitMQ в режиме publisher confirms создан.")
+
+    def _on_confirm(self, frame):
+        method = frame.method
+        acked = isinstance(method, pika.spec.Basic.Ack)
+        if method.multiple:
+            tags = [tag for tag in self._pending if tag <= method.delivery_tag]
+        else:
+            tags = [method.delivery_tag]
+        for tag in tags:
+            future = self._pending.pop(tag, None)
+            if future is not None and not future.done():
+                # basic.return приходит раньше ack того же сообщения
+                future.set_result(acked and tag not in self._returned)
+            self._returned.discard(tag)
+
+    def _on_return(self, _channel, method, properties, _body):
+        logger.warning(
+            f"Сообщение {properties.message_id} возвращено брокером: {method.reply_code} {method.reply_text}"
+        )
+        self._returned.add(int(properties.message_id))
+
+    def _fail_pending(self, reason):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(pika.exceptions.AMQPError(reason))
+        self._pending.clear()
+
+    async def publish(
+            self,
+            body: bytes,
+            exchange: str = TEST_CDR_EXCHANGE,
+            routing_key: str = TEST_CDR_ROUTING_KEY,
+            confirm_timeout_s: float = DEFAULT_CONFIRM_TIMEOUT_S,
+    ) -> bool:
+        if self._channel is None or not self._channel.is_open:
+            raise RuntimeError("Асинхронный publisher RabbitMQ не подключен.")
+        async with self._in_flight:
+            tag = self._next_delivery_tag
+            self._next_delivery_tag += 1
+            future = self._pending[tag] = asyncio.get_running_loop().create_future()
+            self._channel.basic_publish(
+                exchange=exchange,
+                routing_key=routing_key,
+                body=body,
+                properties=pika.BasicProperties(
+                    content_type='application/json',
+                    delivery_mode=pika.DeliveryMode.Persistent,
+                    message_id=str(tag),
+                ),
+                mandatory=True,
+            )
+            self.published_count += 1
+            try:
+                return await asyncio.wait_for(future, confirm_timeout_s)
+            except (pika.exceptions.AMQPError, asyncio.TimeoutError) as e:
+                logger.error(f"Нет подтверждения для сообщения {tag}: {e!r}")
+                self._pending.pop(tag, None)
+                return False
+
+    async def publish_many(self, bodies: Iterable[bytes]) -> list[bool]:
+        return list(await asyncio.gather(*(self.publish(body) for body in bodies)))
+
+    async def close(self):
+        if self._connection is not None and not self._connection.is_closed:
+            self._connection.close()
+            await self._closed_future
+        self._connection = self._channel = None
+        logger.info("Асинхронный publisher RabbitMQ закрыт.")
+
+
+class ScenarioResult(BaseModel):
+    name: str
+    passed: bool
+    published: bool = False
+    elapsed_s: float = 0.0
+    wait_s: float | None = None
+    polls: int = 0
+    money_mismatches: dict[str, tuple[Decimal | None, Decimal]] = {}
+    quant_mismatches: dict[tuple[int, int], tuple[int | None, int]] = {}
+    error: str | None = None
+
+
+def _provision(pool: ConnectionPool, scenario: E2EScenario, msisdns: dict[str, str]) -> dict[str, int]:
+    # Провижининг переиспользует синхронную пакетную загрузку и выполняется в потоке
+    with pool.connection() as conn:
+        person_ids = bulk_create_or_update_subscribers_with_related_data(conn, scenario.subscriber_data(msisdns))
+    if len(person_ids) != len(msisdns):
+        raise RuntimeError(f"Не удалось подготовить абонентов сценария {scenario.name}")
+    return person_ids
+
+
+async def run_scenario_async(
+        scenario: E2EScenario,
+        allocator: MsisdnAllocator,
+        publisher: AsyncRabbitMQPublisher,
+        brt_pool: ConnectionPool,
+        async_pool: AsyncConnectionPool,
+) -> ScenarioResult:
+    started_at = time.monotonic()
+    result = ScenarioResult(name=scenario.name, passed=False)
+    try:
+        msisdns = dict(zip(scenario.aliases, allocator.allocate_many(len(scenario.aliases))))
+        person_ids = await asyncio.to_thread(_provision, brt_pool, scenario, msisdns)
+
+        body = json.dumps(scenario.cdr_list(msisdns), ensure_ascii=False).encode('utf-8')
+        result.published = await publisher.publish(body)
+        if not result.published:
+            result.error = "Ошибка отправки CDR в RabbitMQ"
+            return result
+
+        async with async_pool.connection() as conn:
+            wait = await wait_for_balances_async(
+                conn,
+                expected_money=scenario.expected_money_by_msisdn(msisdns),
+                expected_quant=scenario.expected_quant_by_key(msisdns, person_ids),
+                timeout_s=scenario.timeout_s,
+                stable_for_s=scenario.stable_for_s,
+            )
+        result.passed = wait.converged
+        result.wait_s = wait.elapsed_s
+        result.polls = wait.polls
+        result.money_mismatches = wait.money_mismatches
+        result.quant_mismatches = wait.quant_mismatches
+    except Exception as e:
+        logger.error(f"Сценарий {scenario.name} завершился с ошибкой: {e}", exc_info=True)
+        result.error = repr(e)
+    finally:
+        result.elapsed_s = time.monotonic() - started_at
+    return result
+
+
+async def run_scenarios_async(
+        scenarios: list[E2EScenario],
+        repeat: int = 1,
+        concurrency: int = DEFAULT_SCENARIO_CONCURRENCY,
+        allocator: MsisdnAllocator | None = None,
+) -> list[ScenarioResult]:
+    """
+    Выполняет сценарии перекрывающимися корутинами: пока одни ждут балансы, другие публикуют CDR.
+    Одновременно выполняется не больше concurrency сценариев.
+    """
+    allocator = allocator or MsisdnAllocator()
+    brt_pool = get_brt_pool()
+    publisher = AsyncRabbitMQPublisher()
+    await publisher.connect()
+    async_pool = await open_async_brt_pool(max_size=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(scenario: E2EScenario) -> ScenarioResult:
+        async with semaphore:
+            return await run_scenario_async(scenario, allocator, publisher, brt_pool, async_pool)
+
+    try:
+        return list(await asyncio.gather(*(bounded(scenario) for _ in range(repeat) for scenario in scenarios)))
+    finally:
+        await async_pool.close()
+        await publisher.close()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Параллельный прогон E2E-сценариев в одном цикле asyncio")
+    parser.add_argument("--scenarios", nargs="+", default=None,
+                        help="Имена сценариев (по умолчанию все), например E2E-CLASSIC-01")
+    parser.add_argument("--repeat", type=int, default=1, help="Сколько раз выполнить каждый сценарий")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_SCENARIO_CONCURRENCY)
+    parser.add_argument("--worker-index", type=int, default=None, help="Блок MSISDN (по умолчанию как у pytest)")
+    args = parser.parse_args(argv)
+
+    scenarios = [s for s in ALL_SCENARIOS if args.scenarios is None or s.name in args.scenarios]
+    started_at = time.monotonic()
+    try:
+        results = asyncio.run(run_scenarios_async(
+            scenarios, args.repeat, args.concurrency, MsisdnAllocator(args.worker_index)
+        ))
+    finally:
+        close_pools()
+    elapsed_s = time.monotonic() - started_at
+
+    print(json.dumps({
+        "elapsed_s": elapsed_s,
+        "passed": sum(result.passed for result in results),
+        "failed": sum(not result.passed for result in results),
+        "results": [result.model_dump(mode="json") for result in results],
+        "statements": statement_stats(),
+    }, ensure_ascii=False, indent=2))
+    return 0 if all(result.passed for result in results) else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
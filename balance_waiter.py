@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import time
+from decimal import Decimal
+
+import psycopg
+from pydantic import BaseModel
+
+from database import (
+    get_quant_service_balances, get_quant_service_balances_async,
+    get_sub_balances, get_sub_balances_async,
+)
+from phase_timing import PHASE_WAIT, count, timed
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WAIT_TIMEOUT_S = 15.0
+INITIAL_POLL_INTERVAL_S = 0.05
+MAX_POLL_INTERVAL_S = 1.0
+POLL_BACKOFF_FACTOR = 1.5
+
+
+class BalanceWaitResult(BaseModel):
+    converged: bool
+    elapsed_s: float
+    polls: int
+    # Последние наблюдаемые значения, не совпавшие с ожидаемыми: ключ -> (факт, ожидание)
+    money_mismatches: dict[str, tuple[Decimal | None, Decimal]] = {}
+    quant_mismatches: dict[tuple[int, int], tuple[int | None, int]] = {}
+
+
+def _diff_balances(
+        expected_money: dict[str, Decimal],
+        expected_quant: dict[tuple[int, int], int],
+        actual_money: dict | None,
+        actual_quant: dict | None,
+) -> tuple[dict, dict]:
+    if actual_money is None or actual_quant is None:
+        raise psycopg.OperationalError("Не удалось прочитать текущие балансы")
+
+    # money приводится к Decimal через str, чтобы сравнение не зависело от типа колонки
+    actual_money = {msisdn: Decimal(str(money)) for msisdn, money in actual_money.items() if money is not None}
+    money_mismatches = {
+        msisdn: (actual_money.get(msisdn), expected)
+        for msisdn, expected in expected_money.items()
+        if actual_money.get(msisdn) != expected
+    }
+    quant_mismatches = {
+        key: (actual_quant.get(key), expected)
+        for key, expected in expected_quant.items()
+        if actual_quant.get(key) != expected
+    }
+    return money_mismatches, quant_mismatches
+
+
+def _collect_mismatches(
+        conn: psycopg.Connection,
+        expected_money: dict[str, Decimal],
+        expected_quant: dict[tuple[int, int], int],
+) -> tuple[dict, dict]:
+    started_idle = conn.info.transaction_status == psycopg.pq.TransactionStatus.IDLE
+    try:
+        actual_money = get_sub_balances(conn, list(expected_money))
+        actual_quant = get_quant_service_balances(conn, list(expected_quant))
+    finally:
+        # Не держим открытую транзакцию между опросами, если её открыли мы
+        if started_idle and not conn.closed:
+            conn.rollback()
+    return _diff_balances(expected_money, expected_quant, actual_money, actual_quant)
+
+
+async def _collect_mismatches_async(
+        conn: psycopg.AsyncConnection,
+        expected_money: dict[str, Decimal],
+        expected_quant: dict[tuple[int, int], int],
+) -> tuple[dict, dict]:
+    started_idle = conn.info.transaction_status == psycopg.pq.TransactionStatus.IDLE
+    try:
+        actual_money = await get_sub_balances_async(conn, list(expected_money))
+        actual_quant = await get_quant_service_balances_async(conn, list(expected_quant))
+    finally:
+        if started_idle and not conn.closed:
+            await conn.rollback()
+    return _diff_balances(expected_money, expected_quant, actual_money, actual_quant)
+
+
+class _BalanceWait:
+    """
+    Состояние одного ожидания: дедлайн, окно стабильности и адаптивная пауза между опросами.
+    Общая часть для синхронного и асинхронного ожидания.
+    """
+
+    def __init__(
+            self,
+            expected_money: dict[str, int | float | Decimal] | None,
+            expected_quant: dict[tuple[int, int], int] | None,
+            timeout_s: float,
+            stable_for_s: float,
+    ):
+        self.expected_money = {msisdn: Decimal(str(value)) for msisdn, value in (expected_money or {}).items()}
+        self.expected_quant = dict(expected_quant or {})
+        self.timeout_s = timeout_s
+        self.stable_for_s = stable_for_s
+        self.started_at = time.monotonic()
+        self.deadline = self.started_at + timeout_s
+        self.interval = INITIAL_POLL_INTERVAL_S
+        self.converged_at: float | None = None
+        self.polls = 0
+
+    def failed(self, e: psycopg.Error) -> BalanceWaitResult:
+        logger.error(f"Ошибка psycopg при ожидании балансов: {e}", exc_info=True)
+        return BalanceWaitResult(converged=False, elapsed_s=time.monotonic() - self.started_at, polls=self.polls)
+
+    def observe(self, money_mismatches: dict, quant_mismatches: dict) -> BalanceWaitResult | None:
+        """
+        Учитывает результат очередного опроса. Возвращает итог, если ожидание закончено, иначе None.
+        """
+        now = time.monotonic()
+        if money_mismatches or quant_mismatches:
+            self.converged_at = None
+        else:
+            if self.converged_at is None:
+                self.converged_at = now
+                # После схождения опрашиваем часто, чтобы заметить повторное изменение
+                self.interval = INITIAL_POLL_INTERVAL_S
+            if now - self.converged_at >= self.stable_for_s:
+                elapsed = self.converged_at - self.started_at
+                logger.info(f"Балансы сошлись за {elapsed:.3f} с (опросов: {self.polls}).")
+                return BalanceWaitResult(converged=True, elapsed_s=elapsed, polls=self.polls)
+
+        if now >= self.deadline:
+            if self.converged_at is not None:
+                elapsed = self.converged_at - self.started_at
+                logger.info(f"Балансы сошлись за {elapsed:.3f} с, дедлайн достигнут до конца окна стабильности.")
+                return BalanceWaitResult(converged=True, elapsed_s=elapsed, polls=self.polls)
+            logger.warning(
+                f"Балансы не сошлись за {self.timeout_s} с (опросов: {self.polls}). "
+                f"Расхождения money: {money_mismatches}, quant_services: {quant_mismatches}"
+            )
+            return BalanceWaitResult(
+                converged=False,
+                elapsed_s=now - self.started_at,
+                polls=self.polls,
+                money_mismatches=money_mismatches,
+                quant_mismatches=quant_mismatches,
+            )
+        return None
+
+    def next_pause(self) -> float:
+        pause = min(self.interval, self.deadline - time.monotonic())
+        self.interval = min(self.interval * POLL_BACKOFF_FACTOR, MAX_POLL_INTERVAL_S)
+        return max(pause, 0.0)
+
+
+@timed(PHASE_WAIT)
+def wait_for_balances(
+        conn: psycopg.Connection,
+        expected_money: dict[str, int | float | Decimal] | None = None,
+        expected_quant: dict[tuple[int, int], int] | None = None,
+        timeout_s: float = DEFAULT_WAIT_TIMEOUT_S,
+        stable_for_s: float = 0.0,
+) -> BalanceWaitResult:
+    """
+    Ожидает, пока person.money (по msisdn) и quant_services.amount_left (по (p_id, s_type_id))
+    не достигнут ожидаемых значений. Опрос с адаптивной паузой и жестким дедлайном.
+    stable_for_s - сколько ожидаемое состояние должно удерживаться без изменений;
+    нужно для сценариев, где итоговый баланс совпадает с начальным.
+    """
+    wait = _BalanceWait(expected_money, expected_quant, timeout_s, stable_for_s)
+    while True:
+        wait.polls += 1
+        try:
+            mismatches = _collect_mismatches(conn, wait.expected_money, wait.expected_quant)
+        except psycopg.Error as e:
+            return wait.failed(e)
+        if (result := wait.observe(*mismatches)) is not None:
+            count("balance_wait.polls", result.polls)
+            return result
+        time.sleep(wait.next_pause())
+
+
+async def wait_for_balances_async(
+        conn: psycopg.AsyncConnection,
+        expected_money: dict[str, int | float | Decimal] | None = None,
+        expected_quant: dict[tuple[int, int], int] | None = None,
+        timeout_s: float = DEFAULT_WAIT_TIMEOUT_S,
+        stable_for_s: float = 0.0,
+) -> BalanceWaitResult:
+    """
+    То же, что wait_for_balances, но на AsyncConnection: пауза между опросами отдает цикл событий
+    другим сценариям.
+    """
+    wait = _BalanceWait(expected_money, expected_quant, timeout_s, stable_for_s)
+    while True:
+        wait.polls += 1
+        try:
+            mismatches = await _collect_mismatches_async(conn, wait.expected_money, wait.expected_quant)
+        except psycopg.Error as e:
+            return wait.failed(e)
+        if (result := wait.observe(*mismatches)) is not None:
+            return result
+        await asyncio.sleep(wait.next_pause())
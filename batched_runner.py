@@ -0,0 +1,129 @@
+import json
+import logging
+from decimal import Decimal
+
+import psycopg
+from pydantic import BaseModel
+
+from balance_waiter import BalanceWaitResult, wait_for_balances
+from database import bulk_create_or_update_subscribers_with_related_data, find_balance_mismatches
+from msisdn_allocator import MsisdnAllocator
+from phase_timing import PHASE_VERIFY, span
+from rabbitmq_sender import RabbitMQPublisher, get_publisher
+from scenarios import E2EScenario
+from subscriber_schema import BalanceMismatch
+
+logger = logging.getLogger(__name__)
+
+
+class ScenarioVerdict(BaseModel):
+    name: str
+    passed: bool
+    msisdns: dict[str, str]
+    # Псевдоним -> (факт, ожидание)
+    money_mismatches: dict[str, tuple[Decimal | None, Decimal]] = {}
+    quant_mismatches: dict[str, tuple[int | None, int]] = {}
+
+
+class BatchedRunResult(BaseModel):
+    published: bool
+    wait: BalanceWaitResult | None = None
+    verdicts: list[ScenarioVerdict] = []
+
+    @property
+    def passed(self) -> bool:
+        return self.published and bool(self.verdicts) and all(verdict.passed for verdict in self.verdicts)
+
+    @property
+    def failed(self) -> list[ScenarioVerdict]:
+        return [verdict for verdict in self.verdicts if not verdict.passed]
+
+
+def _verify_scenario(
+        scenario: E2EScenario,
+        msisdns: dict[str, str],
+        mismatches: dict[str, BalanceMismatch],
+) -> ScenarioVerdict:
+    money_mismatches = {}
+    quant_mismatches = {}
+    for alias, msisdn in msisdns.items():
+        mismatch = mismatches.get(msisdn)
+        if mismatch is None:
+            continue
+        expected_money = scenario.expected_money.get(alias)
+        if expected_money is not None and (
+                not mismatch.person_found or mismatch.actual_money != Decimal(expected_money)
+        ):
+            money_mismatches[alias] = (mismatch.actual_money, Decimal(expected_money))
+        if alias in scenario.expected_quant:
+            _, expected_amount_left = scenario.expected_quant[alias]
+            if mismatch.actual_amount_left != expected_amount_left:
+                quant_mismatches[alias] = (mismatch.actual_amount_left, expected_amount_left)
+    return ScenarioVerdict(
+        name=scenario.name,
+        passed=not money_mismatches and not quant_mismatches,
+        msisdns=msisdns,
+        money_mismatches=money_mismatches,
+        quant_mismatches=quant_mismatches,
+    )
+
+
+def run_batched_scenarios(
+        conn: psycopg.Connection,
+        scenarios: list[E2EScenario],
+        allocator: MsisdnAllocator,
+        publisher: RabbitMQPublisher | None = None,
+) -> BatchedRunResult:
+    """
+    Выполняет сценарии за один цикл тарификации: один пакетный провижининг всех абонентов,
+    один поток сообщений (по сообщению на сценарий), одно общее ожидание и затем проверка
+    каждого сценария по отдельности.
+    """
+    publisher = publisher or get_publisher()
+
+    bound = [
+        (scenario, dict(zip(scenario.aliases, allocator.allocate_many(len(scenario.aliases)))))
+        for scenario in scenarios
+    ]
+    subscribers = [data for scenario, msisdns in bound for data in scenario.subscriber_data(msisdns)]
+    person_ids = bulk_create_or_update_subscribers_with_related_data(conn, subscribers)
+    if len(person_ids) != len(subscribers):
+        raise RuntimeError("Не удалось подготовить абонентов для пакетного прогона сценариев")
+
+    report = publisher.publish_confirmed(
+        json.dumps(scenario.cdr_list(msisdns), ensure_ascii=False).encode('utf-8')
+        for scenario, msisdns in bound
+    )
+    if not report.ok:
+        logger.error(f"Ошибка отправки CDR пакетного прогона: {report}")
+        return BatchedRunResult(published=False)
+
+    expected_money: dict[str, int] = {}
+    expected_quant: dict[tuple[int, int], int] = {}
+    for scenario, msisdns in bound:
+        expected_money.update(scenario.expected_money_by_msisdn(msisdns))
+        expected_quant.update(scenario.expected_quant_by_key(msisdns, person_ids))
+    wait = wait_for_balances(
+        conn,
+        expected_money=expected_money,
+        expected_quant=expected_quant,
+        timeout_s=max(scenario.timeout_s for scenario in scenarios),
+        stable_for_s=max(scenario.stable_for_s for scenario in scenarios),
+    )
+
+    with span(PHASE_VERIFY):
+        # Ожидания всех сценариев сверяются в Postgres одним запросом; возвращаются только расхождения
+        mismatches = find_balance_mismatches(
+            conn, (row for scenario, msisdns in bound for row in scenario.expected_balance_rows(msisdns))
+        )
+        conn.rollback()
+        if mismatches is None:
+            raise RuntimeError("Не удалось сверить балансы пакетного прогона")
+        by_msisdn = {mismatch.msisdn: mismatch for mismatch in mismatches}
+        verdicts = [_verify_scenario(scenario, msisdns, by_msisdn) for scenario, msisdns in bound]
+    result = BatchedRunResult(published=True, wait=wait, verdicts=verdicts)
+    logger.info(
+        f"Пакетный прогон: {len(verdicts) - len(result.failed)}/{len(verdicts)} сценариев прошли, "
+        f"ожидание {wait.elapsed_s:.2f} с."
+    )
+    return result
@@ -0,0 +1,304 @@
+import argparse
+import json
+import logging
+import math
+import os
+import sqlite3
+import statistics
+import sys
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Iterable, Literal
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_PATH = "bench_history.sqlite"
+# Коммит тестируемой сборки BRT; выставляется CI или сборкой стенда, у харнесса свой git HEAD
+BRT_COMMIT_ENV = "BRT_COMMIT"
+DEFAULT_THRESHOLD = 0.10
+DEFAULT_ALPHA = 0.05
+# Меньше повторов статистический тест не различит; решение принимается только по порогу
+MIN_RUNS_FOR_TEST = 3
+# До этого суммарного размера выборок без совпадений p-value считается точно
+EXACT_MAX_SAMPLES = 30
+
+SCHEMA = """
+         CREATE TABLE IF NOT EXISTS bench_runs
+         (
+             id               INTEGER PRIMARY KEY AUTOINCREMENT,
+             scenario         TEXT NOT NULL,
+             commit_sha       TEXT NOT NULL,
+             recorded_at      TEXT NOT NULL,
+             p95_ms           REAL,
+             throughput_cdr_s REAL,
+             result           TEXT NOT NULL
+         );
+         CREATE INDEX IF NOT EXISTS bench_runs_scenario_commit ON bench_runs (scenario, commit_sha);
+         """
+
+
+class Metric(BaseModel):
+    column: str
+    # Направление, в котором значение хуже
+    worse: Literal["higher", "lower"]
+
+
+METRICS = {
+    "p95_ms": Metric(column="p95_ms", worse="higher"),
+    "throughput_cdr_s": Metric(column="throughput_cdr_s", worse="lower"),
+}
+
+
+class MetricComparison(BaseModel):
+    scenario: str
+    metric: str
+    baseline_runs: int
+    candidate_runs: int
+    baseline_median: float
+    candidate_median: float
+    # Относительное изменение в сторону ухудшения: 0.15 - на 15% хуже
+    degradation: float
+    p_value: float | None
+    regressed: bool
+
+
+def brt_commit(explicit: str | None = None) -> str:
+    """
+    Коммит BRT, под которым записываются и сравниваются прогоны: явное значение или BRT_COMMIT.
+    Без них - ошибка: подставить HEAD харнесса нельзя, иначе разные сборки BRT сольются в один коммит
+    и контроль регрессий молча перестанет срабатывать.
+    """
+    commit_sha = explicit or os.environ.get(BRT_COMMIT_ENV)
+    if not commit_sha:
+        raise ValueError(f"Коммит BRT не задан: передайте --commit или выставьте {BRT_COMMIT_ENV}")
+    return commit_sha
+
+
+def scenario_key(result: dict) -> str:
+    # Один сценарий - один режим и размер пачки; для открытой нагрузки добавляется расписание
+    key = f"{result['mode']}:batch_size={result['batch_size']}"
+    if result.get("schedule"):
+        steps = ",".join(f"{step['rate_cdr_s']:g}x{step['duration_s']:g}" for step in result["schedule"]["steps"])
+        key += f":schedule={steps}"
+    if result.get("max_message_bytes"):
+        key += f":max_bytes={result['max_message_bytes']}"
+    return key
+
+
+def connect_history(path: str = DEFAULT_HISTORY_PATH) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def record_results(conn: sqlite3.Connection, results: Iterable[dict], commit_sha: str) -> int:
+    recorded_at = datetime.now(timezone.utc).isoformat()
+    rows = [
+        (
+            scenario_key(result),
+            commit_sha,
+            recorded_at,
+            result["latency"]["p95_ms"],
+            result["throughput_cdr_s"],
+            json.dumps(result, ensure_ascii=False),
+        )
+        for result in results
+    ]
+    with conn:
+        conn.executemany(
+            "INSERT INTO bench_runs (scenario, commit_sha, recorded_at, p95_ms, throughput_cdr_s, result) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+    logger.info(f"В историю бенчмарков записано {len(rows)} результатов для {commit_sha}.")
+    return len(rows)
+
+
+def _metric_values(conn: sqlite3.Connection, scenario: str, commit_sha: str, column: str) -> list[float]:
+    rows = conn.execute(
+        f"SELECT {column} FROM bench_runs WHERE scenario = ? AND commit_sha = ? AND {column} IS NOT NULL",
+        (scenario, commit_sha),
+    ).fetchall()
+    # NaN бывает у прогона без единого примененного CDR; такие прогоны в сравнение не берутся
+    return [value for value, in rows if not math.isnan(value)]
+
+
+def latest_baseline_commit(conn: sqlite3.Connection, scenario: str, candidate: str) -> str | None:
+    row = conn.execute(
+        "SELECT commit_sha FROM bench_runs WHERE scenario = ? AND commit_sha != ? "
+        "ORDER BY recorded_at DESC LIMIT 1",
+        (scenario, candidate),
+    ).fetchone()
+    return row[0] if row else None
+
+
+@lru_cache(maxsize=None)
+def _u_distribution(m: int, n: int) -> tuple[int, ...]:
+    # Число перестановок рангов с каждым значением U для выборок размеров m и n
+    if m == 0 or n == 0:
+        return (1,)
+    with_last_in_x = _u_distribution(m - 1, n)
+    without = _u_distribution(m, n - 1)
+    counts = [0] * (m * n + 1)
+    for u, ways in enumerate(without):
+        counts[u] += ways
+    for u, ways in enumerate(with_last_in_x):
+        counts[u + n] += ways
+    return tuple(counts)
+
+
+def mann_whitney_u(x: list[float], y: list[float]) -> tuple[float, float]:
+    """
+    U-статистика x относительно y и одностороннее p-value гипотезы "значения x больше значений y".
+    Без совпадений и при малых выборках p-value точное, иначе - нормальное приближение
+    с поправкой на совпадения и на непрерывность.
+    """
+    m, n = len(x), len(y)
+    if not m or not n:
+        raise ValueError("Обе выборки должны быть непустыми")
+    combined = sorted((value, group) for group, values in ((0, x), (1, y)) for value in values)
+    ranks: list[float] = [0.0] * len(combined)
+    tie_term = 0.0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        tied = j - i + 1
+        tie_term += tied ** 3 - tied
+        i = j + 1
+    rank_sum_x = sum(rank for rank, (_, group) in zip(ranks, combined) if group == 0)
+    u = rank_sum_x - m * (m + 1) / 2
+
+    if tie_term == 0 and m + n <= EXACT_MAX_SAMPLES:
+        counts = _u_distribution(m, n)
+        return u, sum(counts[int(u):]) / sum(counts)
+
+    mean = m * n / 2
+    variance = m * n / 12 * ((m + n + 1) - tie_term / ((m + n) * (m + n - 1)))
+    if variance <= 0:
+        return u, 1.0
+    z = (u - mean - 0.5) / math.sqrt(variance)
+    return u, 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def compare_metric(
+        scenario: str,
+        metric_name: str,
+        baseline: list[float],
+        candidate: list[float],
+        threshold: float = DEFAULT_THRESHOLD,
+        alpha: float = DEFAULT_ALPHA,
+) -> MetricComparison:
+    metric = METRICS[metric_name]
+    baseline_median = statistics.median(baseline)
+    candidate_median = statistics.median(candidate)
+    # Проверяемая гипотеза: greater стохастически больше lesser, то есть кандидат хуже базы
+    if metric.worse == "higher":
+        degradation = (candidate_median - baseline_median) / baseline_median if baseline_median else 0.0
+        greater, lesser = candidate, baseline
+    else:
+        degradation = (baseline_median - candidate_median) / baseline_median if baseline_median else 0.0
+        greater, lesser = baseline, candidate
+
+    p_value = None
+    significant = True
+    if len(baseline) >= MIN_RUNS_FOR_TEST and len(candidate) >= MIN_RUNS_FOR_TEST:
+        _, p_value = mann_whitney_u(greater, lesser)
+        significant = p_value < alpha
+    return MetricComparison(
+        scenario=scenario,
+        metric=metric_name,
+        baseline_runs=len(baseline),
+        candidate_runs=len(candidate),
+        baseline_median=baseline_median,
+        candidate_median=candidate_median,
+        degradation=degradation,
+        p_value=p_value,
+        regressed=degradation > threshold and significant,
+    )
+
+
+def compare_commits(
+        conn: sqlite3.Connection,
+        candidate: str,
+        baseline: str | None = None,
+        threshold: float = DEFAULT_THRESHOLD,
+        alpha: float = DEFAULT_ALPHA,
+) -> list[MetricComparison]:
+    """
+    Сравнивает прогоны candidate с базовым коммитом по каждому сценарию и метрике.
+    Регрессия - медиана хуже более чем на threshold и (при достаточном числе повторов)
+    односторонний тест Манна-Уитни значим на уровне alpha.
+    """
+    scenarios = [row[0] for row in conn.execute(
+        "SELECT DISTINCT scenario FROM bench_runs WHERE commit_sha = ? ORDER BY scenario", (candidate,)
+    )]
+    comparisons = []
+    for scenario in scenarios:
+        baseline_commit = baseline or latest_baseline_commit(conn, scenario, candidate)
+        if baseline_commit is None:
+            logger.info(f"Для сценария {scenario} нет базового прогона.")
+            continue
+        for metric_name, metric in METRICS.items():
+            baseline_values = _metric_values(conn, scenario, baseline_commit, metric.column)
+            candidate_values = _metric_values(conn, scenario, candidate, metric.column)
+            if baseline_values and candidate_values:
+                comparisons.append(compare_metric(
+                    scenario, metric_name, baseline_values, candidate_values, threshold, alpha
+                ))
+    return comparisons
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="История бенчмарков BRT и контроль регрессий")
+    parser.add_argument("--history", default=DEFAULT_HISTORY_PATH, help="Файл SQLite с историей")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="Записать JSON-результат latency_benchmark")
+    record_parser.add_argument("results", help="Файл с выводом latency_benchmark --output")
+    record_parser.add_argument("--commit", default=None, help=f"Коммит BRT (по умолчанию ${BRT_COMMIT_ENV})")
+
+    compare_parser = commands.add_parser("compare", help="Сравнить коммит с базовым")
+    compare_parser.add_argument("--candidate", default=None,
+                                help=f"Проверяемый коммит BRT (по умолчанию ${BRT_COMMIT_ENV})")
+    compare_parser.add_argument("--baseline", default=None,
+                                help="Базовый коммит (по умолчанию последний другой коммит в истории сценария)")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                                help="Допустимое относительное ухудшение медианы")
+    compare_parser.add_argument("--alpha", type=float, default=DEFAULT_ALPHA)
+    args = parser.parse_args(argv)
+    try:
+        commit_sha = brt_commit(args.commit if args.command == "record" else args.candidate)
+    except ValueError as e:
+        parser.error(str(e))
+
+    conn = connect_history(args.history)
+    try:
+        if args.command == "record":
+            with open(args.results, encoding="utf-8") as f:
+                record_results(conn, json.load(f)["results"], commit_sha)
+            return 0
+
+        comparisons = compare_commits(conn, commit_sha, args.baseline, args.threshold, args.alpha)
+    finally:
+        conn.close()
+
+    for comparison in comparisons:
+        p_value = "-" if comparison.p_value is None else f"{comparison.p_value:.4f}"
+        print(
+            f"{'РЕГРЕССИЯ' if comparison.regressed else 'ok':>9}  {comparison.scenario}  {comparison.metric}: "
+            f"{comparison.baseline_median:.2f} -> {comparison.candidate_median:.2f} "
+            f"({comparison.degradation:+.1%} хуже, p={p_value}, "
+            f"прогонов {comparison.baseline_runs}/{comparison.candidate_runs})"
+        )
+    return 1 if any(comparison.regressed for comparison in comparisons) else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,335 @@
+import argparse
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List
+
+import numpy as np
+from pydantic import BaseModel
+
+from cdr_generator import CDR_DATETIME_FORMAT
+from rabbitmq_sender import (
+    DEFAULT_CONFIRM_TIMEOUT_S,
+    DEFAULT_MAX_IN_FLIGHT,
+    TEST_CDR_EXCHANGE,
+    TEST_CDR_ROUTING_KEY,
+    PublishReport,
+    RabbitMQPublisher,
+    get_publisher,
+    shutdown_publisher,
+)
+from utils import summarize_latencies
+
+logger = logging.getLogger(__name__)
+
+# Формат записи: файл данных - NDJSON, одна строка на сообщение (JSON-массив CDR в том виде,
+# в каком он ушел в брокер); рядом файл <path>.idx - заголовок и массив записей (смещение, длина, время).
+INDEX_SUFFIX = ".idx"
+INDEX_MAGIC = b"CDRIDX1\n"
+INDEX_DTYPE = np.dtype([("offset", "<u8"), ("length", "<u8"), ("t_s", "<f8")])
+_INDEX_RECORD = struct.Struct("<QQd")
+
+
+def index_path_for(path: str) -> str:
+    return path + INDEX_SUFFIX
+
+
+class CdrCaptureWriter:
+    """
+    Пишет сообщения с CDR в файл записи. Время сообщения - секунды от первой записи.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._data = open(path, "wb")
+        self._index = open(index_path_for(path), "w+b")
+        self._index.write(INDEX_MAGIC)
+        self._offset = 0
+        self._started_at: float | None = None
+        self.messages = 0
+
+    def write(self, body: bytes, t_s: float | None = None):
+        if t_s is None:
+            now = time.monotonic()
+            self._started_at = self._started_at if self._started_at is not None else now
+            t_s = now - self._started_at
+        self._data.write(body)
+        self._data.write(b"\n")
+        self._index.write(_INDEX_RECORD.pack(self._offset, len(body), t_s))
+        self._offset += len(body) + 1
+        self.messages += 1
+
+    def write_cdrs(self, cdr_list: List[Dict[str, Any]], t_s: float | None = None):
+        self.write(json.dumps(cdr_list, ensure_ascii=False).encode('utf-8'), t_s)
+
+    def discard(self, messages: Iterable[int]):
+        """
+        Убирает сообщения с данными номерами из индекса. Их строки остаются в файле данных,
+        но читатель и воспроизведение их не видят; номера следующих сообщений сдвигаются.
+        """
+        drop = [m for m in set(messages) if 0 <= m < self.messages]
+        if not drop:
+            return
+        self._index.flush()
+        self._index.seek(len(INDEX_MAGIC))
+        records = np.frombuffer(self._index.read(), dtype=INDEX_DTYPE)
+        keep = np.ones(len(records), dtype=bool)
+        keep[drop] = False
+        self._index.seek(len(INDEX_MAGIC))
+        self._index.truncate()
+        self._index.write(records[keep].tobytes())
+        self.messages = int(keep.sum())
+
+    def close(self):
+        self._data.close()
+        self._index.close()
+        logger.info(f"Запись CDR {self.path} закрыта: {self.messages} сообщений.")
+
+    def __enter__(self) -> "CdrCaptureWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class CapturingPublisher(RabbitMQPublisher):
+    """
+    RabbitMQPublisher, который дополнительно пишет опубликованные сообщения в файл записи.
+    В запись попадает то, что издатель считает доставленным: для publish - успешный basic_publish
+    (на этом пути подтверждений нет), для publish_confirmed - только сообщения, получившие ack.
+    """
+
+    def __init__(self, writer: CdrCaptureWriter, **kwargs):
+        super().__init__(**kwargs)
+        self._writer = writer
+
+    def publish(self, body: bytes, *args, **kwargs) -> bool:
+        published = super().publish(body, *args, **kwargs)
+        if published:
+            self._writer.write(body)
+        return published
+
+    def publish_confirmed(self, bodies: Iterable[bytes], *args, **kwargs) -> PublishReport:
+        # Время сообщения фиксируется в момент отправки, поэтому пишем сразу, а неподтвержденные убираем по отчету
+        first = self._writer.messages
+        sent = 0
+
+        def captured() -> Iterator[bytes]:
+            nonlocal sent
+            for body in bodies:
+                self._writer.write(body)
+                sent += 1
+                yield body
+
+        report = super().publish_confirmed(captured(), *args, **kwargs)
+        failed = {*report.nacked, *report.unconfirmed, *(returned.index for returned in report.returned)}
+        # Сообщения, взятые из итератора, но не дошедшие до basic_publish, в отчет не попадают
+        failed.update(range(report.published, sent))
+        self._writer.discard(first + i for i in failed)
+        return report
+
+
+def _message_started_at(line: bytes) -> datetime | None:
+    starts = [cdr.get("callStart") for cdr in json.loads(line)]
+    starts = [datetime.strptime(start, CDR_DATETIME_FORMAT) for start in starts if start]
+    return min(starts, default=None)
+
+
+def index_ndjson(path: str, time_from_call_start: bool = False) -> int:
+    """
+    Строит индекс для готового NDJSON-файла (например, выгрузки с прода), не загружая его в память.
+    Без time_from_call_start все сообщения получают время 0 и воспроизводятся без пауз;
+    с ним время сообщения - самый ранний callStart его CDR относительно первого сообщения.
+    """
+    messages = 0
+    with open(path, "rb") as data, open(index_path_for(path), "wb") as index:
+        index.write(INDEX_MAGIC)
+        if os.fstat(data.fileno()).st_size == 0:
+            return 0
+        with mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            first_start: datetime | None = None
+            offset = 0
+            size = len(mm)
+            while offset < size:
+                end = mm.find(b"\n", offset)
+                end = size if end == -1 else end
+                if end > offset:
+                    t_s = 0.0
+                    if time_from_call_start:
+                        started_at = _message_started_at(mm[offset:end])
+                        if started_at is not None:
+                            first_start = first_start or started_at
+                            t_s = (started_at - first_start).total_seconds()
+                    index.write(_INDEX_RECORD.pack(offset, end - offset, t_s))
+                    messages += 1
+                offset = end + 1
+    logger.info(f"Индекс {index_path_for(path)} построен: {messages} сообщений.")
+    return messages
+
+
+class CdrCaptureReader:
+    """
+    Читает запись через mmap: и данные, и индекс отображаются в память, сообщения копируются по одному,
+    так что многогигабайтные записи не загружаются в RAM целиком.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._data = (
+            mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if os.fstat(self._file.fileno()).st_size else None
+        )
+        index_path = index_path_for(path)
+        with open(index_path, "rb") as index:
+            if index.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+                raise ValueError(f"{index_path} не является индексом записи CDR")
+        records = (os.path.getsize(index_path) - len(INDEX_MAGIC)) // INDEX_DTYPE.itemsize
+        self._index = (
+            np.memmap(index_path, dtype=INDEX_DTYPE, mode="r", offset=len(INDEX_MAGIC), shape=(records,))
+            if records else np.empty(0, dtype=INDEX_DTYPE)
+        )
+        if records:
+            # Смещения в индексе растут, так что достаточно проверить последнюю запись
+            last = self._index[-1]
+            data_size = len(self._data) if self._data is not None else 0
+            if int(last["offset"]) + int(last["length"]) > data_size:
+                self.close()
+                raise ValueError(
+                    f"Индекс {index_path} ссылается за конец файла данных {path} ({data_size} байт): "
+                    f"запись обрезана или индекс от другого файла"
+                )
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def message(self, i: int) -> bytes:
+        record = self._index[i]
+        offset = int(record["offset"])
+        return self._data[offset:offset + int(record["length"])]
+
+    def t_s(self, i: int) -> float:
+        return float(self._index[i]["t_s"])
+
+    def iter_messages(self, start: int = 0, stop: int | None = None) -> Iterator[tuple[float, bytes]]:
+        for i in range(start, len(self) if stop is None else min(stop, len(self))):
+            yield self.t_s(i), self.message(i)
+
+    def close(self):
+        # memmap индекса закрывается вместе с последней ссылкой на него
+        self._index = np.empty(0, dtype=INDEX_DTYPE)
+        if self._data is not None:
+            self._data.close()
+        self._file.close()
+
+    def __enter__(self) -> "CdrCaptureReader":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class ReplayResult(BaseModel):
+    messages: int
+    bytes_sent: int
+    duration_s: float
+    capture_duration_s: float
+    # None - максимально быстро, 1.0 - исходный темп, N - ускорение в N раз
+    speed: float | None
+    send_lag: dict[str, float]
+    publish_report: PublishReport
+
+
+def replay_capture(
+        path: str,
+        publisher: RabbitMQPublisher | None = None,
+        speed: float | None = 1.0,
+        start: int = 0,
+        limit: int | None = None,
+        exchange: str = TEST_CDR_EXCHANGE,
+        routing_key: str = TEST_CDR_ROUTING_KEY,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        confirm_timeout_s: float = DEFAULT_CONFIRM_TIMEOUT_S,
+) -> ReplayResult:
+    publisher = publisher or get_publisher()
+    lags: list[float] = []
+    sent_bytes = 0
+    first_t_s: float | None = None
+    last_t_s = 0.0
+
+    with CdrCaptureReader(path) as reader:
+        stop = None if limit is None else start + limit
+
+        def paced_bodies() -> Iterator[bytes]:
+            nonlocal sent_bytes, first_t_s, last_t_s
+            for t_s, body in reader.iter_messages(start, stop):
+                first_t_s = t_s if first_t_s is None else first_t_s
+                last_t_s = t_s
+                if speed:
+                    intended = started_at + (t_s - first_t_s) / speed
+                    # Паузы в записи бывают длиннее интервала heartbeat: ждем с обработкой ввода-вывода соединения
+                    publisher.sleep(intended - time.monotonic())
+                    lags.append(time.monotonic() - intended)
+                sent_bytes += len(body)
+                yield body
+
+        logger.info(f"Воспроизведение {path}: {len(reader)} сообщений, скорость {speed or 'максимальная'}.")
+        started_at = time.monotonic()
+        report = publisher.publish_confirmed(
+            paced_bodies(), exchange, routing_key, max_in_flight=max_in_flight, confirm_timeout_s=confirm_timeout_s
+        )
+        duration_s = time.monotonic() - started_at
+
+    result = ReplayResult(
+        messages=report.published,
+        bytes_sent=sent_bytes,
+        duration_s=duration_s,
+        capture_duration_s=last_t_s - (first_t_s or 0.0),
+        speed=speed or None,
+        send_lag=summarize_latencies(lags),
+        publish_report=report,
+    )
+    logger.info(f"Воспроизведено {result.messages} сообщений за {duration_s:.2f} с.")
+    return result
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Запись и воспроизведение потоков CDR")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    index_parser = commands.add_parser("index", help="Построить индекс для NDJSON-файла сообщений")
+    index_parser.add_argument("path")
+    index_parser.add_argument("--time-from-call-start", action="store_true",
+                              help="Брать время сообщения из самого раннего callStart")
+
+    replay_parser = commands.add_parser("replay", help="Опубликовать запись в cdr-exchange")
+    replay_parser.add_argument("path")
+    pace = replay_parser.add_mutually_exclusive_group()
+    pace.add_argument("--speed", type=float, default=1.0, help="Ускорение относительно исходного темпа")
+    pace.add_argument("--max-speed", action="store_true", help="Публиковать без пауз")
+    replay_parser.add_argument("--start", type=int, default=0, help="Номер первого сообщения")
+    replay_parser.add_argument("--limit", type=int, default=None, help="Сколько сообщений воспроизвести")
+    args = parser.parse_args(argv)
+
+    if args.command == "index":
+        index_ndjson(args.path, args.time_from_call_start)
+        return 0
+
+    try:
+        result = replay_capture(
+            args.path, speed=None if args.max_speed else args.speed, start=args.start, limit=args.limit
+        )
+    finally:
+        shutdown_publisher()
+    print(json.dumps(result.model_dump(), ensure_ascii=False, indent=2))
+    return 0 if result.publish_report.ok else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,122 @@
+import itertools
+import json
+import logging
+import math
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Literal
+
+from pydantic import BaseModel, Field
+
+from rabbitmq_sender import DEFAULT_MAX_IN_FLIGHT, PublishReport, RabbitMQPublisher, get_publisher
+
+logger = logging.getLogger(__name__)
+
+CALL_TYPE_OUTGOING = "01"
+CALL_TYPE_INCOMING = "02"
+CDR_DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+class DurationDistribution(BaseModel):
+    kind: Literal["uniform", "exponential", "lognormal"] = "exponential"
+    mean_s: float = 180.0
+    # Для lognormal - стандартное отклонение логарифма длительности
+    sigma: float = 1.0
+    min_s: int = 1
+    max_s: int = 3600
+
+
+class CdrGeneratorConfig(BaseModel):
+    total_cdrs: int
+    batch_size: int = Field(default=100, gt=0)
+    seed: int = 0
+
+    # Абоненты "своей" сети - непрерывный диапазон MSISDN
+    subscriber_msisdn_start: int
+    subscriber_count: int = Field(gt=0)
+    # Номера других операторов, которых нет в BRT
+    external_msisdn_start: int = 79800000000
+    external_msisdn_count: int = 1_000_000
+
+    call_type_weights: dict[str, float] = {CALL_TYPE_OUTGOING: 0.7, CALL_TYPE_INCOMING: 0.3}
+    in_network_ratio: float = Field(default=0.5, ge=0.0, le=1.0)
+    durations: DurationDistribution = DurationDistribution()
+
+    start_time: datetime = datetime(2025, 5, 1)
+    # Среднее время между началами соседних звонков
+    mean_gap_s: float = 1.0
+
+
+def _duration_sampler(rng: random.Random, durations: DurationDistribution):
+    if durations.kind == "uniform":
+        def sample() -> float:
+            return rng.uniform(durations.min_s, durations.max_s)
+    elif durations.kind == "exponential":
+        def sample() -> float:
+            return rng.expovariate(1.0 / durations.mean_s)
+    else:
+        # Подбираем mu так, чтобы среднее lognormal совпало с mean_s
+        mu = math.log(durations.mean_s) - durations.sigma ** 2 / 2
+
+        def sample() -> float:
+            return rng.lognormvariate(mu, durations.sigma)
+
+    def bounded() -> int:
+        return min(max(int(round(sample())), durations.min_s), durations.max_s)
+
+    return bounded
+
+
+def generate_cdrs(config: CdrGeneratorConfig) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(config.seed)
+    call_types = list(config.call_type_weights)
+    cum_weights = list(itertools.accumulate(config.call_type_weights.values()))
+    sample_duration = _duration_sampler(rng, config.durations)
+
+    call_start = config.start_time
+    for _ in range(config.total_cdrs):
+        first_index = rng.randrange(config.subscriber_count)
+        if config.subscriber_count > 1 and rng.random() < config.in_network_ratio:
+            # Второй абонент из своей сети, но не совпадающий с первым
+            second_index = rng.randrange(config.subscriber_count - 1)
+            if second_index >= first_index:
+                second_index += 1
+            second_msisdn = config.subscriber_msisdn_start + second_index
+        else:
+            second_msisdn = config.external_msisdn_start + rng.randrange(config.external_msisdn_count)
+
+        call_start += timedelta(seconds=rng.expovariate(1.0 / config.mean_gap_s))
+        call_end = call_start + timedelta(seconds=sample_duration())
+
+        yield {
+            "callType": rng.choices(call_types, cum_weights=cum_weights)[0],
+            "firstSubscriberMsisdn": str(config.subscriber_msisdn_start + first_index),
+            "secondSubscriberMsisdn": str(second_msisdn),
+            "callStart": call_start.strftime(CDR_DATETIME_FORMAT),
+            "callEnd": call_end.strftime(CDR_DATETIME_FORMAT),
+        }
+
+
+def generate_cdr_batches(config: CdrGeneratorConfig) -> Iterator[List[Dict[str, Any]]]:
+    cdrs = generate_cdrs(config)
+    while batch := list(itertools.islice(cdrs, config.batch_size)):
+        yield batch
+
+
+def encode_cdr_batches(config: CdrGeneratorConfig) -> Iterator[bytes]:
+    for batch in generate_cdr_batches(config):
+        yield json.dumps(batch, ensure_ascii=False).encode('utf-8')
+
+
+def publish_generated_cdrs(
+        config: CdrGeneratorConfig,
+        publisher: RabbitMQPublisher | None = None,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+) -> PublishReport:
+    publisher = publisher or get_publisher()
+    logger.info(
+        f"Генерация и отправка {config.total_cdrs} CDR пачками по {config.batch_size} (seed={config.seed})."
+    )
+    report = publisher.publish_confirmed(encode_cdr_batches(config), max_in_flight=max_in_flight)
+    logger.info(f"Отправлено сообщений: {report.published}, подтверждено: {report.acked}.")
+    return report
@@ -14,6 +14,11 @@ class Settings(BaseSettings):
     rabbitmq_port: int
     rabbitmq_user: str
     rabbitmq_pass: str
+    # Очередь, привязанная к cdr-exchange/cdr-routing-key, которую читает BRT
+    rabbitmq_cdr_queue: str = "cdr-queue"
+    # Лимиты одного сообщения с CDR; None - весь список уходит одним сообщением
+    cdr_max_per_message: int | None = None
+    cdr_max_message_bytes: int | None = None
 
     brt_db_host: str
     brt_db_port: int
@@ -27,6 +32,25 @@ class Settings(BaseSettings):
     hrs_db_pass: str
     hrs_db_name: str
 
+    db_pool_min_size: int = 1
+    db_pool_max_size: int = 10
+    db_pool_timeout_s: float = 30.0
+    db_pool_open_timeout_s: float = 5.0
+    db_pool_max_idle_s: float = 600.0
+
+    # Диапазон MSISDN, из которого тестам и воркерам выдаются непересекающиеся блоки
+    msisdn_pool_base: int = 79000000000
+    msisdn_pool_block_size: int = 10_000_000
+    msisdn_pool_max_workers: int = 50
+    # Отдельный диапазон для процессов producer_pool; по умолчанию лежит ниже пула тестовых воркеров
+    producer_msisdn_base: int = 78000000000
+    producer_msisdn_block_size: int = 10_000_000
+    producer_msisdn_max_workers: int = 100
+    # Диапазон абонентов latency_benchmark; не пересекается ни с тестовыми воркерами, ни с производителями
+    benchmark_msisdn_base: int = 77000000000
+    benchmark_msisdn_block_size: int = 10_000_000
+    benchmark_msisdn_max_workers: int = 100
+
     def get_brt_db_url(self) -> str:
         return f"postgresql://{self.brt_db_user}:{self.brt_db_pass}@{self.brt_db_host}:{self.brt_db_port}/{self.brt_db_name}"
 
@@ -1,13 +1,21 @@
 import logging
 from datetime import datetime
+from decimal import Decimal
+from typing import Iterable, Iterator
 
 import psycopg
 
 from config import get_settings
-from subscriber_schema import SubscriberCreationData
+from phase_timing import PHASE_PROVISION, PHASE_VERIFY, count, timed
+from statement_registry import STATEMENTS, execute_statement, execute_statement_async
+from subscriber_schema import BalanceMismatch, ProvisioningReport, SubscriberCreationData
 
 settings = get_settings()
 
+# Начиная с этого размера пакетные запросы читают результат серверным курсором
+BALANCE_STREAM_THRESHOLD = 10_000
+BALANCE_STREAM_ITERSIZE = 5_000
+
 logger = logging.getLogger(__name__)
 if not logger.hasHandlers():
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -40,6 +48,7 @@ def close_db(conn: psycopg.Connection | None):
             logger.error(f"Ошибка при закрытии соединения с БД: {e}", exc_info=True)
 
 
+@timed(PHASE_VERIFY)
 def get_sub_balance(
         conn: psycopg.Connection,
         msisdn: str,
@@ -49,10 +58,7 @@ def get_sub_balance(
         return None
     try:
         with conn.cursor() as cur:
-            cur.execute(
-                "SELECT money FROM person WHERE msisdn = %s;",
-                (msisdn,)
-            )
+            execute_statement(cur, "person_balance_by_msisdn", (msisdn,))
             result = cur.fetchone()
             if result:
                 balance = result[0]
@@ -69,13 +75,11 @@ def get_sub_balance(
         return None
 
 
+@timed(PHASE_VERIFY)
 def get_quant_service_balance(conn: psycopg.Connection, person_id: int, s_type_id: int = 0) -> int | None:
     try:
         with conn.cursor() as cur:
-            cur.execute(
-                "SELECT amount_left FROM quant_services WHERE p_id = %s AND s_type_id = %s;",
-                (person_id, s_type_id)
-            )
+            execute_statement(cur, "quant_service_balance", (person_id, s_type_id))
             result = cur.fetchone()
             if result:
                 return result[0]
@@ -86,103 +90,311 @@ def get_quant_service_balance(conn: psycopg.Connection, person_id: int, s_type_i
         return None
 
 
+def _stream_rows(
+        conn: psycopg.Connection,
+        cursor_name: str,
+        query: str,
+        params: tuple,
+) -> Iterator[tuple]:
+    # Серверный курсор: строки приходят порциями по BALANCE_STREAM_ITERSIZE, а не целиком
+    with conn.cursor(name=cursor_name) as cur:
+        cur.itersize = BALANCE_STREAM_ITERSIZE
+        cur.execute(query, params)
+        yield from cur
+
+
+def iter_sub_balances(conn: psycopg.Connection, msisdns: list[str]) -> Iterator[tuple[str, float]]:
+    yield from _stream_rows(
+        conn,
+        "sub_balances_stream",
+        STATEMENTS["person_balances_by_msisdns"],
+        (msisdns,)
+    )
+
+
+def get_sub_balances(conn: psycopg.Connection, msisdns: list[str]) -> dict[str, float] | None:
+    if not conn or conn.closed:
+        logger.error("Соединение с БД отсутствует или закрыто.")
+        return None
+    if not msisdns:
+        return {}
+    try:
+        if len(msisdns) > BALANCE_STREAM_THRESHOLD:
+            return dict(iter_sub_balances(conn, msisdns))
+        with conn.cursor() as cur:
+            execute_statement(cur, "person_balances_by_msisdns", (msisdns,))
+            return dict(cur.fetchall())
+    except psycopg.Error as e:
+        logger.error(f"Ошибка psycopg при пакетном получении балансов ({len(msisdns)} MSISDN): {e}", exc_info=True)
+        return None
+
+
+def iter_quant_service_balances(
+        conn: psycopg.Connection,
+        keys: list[tuple[int, int]],
+) -> Iterator[tuple[tuple[int, int], int]]:
+    params = ([p_id for p_id, _ in keys], [s_type_id for _, s_type_id in keys])
+    for p_id, s_type_id, amount_left in _stream_rows(
+            conn, "quant_service_balances_stream", STATEMENTS["quant_service_balances"], params
+    ):
+        yield (p_id, s_type_id), amount_left
+
+
+def get_quant_service_balances(
+        conn: psycopg.Connection,
+        keys: list[tuple[int, int]],
+) -> dict[tuple[int, int], int] | None:
+    """
+    Остатки quant_services по парам (p_id, s_type_id); отсутствующая запись дает 0,
+    как в get_quant_service_balance.
+    """
+    if not conn or conn.closed:
+        logger.error("Соединение с БД отсутствует или закрыто.")
+        return None
+    if not keys:
+        return {}
+    try:
+        if len(keys) > BALANCE_STREAM_THRESHOLD:
+            return dict(iter_quant_service_balances(conn, keys))
+        with conn.cursor() as cur:
+            execute_statement(
+                cur,
+                "quant_service_balances",
+                ([p_id for p_id, _ in keys], [s_type_id for _, s_type_id in keys])
+            )
+            return {(p_id, s_type_id): amount_left for p_id, s_type_id, amount_left in cur.fetchall()}
+    except psycopg.Error as e:
+        logger.error(f"Ошибка psycopg при пакетном получении quant_services ({len(keys)} ключей): {e}", exc_info=True)
+        return None
+
+
+async def get_sub_balances_async(conn: psycopg.AsyncConnection, msisdns: list[str]) -> dict[str, float] | None:
+    if conn.closed:
+        logger.error("Соединение с БД отсутствует или закрыто.")
+        return None
+    if not msisdns:
+        return {}
+    try:
+        async with conn.cursor() as cur:
+            await execute_statement_async(cur, "person_balances_by_msisdns", (msisdns,))
+            return dict(await cur.fetchall())
+    except psycopg.Error as e:
+        logger.error(f"Ошибка psycopg при пакетном получении балансов ({len(msisdns)} MSISDN): {e}", exc_info=True)
+        return None
+
+
+async def get_quant_service_balances_async(
+        conn: psycopg.AsyncConnection,
+        keys: list[tuple[int, int]],
+) -> dict[tuple[int, int], int] | None:
+    if conn.closed:
+        logger.error("Соединение с БД отсутствует или закрыто.")
+        return None
+    if not keys:
+        return {}
+    try:
+        async with conn.cursor() as cur:
+            await execute_statement_async(
+                cur,
+                "quant_service_balances",
+                ([p_id for p_id, _ in keys], [s_type_id for _, s_type_id in keys])
+            )
+            return {(p_id, s_type_id): amount_left for p_id, s_type_id, amount_left in await cur.fetchall()}
+    except psycopg.Error as e:
+        logger.error(f"Ошибка psycopg при пакетном получении quant_services ({len(keys)} ключей): {e}", exc_info=True)
+        return None
+
+
+def find_balance_mismatches(
+        conn: psycopg.Connection,
+        expected_rows: Iterable[tuple[str, int | float | None, int | None, int | None]],
+) -> list[BalanceMismatch] | None:
+    """
+    Сверяет ожидаемые строки (msisdn, money, s_type_id, amount_left) с person/quant_services одним запросом.
+    None в money или amount_left означает "не проверять". Возвращает только расхождения.
+    """
+    if not conn or conn.closed:
+        logger.error("Соединение с БД отсутствует или закрыто.")
+        return None
+    try:
+        # Проверка только читает данные: транзакция (или точка сохранения) откатывается вместе с временной таблицей
+        with conn.transaction(force_rollback=True), conn.cursor() as cur:
+            cur.execute(
+                """
+                CREATE TEMP TABLE expected_balance
+                (
+                    msisdn      text,
+                    money       numeric,
+                    s_type_id   integer,
+                    amount_left integer
+                ) ON COMMIT DROP;
+                """
+            )
+            with cur.copy("COPY expected_balance (msisdn, money, s_type_id, amount_left) FROM STDIN") as copy:
+                for row in expected_rows:
+                    copy.write_row(row)
+            cur.execute("ANALYZE expected_balance;")
+            cur.execute(
+                """
+                SELECT e.msisdn,
+                       e.money,
+                       p.money,
+                       e.s_type_id,
+                       e.amount_left,
+                       COALESCE(q.amount_left, 0),
+                       p.id IS NOT NULL
+                FROM expected_balance e
+                         LEFT JOIN person p ON p.msisdn = e.msisdn
+                         LEFT JOIN quant_services q ON q.p_id = p.id AND q.s_type_id = e.s_type_id
+                WHERE p.id IS NULL
+                   OR (e.money IS NOT NULL AND p.money IS DISTINCT FROM e.money)
+                   OR (e.amount_left IS NOT NULL AND COALESCE(q.amount_left, 0) IS DISTINCT FROM e.amount_left);
+                """
+            )
+            mismatches = [
+                BalanceMismatch(
+                    msisdn=msisdn,
+                    expected_money=expected_money,
+                    actual_money=actual_money if person_found else None,
+                    s_type_id=s_type_id,
+                    expected_amount_left=expected_amount_left,
+                    actual_amount_left=actual_amount_left if person_found else None,
+                    person_found=person_found,
+                )
+                for (msisdn, expected_money, actual_money, s_type_id,
+                     expected_amount_left, actual_amount_left, person_found) in cur
+            ]
+        if mismatches:
+            logger.warning(f"Найдено расхождений балансов: {len(mismatches)}.")
+        return mismatches
+    except psycopg.Error as e:
+        logger.error(f"Ошибка psycopg при сверке балансов: {e}", exc_info=True)
+        return None
+
+
+def _read_subscriber_states(cur: psycopg.Cursor, msisdns: list[str]) -> dict[str, dict]:
+    # Текущее состояние абонентов одним запросом: person, логический тариф и остатки по всем s_type_id
+    execute_statement(cur, "subscriber_states_by_msisdns", (msisdns,))
+    states: dict[str, dict] = {}
+    for row in cur.fetchall():
+        state = states.setdefault(row['msisdn'], {**row, 'quants': {}})
+        if row['s_type_id'] is not None:
+            state['quants'][row['s_type_id']] = row['amount_left']
+    return states
+
+
+def _person_matches(state: dict, data: SubscriberCreationData, person_tariff_id: int) -> bool:
+    return (
+            state['money'] is not None
+            and Decimal(str(state['money'])) == Decimal(data.money)
+            and state['is_restricted'] == data.is_restricted
+            and state['description'] == data.description
+            and state['name'] == f"{data.name_prefix}{state['id']}"
+            and state['tariff_id'] == person_tariff_id
+    )
+
+
+@timed(PHASE_PROVISION)
 def create_or_update_subscribers_with_related_data(  # Функция переименована
         conn: psycopg.Connection,
-        subscribers_to_process: list[SubscriberCreationData]
+        subscribers_to_process: list[SubscriberCreationData],
+        report: ProvisioningReport | None = None,
 ) -> dict[str, int]:
+    """
+    Создает или обновляет абонентов. Существующие абоненты сравниваются с запрошенным состоянием:
+    строки, которые уже совпадают, не переписываются, а новый person_tariff создается только при смене тарифа.
+    Правило start_date общее с пакетным вариантом: при том же тарифе остается прежняя запись person_tariff
+    с ее start_date, а новые записи (и reg_data новых абонентов) получают одну метку времени на вызов.
+    Если передан report, в него записываются счетчики созданных, обновленных и пропущенных строк.
+    """
     final_processed_ids_map: dict[str, int] = {}
+    report = report if report is not None else ProvisioningReport()
 
     if not conn or conn.closed:
         logger.error("Соединение с БД отсутствует.")
         return {}
 
     all_msisdns_to_check = [data.msisdn for data in subscribers_to_process]
-    existing_persons_map: dict[str, int] = {}
+    existing_states: dict[str, dict] = {}
+    current_timestamp = datetime.now()
 
     try:
         with conn.cursor(row_factory=psycopg.rows.dict_row) as cur:
             if all_msisdns_to_check:
-                cur.execute(
-                    "SELECT id, msisdn FROM person WHERE msisdn = ANY(%s);",
-                    (all_msisdns_to_check,)
-                )
-                for row in cur.fetchall():
-                    existing_persons_map[row['msisdn']] = row['id']
+                existing_states = _read_subscriber_states(cur, all_msisdns_to_check)
 
-                if existing_persons_map:
-                    logger.info(f"Найдены существующие абоненты для MSISDNs: {list(existing_persons_map.keys())}")
+                if existing_states:
+                    logger.info(f"Найдены существующие абоненты для MSISDNs: {list(existing_states.keys())}")
 
             for subscriber_data in subscribers_to_process:
                 msisdn = subscriber_data.msisdn
-                current_timestamp = datetime.now()
 
-                if msisdn in existing_persons_map:
-                    existing_person_id = existing_persons_map[msisdn]
+                if msisdn in existing_states:
+                    state = existing_states[msisdn]
+                    existing_person_id = state['id']
                     logger.info(f"Обновление данных для существующего абонента {msisdn} (ID: {existing_person_id}).")
 
-                    person_tariff_insert_query = """
-                                                 INSERT INTO person_tariff (t_id, start_date)
-                                                 VALUES (%s, %s)
-                                                 RETURNING id;
-                                                 """
-                    cur.execute(person_tariff_insert_query, (subscriber_data.tariff_id_logical, current_timestamp))
-                    new_person_tariff_row = cur.fetchone()
-                    if not new_person_tariff_row:
-                        logger.error(
-                            f"Не удалось создать запись в 'person_tariff' для обновления msisdn: {msisdn}. Транзакция будет отменена.")
-                        conn.rollback()
-                        return {}
-                    new_person_tariff_id = new_person_tariff_row['id']
-                    logger.debug(
-                        f"Новая запись 'person_tariff' (id: {new_person_tariff_id}) создана для msisdn: {msisdn} при обновлении.")
-
-                    final_name = f"{subscriber_data.name_prefix}{existing_person_id}"
-                    person_update_query = """
-                                          UPDATE person
-                                          SET money         = %s,
-                                              is_restricted = %s,
-                                              description   = %s,
-                                              tariff_id     = %s,
-                                              name          = %s
-                                          WHERE id = %s;
-                                          """
-                    person_update_values = (
-                        subscriber_data.money,
-                        subscriber_data.is_restricted,
-                        subscriber_data.description,
-                        new_person_tariff_id,
-                        final_name,
-                        existing_person_id
-                    )
-                    cur.execute(person_update_query, person_update_values)
-                    if cur.rowcount == 0:
-                        logger.warning(
-                            f"Обновление 'person' для ID {existing_person_id} (msisdn: {msisdn}) не затронуло ни одной строки. Это неожиданно.")
-                    logger.debug(f"Запись 'person' (id: {existing_person_id}) обновлена для msisdn: {msisdn}.")
-
-                    qs_update_query = "UPDATE quant_services SET amount_left = %s WHERE p_id = %s AND s_type_id = %s;"
-                    cur.execute(qs_update_query, (subscriber_data.quant_amount_left, existing_person_id,
-                                                  subscriber_data.quant_s_type_id))
-
-                    if cur.rowcount == 0:
-                        qs_insert_query = """
-                                          INSERT INTO quant_services (p_id, s_type_id, amount_left)
-                                          VALUES (%s, %s, %s)
-                                          RETURNING id;
-                                          """
-                        cur.execute(qs_insert_query, (existing_person_id, subscriber_data.quant_s_type_id,
-                                                      subscriber_data.quant_amount_left))
-                        inserted_quant_row = cur.fetchone()
-                        if not inserted_quant_row:
+                    if state['t_id'] == subscriber_data.tariff_id_logical:
+                        # Тариф не меняется - текущая запись person_tariff остается
+                        new_person_tariff_id = state['tariff_id']
+                        report.person_tariff_skipped += 1
+                    else:
+                        execute_statement(
+                            cur, "person_tariff_insert", (subscriber_data.tariff_id_logical, current_timestamp)
+                        )
+                        new_person_tariff_row = cur.fetchone()
+                        if not new_person_tariff_row:
                             logger.error(
-                                f"Не удалось создать запись в 'quant_services' для person_id: {existing_person_id} (msisdn: {msisdn}) при обновлении. Транзакция будет отменена.")
+                                f"Не удалось создать запись в 'person_tariff' для обновления msisdn: {msisdn}. Транзакция будет отменена.")
                             conn.rollback()
                             return {}
+                        new_person_tariff_id = new_person_tariff_row['id']
                         logger.debug(
-                            f"Запись 'quant_services' (id: {inserted_quant_row['id']}) создана для person_id: {existing_person_id} при обновлении.")
+                            f"Новая запись 'person_tariff' (id: {new_person_tariff_id}) создана для msisdn: {msisdn} при обновлении.")
+
+                    if _person_matches(state, subscriber_data, new_person_tariff_id):
+                        report.unchanged += 1
+                        logger.debug(f"Запись 'person' (id: {existing_person_id}) уже в нужном состоянии.")
                     else:
-                        logger.debug(
-                            f"Запись 'quant_services' обновлена для person_id: {existing_person_id} (msisdn: {msisdn}).")
+                        final_name = f"{subscriber_data.name_prefix}{existing_person_id}"
+                        person_update_values = (
+                            subscriber_data.money,
+                            subscriber_data.is_restricted,
+                            subscriber_data.description,
+                            new_person_tariff_id,
+                            final_name,
+                            existing_person_id
+                        )
+                        execute_statement(cur, "person_update", person_update_values)
+                        if cur.rowcount == 0:
+                            logger.warning(
+                                f"Обновление 'person' для ID {existing_person_id} (msisdn: {msisdn}) не затронуло ни одной строки. Это неожиданно.")
+                        report.updated += 1
+                        logger.debug(f"Запись 'person' (id: {existing_person_id}) обновлена для msisdn: {msisdn}.")
+
+                    if state['quants'].get(subscriber_data.quant_s_type_id) == subscriber_data.quant_amount_left:
+                        report.quant_skipped += 1
+                        logger.debug(f"Запись 'quant_services' для person_id: {existing_person_id} уже в нужном состоянии.")
+                    else:
+                        execute_statement(cur, "quant_services_update", (subscriber_data.quant_amount_left,
+                                                                         existing_person_id,
+                                                                         subscriber_data.quant_s_type_id))
+
+                        if cur.rowcount == 0:
+                            execute_statement(cur, "quant_services_insert", (existing_person_id,
+                                                                             subscriber_data.quant_s_type_id,
+                                                                             subscriber_data.quant_amount_left))
+                            inserted_quant_row = cur.fetchone()
+                            if not inserted_quant_row:
+                                logger.error(
+                                    f"Не удалось создать запись в 'quant_services' для person_id: {existing_person_id} (msisdn: {msisdn}) при обновлении. Транзакция будет отменена.")
+                                conn.rollback()
+                                return {}
+                            logger.debug(
+                                f"Запись 'quant_services' (id: {inserted_quant_row['id']}) создана для person_id: {existing_person_id} при обновлении.")
+                        else:
+                            logger.debug(
+                                f"Запись 'quant_services' обновлена для person_id: {existing_person_id} (msisdn: {msisdn}).")
 
                     final_processed_ids_map[msisdn] = existing_person_id
                     logger.info(f"Успешно обновлен абонент {msisdn} (person.id: {existing_person_id}).")
@@ -190,12 +402,9 @@ def create_or_update_subscribers_with_related_data(  # Функция переи
                 else:
                     logger.info(f"Создание нового абонента для {msisdn}.")
 
-                    person_tariff_insert_query = """
-                                                 INSERT INTO person_tariff (t_id, start_date)
-                                                 VALUES (%s, %s)
-                                                 RETURNING id;
-                                                 """
-                    cur.execute(person_tariff_insert_query, (subscriber_data.tariff_id_logical, current_timestamp))
+                    execute_statement(
+                        cur, "person_tariff_insert", (subscriber_data.tariff_id_logical, current_timestamp)
+                    )
                     inserted_person_tariff_row = cur.fetchone()
                     if not inserted_person_tariff_row:
                         logger.error(
@@ -205,11 +414,6 @@ def create_or_update_subscribers_with_related_data(  # Функция переи
                     new_person_tariff_id = inserted_person_tariff_row['id']
                     logger.debug(f"Запись 'person_tariff' (id: {new_person_tariff_id}) создана для msisdn: {msisdn}.")
 
-                    person_insert_query = """
-                                          INSERT INTO person (msisdn, money, is_restricted, reg_data, description, tariff_id)
-                                          VALUES (%s, %s, %s, %s, %s, %s)
-                                          RETURNING id;
-                                          """
                     person_insert_values = (
                         msisdn,
                         subscriber_data.money,
@@ -218,7 +422,7 @@ def create_or_update_subscribers_with_related_data(  # Функция переи
                         subscriber_data.description,
                         new_person_tariff_id
                     )
-                    cur.execute(person_insert_query, person_insert_values)
+                    execute_statement(cur, "person_insert", person_insert_values)
                     inserted_person_row = cur.fetchone()
                     if not inserted_person_row:
                         logger.error(
@@ -228,21 +432,15 @@ def create_or_update_subscribers_with_related_data(  # Функция переи
                     new_person_id = inserted_person_row['id']
 
                     final_name = f"{subscriber_data.name_prefix}{new_person_id}"
-                    person_update_name_query = "UPDATE person SET name = %s WHERE id = %s;"
-                    cur.execute(person_update_name_query, (final_name, new_person_id))
+                    execute_statement(cur, "person_name_update", (final_name, new_person_id))
                     if cur.rowcount == 0:
                         logger.warning(
                             f"Обновление имени для только что созданного person.id {new_person_id} (msisdn: {msisdn}) не затронуло ни одной строки.")
                     logger.debug(
                         f"Абонент 'person' (id: {new_person_id}, msisdn: {msisdn}) создан, имя обновлено на '{final_name}'.")
 
-                    quant_services_insert_query = """
-                                                  INSERT INTO quant_services (p_id, s_type_id, amount_left)
-                                                  VALUES (%s, %s, %s)
-                                                  RETURNING id;
-                                                  """
-                    cur.execute(quant_services_insert_query,
-                                (new_person_id, subscriber_data.quant_s_type_id, subscriber_data.quant_amount_left))
+                    execute_statement(cur, "quant_services_insert",
+                                      (new_person_id, subscriber_data.quant_s_type_id, subscriber_data.quant_amount_left))
                     inserted_quant_row = cur.fetchone()
                     if not inserted_quant_row:
                         logger.error(
@@ -253,11 +451,15 @@ def create_or_update_subscribers_with_related_data(  # Функция переи
                         f"Запись 'quant_services' (id: {inserted_quant_row['id']}) создана для person_id: {new_person_id}.")
 
                     final_processed_ids_map[msisdn] = new_person_id
+                    report.created += 1
                     logger.info(f"Успешно создан абонент {msisdn} (person.id: {new_person_id}) и связанные записи.")
 
             conn.commit()
+            count("provision.skipped_rows", report.skipped_rows)
             logger.info(
-                f"Транзакция успешно зафиксирована. Всего обработано абонентов: {len(subscribers_to_process)}."
+                f"Транзакция успешно зафиксирована. Всего обработано абонентов: {len(subscribers_to_process)} "
+                f"(создано {report.created}, обновлено {report.updated}, без изменений {report.unchanged}, "
+                f"пропущено person_tariff {report.person_tariff_skipped}, quant_services {report.quant_skipped})."
             )
             return final_processed_ids_map
 
@@ -280,3 +482,221 @@ def create_or_update_subscribers_with_related_data(  # Функция переи
                 logger.error(f"Ошибка при попытке отката транзакции после непредвиденной ошибки: {roll_e}",
                              exc_info=True)
         return {}
+
+
+@timed(PHASE_PROVISION)
+def bulk_create_or_update_subscribers_with_related_data(
+        conn: psycopg.Connection,
+        subscribers_to_process: list[SubscriberCreationData],
+        report: ProvisioningReport | None = None,
+) -> dict[str, int]:
+    """
+    Пакетный вариант create_or_update_subscribers_with_related_data с тем же сравнением состояния и тем же
+    правилом start_date: текущие person/quant_services читаются одним join со стейджингом,
+    изменяются только отличающиеся строки.
+    """
+    report = report if report is not None else ProvisioningReport()
+    if not conn or conn.closed:
+        logger.error("Соединение с БД отсутствует.")
+        return {}
+    if not subscribers_to_process:
+        return {}
+
+    # При повторе msisdn побеждает последнее вхождение
+    unique_subscribers = {data.msisdn: data for data in subscribers_to_process}
+    current_timestamp = datetime.now()
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                CREATE TEMP TABLE subscriber_stage
+                (
+                    msisdn            text PRIMARY KEY,
+                    money             numeric,
+                    tariff_id_logical integer,
+                    is_restricted     boolean,
+                    description       text,
+                    name_prefix       text,
+                    quant_s_type_id   integer,
+                    quant_amount_left integer,
+                    person_tariff_id  bigint,
+                    person_id         bigint,
+                    is_new            boolean NOT NULL DEFAULT false,
+                    tariff_unchanged  boolean NOT NULL DEFAULT false,
+                    person_unchanged  boolean NOT NULL DEFAULT false,
+                    quant_unchanged   boolean NOT NULL DEFAULT false
+                ) ON COMMIT DROP;
+                """
+            )
+            with cur.copy(
+                    """
+                    COPY subscriber_stage (msisdn, money, tariff_id_logical, is_restricted, description,
+                                           name_prefix, quant_s_type_id, quant_amount_left) FROM STDIN
+                    """
+            ) as copy:
+                for data in unique_subscribers.values():
+                    copy.write_row((
+                        data.msisdn,
+                        data.money,
+                        data.tariff_id_logical,
+                        data.is_restricted,
+                        data.description,
+                        data.name_prefix,
+                        data.quant_s_type_id,
+                        data.quant_amount_left,
+                    ))
+            cur.execute("ANALYZE subscriber_stage;")
+
+            # Сравнение с текущим состоянием: при том же логическом тарифе остается прежняя запись person_tariff
+            cur.execute(
+                """
+                UPDATE subscriber_stage s
+                SET person_id        = p.id,
+                    tariff_unchanged = pt.t_id IS NOT DISTINCT FROM s.tariff_id_logical,
+                    person_tariff_id = CASE WHEN pt.t_id IS NOT DISTINCT FROM s.tariff_id_logical THEN p.tariff_id END,
+                    person_unchanged = pt.t_id IS NOT DISTINCT FROM s.tariff_id_logical
+                        AND p.money IS NOT DISTINCT FROM s.money
+                        AND p.is_restricted IS NOT DISTINCT FROM s.is_restricted
+                        AND p.description IS NOT DISTINCT FROM s.description
+                        AND p.name IS NOT DISTINCT FROM s.name_prefix || p.id,
+                    quant_unchanged  = EXISTS (SELECT 1
+                                               FROM quant_services q
+                                               WHERE q.p_id = p.id
+                                                 AND q.s_type_id = s.quant_s_type_id
+                                                 AND q.amount_left = s.quant_amount_left)
+                FROM person p
+                         LEFT JOIN person_tariff pt ON pt.id = p.tariff_id
+                WHERE p.msisdn = s.msisdn;
+                """
+            )
+
+            # Идентификаторы person_tariff выдаются заранее, чтобы связать их с абонентами без RETURNING по строкам
+            cur.execute(
+                """
+                UPDATE subscriber_stage
+                SET person_tariff_id = nextval(pg_get_serial_sequence('person_tariff', 'id'))
+                WHERE NOT tariff_unchanged;
+                """
+            )
+            cur.execute(
+                """
+                INSERT INTO person_tariff (id, t_id, start_date)
+                SELECT person_tariff_id, tariff_id_logical, %s
+                FROM subscriber_stage
+                WHERE NOT tariff_unchanged;
+                """,
+                (current_timestamp,)
+            )
+
+            cur.execute(
+                """
+                UPDATE person p
+                SET money         = s.money,
+                    is_restricted = s.is_restricted,
+                    description   = s.description,
+                    tariff_id     = s.person_tariff_id,
+                    name          = s.name_prefix || p.id
+                FROM subscriber_stage s
+                WHERE s.person_id = p.id
+                  AND NOT s.person_unchanged;
+                """
+            )
+            updated_count = cur.rowcount
+
+            cur.execute(
+                """
+                WITH inserted AS (
+                    INSERT INTO person (msisdn, money, is_restricted, reg_data, description, tariff_id)
+                        SELECT msisdn, money, is_restricted, %s, description, person_tariff_id
+                        FROM subscriber_stage
+                        WHERE person_id IS NULL
+                        RETURNING id, msisdn)
+                UPDATE subscriber_stage s
+                SET person_id = i.id,
+                    is_new    = true
+                FROM inserted i
+                WHERE s.msisdn = i.msisdn;
+                """,
+                (current_timestamp,)
+            )
+            inserted_count = cur.rowcount
+            # Имя зависит от person.id, поэтому для новых абонентов проставляется отдельным шагом
+            cur.execute(
+                """
+                UPDATE person p
+                SET name = s.name_prefix || p.id
+                FROM subscriber_stage s
+                WHERE s.person_id = p.id
+                  AND s.is_new;
+                """
+            )
+
+            cur.execute(
+                """
+                UPDATE quant_services q
+                SET amount_left = s.quant_amount_left
+                FROM subscriber_stage s
+                WHERE q.p_id = s.person_id
+                  AND q.s_type_id = s.quant_s_type_id
+                  AND NOT s.quant_unchanged;
+                """
+            )
+            cur.execute(
+                """
+                INSERT INTO quant_services (p_id, s_type_id, amount_left)
+                SELECT s.person_id, s.quant_s_type_id, s.quant_amount_left
+                FROM subscriber_stage s
+                WHERE NOT EXISTS (SELECT 1
+                                  FROM quant_services q
+                                  WHERE q.p_id = s.person_id
+                                    AND q.s_type_id = s.quant_s_type_id);
+                """
+            )
+
+            cur.execute(
+                """
+                SELECT count(*) FILTER (WHERE person_unchanged),
+                       count(*) FILTER (WHERE tariff_unchanged),
+                       count(*) FILTER (WHERE quant_unchanged)
+                FROM subscriber_stage;
+                """
+            )
+            unchanged_count, person_tariff_skipped, quant_skipped = cur.fetchone()
+
+            cur.execute("SELECT msisdn, person_id FROM subscriber_stage;")
+            final_processed_ids_map = {msisdn: person_id for msisdn, person_id in cur.fetchall()}
+
+        conn.commit()
+        report.created += inserted_count
+        report.updated += updated_count
+        report.unchanged += unchanged_count
+        report.person_tariff_skipped += person_tariff_skipped
+        report.quant_skipped += quant_skipped
+        count("provision.skipped_rows", unchanged_count + person_tariff_skipped + quant_skipped)
+        logger.info(
+            f"Пакетная загрузка абонентов зафиксирована: обновлено {updated_count}, создано {inserted_count}, "
+            f"без изменений {unchanged_count}, пропущено person_tariff {person_tariff_skipped}, "
+            f"quant_services {quant_skipped}."
+        )
+        return final_processed_ids_map
+
+    except psycopg.Error as e:
+        logger.error(f"Ошибка psycopg при пакетной загрузке абонентов: {e}", exc_info=True)
+        if conn and not conn.closed:
+            try:
+                conn.rollback()
+                logger.info("Транзакция отменена из-за ошибки psycopg.")
+            except Exception as roll_e:
+                logger.error(f"Ошибка при попытке отката транзакции после ошибки psycopg: {roll_e}", exc_info=True)
+        return {}
+    except Exception as e:
+        logger.error(f"Произошла непредвиденная ошибка при пакетной загрузке абонентов: {e}", exc_info=True)
+        if conn and not conn.closed:
+            try:
+                conn.rollback()
+                logger.info("Транзакция отменена из-за непредвиденной ошибки.")
+            except Exception as roll_e:
+                logger.error(f"Ошибка при попытке отката транзакции после непредвиденной ошибки: {roll_e}",
+                             exc_info=True)
+        return {}
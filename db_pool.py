@@ -0,0 +1,109 @@
+import logging
+import threading
+
+import psycopg
+from psycopg_pool import AsyncConnectionPool, ConnectionPool, PoolTimeout
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+BRT_POOL_NAME = "brt"
+HRS_POOL_NAME = "hrs"
+
+_pools: dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _reset_connection(conn: psycopg.Connection):
+    # Незавершенную транзакцию пул уже откатил; возвращаем сессию к исходным настройкам.
+    # DISCARD ALL не используется, чтобы не терять подготовленные выражения соединения.
+    conn.autocommit = True
+    conn.execute("RESET ALL;")
+    conn.autocommit = False
+
+
+async def _reset_async_connection(conn: psycopg.AsyncConnection):
+    await conn.set_autocommit(True)
+    await conn.execute("RESET ALL;")
+    await conn.set_autocommit(False)
+
+
+def _create_pool(name: str, conninfo: str) -> ConnectionPool:
+    settings = get_settings()
+    pool = ConnectionPool(
+        conninfo,
+        min_size=settings.db_pool_min_size,
+        max_size=settings.db_pool_max_size,
+        timeout=settings.db_pool_timeout_s,
+        max_idle=settings.db_pool_max_idle_s,
+        kwargs={"autocommit": False},
+        check=ConnectionPool.check_connection,
+        reset=_reset_connection,
+        name=name,
+        open=False,
+    )
+    pool.open(wait=False)
+    logger.info(
+        f"Пул соединений {name} открыт (min={settings.db_pool_min_size}, max={settings.db_pool_max_size})."
+    )
+    return pool
+
+
+def _get_pool(name: str, conninfo: str) -> ConnectionPool:
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None or pool.closed:
+            pool = _pools[name] = _create_pool(name, conninfo)
+        return pool
+
+
+def get_brt_pool() -> ConnectionPool:
+    return _get_pool(BRT_POOL_NAME, get_settings().get_brt_db_url())
+
+
+def get_hrs_pool() -> ConnectionPool:
+    return _get_pool(HRS_POOL_NAME, get_settings().get_hrs_db_url())
+
+
+def wait_pool_ready(pool: ConnectionPool, timeout_s: float | None = None) -> bool:
+    timeout_s = get_settings().db_pool_open_timeout_s if timeout_s is None else timeout_s
+    try:
+        # При неудаче psycopg_pool закрывает пул; следующий get_*_pool создаст его заново
+        pool.wait(timeout=timeout_s)
+        return True
+    except PoolTimeout as e:
+        logger.error(f"Пул соединений {pool.name} не готов за {timeout_s} с: {e}")
+        return False
+
+
+def close_pools():
+    with _pools_lock:
+        for name, pool in _pools.items():
+            if not pool.closed:
+                pool.close()
+                logger.info(f"Пул соединений {name} закрыт.")
+        _pools.clear()
+
+
+async def open_async_brt_pool(max_size: int | None = None) -> AsyncConnectionPool:
+    """
+    Асинхронный пул к BRT для asyncio-сценариев. Пул привязан к текущему циклу событий,
+    поэтому не кешируется: закрывает его вызывающий.
+    """
+    settings = get_settings()
+    pool = AsyncConnectionPool(
+        settings.get_brt_db_url(),
+        min_size=settings.db_pool_min_size,
+        max_size=max_size or settings.db_pool_max_size,
+        timeout=settings.db_pool_timeout_s,
+        max_idle=settings.db_pool_max_idle_s,
+        kwargs={"autocommit": False},
+        check=AsyncConnectionPool.check_connection,
+        reset=_reset_async_connection,
+        name=f"{BRT_POOL_NAME}-async",
+        open=False,
+    )
+    await pool.open(wait=True, timeout=settings.db_pool_open_timeout_s)
+    logger.info(f"Асинхронный пул соединений {pool.name} открыт.")
+    return pool
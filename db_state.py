@@ -0,0 +1,165 @@
+import logging
+import time
+
+import psycopg
+from psycopg import sql
+from psycopg_pool import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# Одним выражением выставляет каждую последовательность, принадлежащую столбцу таблицы, на MAX(столбец) + 1
+RESET_ALL_SEQUENCES_SQL = """
+DO
+$$
+    DECLARE
+        r record;
+    BEGIN
+        FOR r IN
+            SELECT s.oid::regclass AS seq, t.oid::regclass AS tbl, a.attname AS col, ps.seqmin
+            FROM pg_class s
+                     JOIN pg_namespace n ON n.oid = s.relnamespace
+                     JOIN pg_sequence ps ON ps.seqrelid = s.oid
+                     JOIN pg_depend d ON d.objid = s.oid
+                AND d.classid = 'pg_class'::regclass
+                AND d.refclassid = 'pg_class'::regclass
+                AND d.deptype IN ('a', 'i')
+                     JOIN pg_class t ON t.oid = d.refobjid
+                     JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = d.refobjsubid
+            WHERE s.relkind = 'S'
+              AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+              AND n.nspname NOT LIKE 'pg_toast%'
+            LOOP
+                EXECUTE format(
+                        'SELECT setval(%L, COALESCE((SELECT max(%I) FROM %s) + 1, %s), false)',
+                        r.seq, r.col, r.tbl, r.seqmin
+                        );
+            END LOOP;
+    END
+$$;
+"""
+
+TABLES_QUERY = """
+               SELECT c.relname
+               FROM pg_class c
+                        JOIN pg_namespace n ON n.oid = c.relnamespace
+               WHERE n.nspname = %s
+                 AND c.relkind IN ('r', 'p')
+                 AND NOT c.relispartition;
+               """
+
+FOREIGN_KEYS_QUERY = """
+                     SELECT child.relname, parent.relname
+                     FROM pg_constraint con
+                              JOIN pg_class child ON child.oid = con.conrelid
+                              JOIN pg_class parent ON parent.oid = con.confrelid
+                              JOIN pg_namespace n ON n.oid = child.relnamespace
+                     WHERE con.contype = 'f'
+                       AND n.nspname = %s
+                       AND child.oid <> parent.oid;
+                     """
+
+COPYABLE_COLUMNS_QUERY = """
+                         SELECT a.attname
+                         FROM pg_attribute a
+                                  JOIN pg_class c ON c.oid = a.attrelid
+                                  JOIN pg_namespace n ON n.oid = c.relnamespace
+                         WHERE n.nspname = %s
+                           AND c.relname = %s
+                           AND a.attnum > 0
+                           AND NOT a.attisdropped
+                           AND a.attgenerated = ''
+                         ORDER BY a.attnum;
+                         """
+
+
+def reset_all_sequences(conn: psycopg.Connection):
+    with conn.cursor() as cur:
+        cur.execute(RESET_ALL_SEQUENCES_SQL)
+
+
+def _order_by_foreign_keys(tables: list[str], foreign_keys: list[tuple[str, str]]) -> list[str]:
+    # Родительские таблицы идут раньше дочерних, чтобы COPY не нарушал внешние ключи
+    parents: dict[str, set[str]] = {table: set() for table in tables}
+    for child, parent in foreign_keys:
+        if child in parents and parent in parents:
+            parents[child].add(parent)
+    ordered: list[str] = []
+    while parents:
+        ready = sorted(table for table, deps in parents.items() if not deps)
+        if not ready:
+            # Цикл внешних ключей - оставшиеся таблицы копируются как есть
+            ready = sorted(parents)
+            logger.warning(f"Цикл внешних ключей между таблицами {ready}, порядок восстановления не гарантирован.")
+        for table in ready:
+            del parents[table]
+        for deps in parents.values():
+            deps.difference_update(ready)
+        ordered.extend(ready)
+    return ordered
+
+
+class DbStateManager:
+    """
+    Снимок данных схемы в памяти (COPY BINARY) и его восстановление через TRUNCATE + COPY в одной транзакции.
+    """
+
+    def __init__(self, pool: ConnectionPool, schema: str = "public", tables: list[str] | None = None):
+        self._pool = pool
+        self._schema = schema
+        self._tables = tables
+        self._baseline: list[tuple[str, list[str], bytes]] = []
+
+    @property
+    def has_baseline(self) -> bool:
+        return bool(self._baseline)
+
+    def _discover_tables(self, cur: psycopg.Cursor) -> list[str]:
+        if self._tables is not None:
+            tables = list(self._tables)
+        else:
+            cur.execute(TABLES_QUERY, (self._schema,))
+            tables = [row[0] for row in cur.fetchall()]
+        cur.execute(FOREIGN_KEYS_QUERY, (self._schema,))
+        return _order_by_foreign_keys(tables, cur.fetchall())
+
+    def _qualified(self, table: str) -> sql.Identifier:
+        return sql.Identifier(self._schema, table)
+
+    def capture_baseline(self):
+        started_at = time.monotonic()
+        baseline = []
+        with self._pool.connection() as conn:
+            with conn.cursor() as cur:
+                for table in self._discover_tables(cur):
+                    cur.execute(COPYABLE_COLUMNS_QUERY, (self._schema, table))
+                    columns = [row[0] for row in cur.fetchall()]
+                    copy_sql = sql.SQL("COPY {} ({}) TO STDOUT (FORMAT BINARY)").format(
+                        self._qualified(table), sql.SQL(", ").join(map(sql.Identifier, columns))
+                    )
+                    with cur.copy(copy_sql) as copy:
+                        data = b"".join(bytes(block) for block in copy)
+                    baseline.append((table, columns, data))
+        self._baseline = baseline
+        logger.info(
+            f"Снимок БД сохранен: {len(baseline)} таблиц, {sum(len(d) for _, _, d in baseline)} байт "
+            f"за {time.monotonic() - started_at:.3f} с."
+        )
+
+    def restore_baseline(self):
+        if not self._baseline:
+            raise RuntimeError("Снимок БД не сохранен: сначала вызовите capture_baseline().")
+        started_at = time.monotonic()
+        with self._pool.connection() as conn:
+            with conn.transaction():
+                with conn.cursor() as cur:
+                    cur.execute(sql.SQL("TRUNCATE {};").format(
+                        sql.SQL(", ").join(self._qualified(table) for table, _, _ in self._baseline)
+                    ))
+                    for table, columns, data in self._baseline:
+                        copy_sql = sql.SQL("COPY {} ({}) FROM STDIN (FORMAT BINARY)").format(
+                            self._qualified(table), sql.SQL(", ").join(map(sql.Identifier, columns))
+                        )
+                        with cur.copy(copy_sql) as copy:
+                            copy.write(data)
+                reset_all_sequences(conn)
+        logger.info(f"БД восстановлена из снимка за {time.monotonic() - started_at:.3f} с.")
@@ -0,0 +1,167 @@
+import logging
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterable, Iterator
+
+import psycopg
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+HRS_STREAM_ITERSIZE = 5_000
+
+# Суммарные начисления HRS по абоненту с момента %(since)s;
+# порядок COLLATE "C" совпадает с сортировкой строк в Python
+HRS_CHARGES_BY_MSISDN_QUERY = """
+                              SELECT msisdn, SUM(cost) AS total_cost
+                              FROM call_charges
+                              WHERE created_at >= %(since)s
+                              GROUP BY msisdn
+                              ORDER BY msisdn COLLATE "C";
+                              """
+
+# Только абоненты прогона: таблица person общая с другими воркерами и реальными абонентами
+BRT_BALANCES_BY_MSISDN_QUERY = """
+                               SELECT msisdn, money
+                               FROM person
+                               WHERE msisdn = ANY(%(msisdns)s)
+                               ORDER BY msisdn COLLATE "C";
+                               """
+
+
+def _stream(
+        conn: psycopg.Connection,
+        cursor_name: str,
+        query: str,
+        params: dict | None = None,
+) -> Iterator[tuple[str, Decimal]]:
+    with conn.cursor(name=cursor_name) as cur:
+        cur.itersize = HRS_STREAM_ITERSIZE
+        cur.execute(query, params)
+        for msisdn, amount in cur:
+            yield msisdn, Decimal(str(amount)) if amount is not None else None
+
+
+def iter_hrs_charges(
+        hrs_conn: psycopg.Connection,
+        since: datetime = datetime.min,
+        query: str = HRS_CHARGES_BY_MSISDN_QUERY,
+) -> Iterator[tuple[str, Decimal]]:
+    yield from _stream(hrs_conn, "hrs_charges_stream", query, {"since": since})
+
+
+def get_hrs_charge_total(
+        hrs_conn: psycopg.Connection,
+        msisdn: str,
+        since: datetime = datetime.min,
+) -> Decimal | None:
+    try:
+        with hrs_conn.cursor() as cur:
+            cur.execute(
+                "SELECT COALESCE(SUM(cost), 0) FROM call_charges WHERE msisdn = %s AND created_at >= %s;",
+                (msisdn, since)
+            )
+            return Decimal(str(cur.fetchone()[0]))
+    except psycopg.Error as e:
+        logger.error(f"Ошибка psycopg при получении начислений HRS для MSISDN {msisdn}: {e}", exc_info=True)
+        return None
+
+
+class ChargeMismatch(BaseModel):
+    msisdn: str
+    brt_delta: Decimal | None
+    hrs_charge: Decimal | None
+    reason: str
+
+
+class ChargeReconciler:
+    """
+    Потоковая сверка: списание в BRT (начальный баланс - текущий person.money) против начислений HRS
+    с момента начала прогона. Все три источника читаются упорядоченными по msisdn и сливаются за один проход.
+    Начисления HRS по абонентам вне прогона (например, других воркеров) пропускаются и только считаются;
+    хвост потока HRS после последнего абонента прогона не читается.
+    """
+
+    def __init__(
+            self,
+            brt_conn: psycopg.Connection,
+            hrs_conn: psycopg.Connection,
+            since: datetime,
+            hrs_query: str = HRS_CHARGES_BY_MSISDN_QUERY,
+    ):
+        self._brt_conn = brt_conn
+        self._hrs_conn = hrs_conn
+        self._since = since
+        self._hrs_query = hrs_query
+        self.checked = 0
+        self.mismatched = 0
+        self.untracked_hrs_rows = 0
+
+    def iter_mismatches(self, initial_balances: Iterable[tuple[str, int | Decimal]]) -> Iterator[ChargeMismatch]:
+        """
+        initial_balances - начальные балансы абонентов прогона, отсортированные по msisdn.
+        """
+        initial_balances = list(initial_balances)
+        yield from self.merge(
+            initial_balances,
+            _stream(
+                self._brt_conn, "brt_balances_stream", BRT_BALANCES_BY_MSISDN_QUERY,
+                {"msisdns": [msisdn for msisdn, _ in initial_balances]},
+            ),
+            iter_hrs_charges(self._hrs_conn, self._since, self._hrs_query),
+        )
+
+    def merge(
+            self,
+            initial_balances: Iterable[tuple[str, int | Decimal]],
+            brt_rows: Iterator[tuple[str, Decimal | None]],
+            hrs_rows: Iterator[tuple[str, Decimal]],
+    ) -> Iterator[ChargeMismatch]:
+        """
+        Слияние трех потоков, отсортированных по msisdn: начальные балансы, текущие балансы BRT и начисления HRS.
+        """
+        brt_row = next(brt_rows, None)
+        hrs_row = next(hrs_rows, None)
+        previous_msisdn = None
+
+        for msisdn, initial_money in initial_balances:
+            if previous_msisdn is not None and msisdn <= previous_msisdn:
+                raise ValueError(f"initial_balances не отсортированы по msisdn: {previous_msisdn} -> {msisdn}")
+            previous_msisdn = msisdn
+
+            while brt_row is not None and brt_row[0] < msisdn:
+                brt_row = next(brt_rows, None)
+            while hrs_row is not None and hrs_row[0] < msisdn:
+                self.untracked_hrs_rows += 1
+                hrs_row = next(hrs_rows, None)
+
+            self.checked += 1
+            hrs_charge = Decimal(0)
+            if hrs_row is not None and hrs_row[0] == msisdn:
+                hrs_charge = hrs_row[1]
+                hrs_row = next(hrs_rows, None)
+
+            if brt_row is None or brt_row[0] != msisdn or brt_row[1] is None:
+                yield from self._report(ChargeMismatch(
+                    msisdn=msisdn, brt_delta=None, hrs_charge=hrs_charge, reason="missing_in_brt"
+                ))
+                continue
+
+            brt_delta = Decimal(str(initial_money)) - brt_row[1]
+            if brt_delta != hrs_charge:
+                yield from self._report(ChargeMismatch(
+                    msisdn=msisdn, brt_delta=brt_delta, hrs_charge=hrs_charge, reason="amount_mismatch"
+                ))
+
+        logger.info(
+            f"Сверка BRT/HRS завершена: проверено {self.checked}, расхождений {self.mismatched}, "
+            f"начислений HRS вне прогона {self.untracked_hrs_rows}."
+        )
+
+    def _report(self, mismatch: ChargeMismatch) -> Iterator[ChargeMismatch]:
+        self.mismatched += 1
+        logger.warning(
+            f"Расхождение BRT/HRS для {mismatch.msisdn}: списано в BRT {mismatch.brt_delta}, "
+            f"начислено в HRS {mismatch.hrs_charge} ({mismatch.reason})"
+        )
+        yield mismatch
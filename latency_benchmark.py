@@ -0,0 +1,461 @@
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Iterable
+
+import psycopg
+from psycopg_pool import ConnectionPool
+
+from bench_history import BRT_COMMIT_ENV, brt_commit, connect_history, record_results
+from cdr_generator import CALL_TYPE_OUTGOING, CDR_DATETIME_FORMAT
+from config import Settings, get_settings
+from database import bulk_create_or_update_subscribers_with_related_data, get_sub_balances
+from db_pool import close_pools, get_brt_pool
+from msisdn_allocator import MsisdnAllocator
+from open_loop_load import OpenLoopRun, RateSchedule, RateStep
+from queue_monitor import QueueDepthSampler
+from rabbitmq_sender import RabbitMQPublisher, get_publisher, iter_cdr_messages, shutdown_publisher
+from statement_registry import statement_stats
+from subscriber_schema import SubscriberCreationData
+from utils import summarize_latencies
+
+logger = logging.getLogger(__name__)
+
+BENCH_TARIFF_ID = 11
+BENCH_INITIAL_BALANCE = 1_000_000
+BENCH_EXTERNAL_CALLEE = "79888888888"
+BENCH_CALL_START = datetime(2025, 5, 1, 9, 0, 0)
+BENCH_CALL_DURATION = timedelta(seconds=60)
+DEFAULT_POLL_INTERVAL_S = 0.02
+DEFAULT_DRAIN_TIMEOUT_S = 60.0
+
+
+def benchmark_msisdn_range(worker_index: int, settings: Settings | None = None) -> tuple[int, int]:
+    settings = settings or get_settings()
+    if not 0 <= worker_index < settings.benchmark_msisdn_max_workers:
+        raise ValueError(
+            f"Индекс бенчмарка {worker_index} вне диапазона "
+            f"0..{settings.benchmark_msisdn_max_workers - 1} (benchmark_msisdn_max_workers)"
+        )
+    start = settings.benchmark_msisdn_base + worker_index * settings.benchmark_msisdn_block_size
+    return start, start + settings.benchmark_msisdn_block_size
+
+
+class BalanceChangeObserver(threading.Thread):
+    """
+    Фоновый опрос person.money: CDR считается примененным, когда баланс его абонента отличается от начального.
+    У каждого CDR свой звонящий абонент, поэтому изменение баланса однозначно помечает CDR.
+    """
+
+    def __init__(self, pool: ConnectionPool, initial_balance: int, poll_interval_s: float = DEFAULT_POLL_INTERVAL_S):
+        super().__init__(name="balance-change-observer", daemon=True)
+        self._pool = pool
+        self._initial_balance = Decimal(initial_balance)
+        self._poll_interval_s = poll_interval_s
+        self._lock = threading.Lock()
+        self._pending: dict[str, float] = {}
+        self._stop_event = threading.Event()
+        self.latencies_s: list[float] = []
+        self.first_applied_at: float | None = None
+        self.last_applied_at: float | None = None
+        # Ошибка БД, на которой остановился опрос; латентности после нее неполные
+        self.error: str | None = None
+
+    def track(self, msisdns: list[str], sent_at: float):
+        with self._lock:
+            for msisdn in msisdns:
+                self._pending[msisdn] = sent_at
+
+    def track_each(self, sent_at_by_msisdn: Iterable[tuple[str, float]]):
+        with self._lock:
+            for msisdn, sent_at in sent_at_by_msisdn:
+                self._pending[msisdn] = sent_at
+
+    @property
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def run(self):
+        try:
+            with self._pool.connection() as conn:
+                while not self._stop_event.is_set():
+                    self._poll(conn)
+                    self._stop_event.wait(self._poll_interval_s)
+        except psycopg.Error as e:
+            logger.error(f"Опрос балансов бенчмарка остановлен ошибкой БД: {e}", exc_info=True)
+            self.error = repr(e)
+
+    def _poll(self, conn: psycopg.Connection):
+        with self._lock:
+            pending = list(self._pending)
+        if not pending:
+            return
+        balances = get_sub_balances(conn, pending)
+        if balances is None:
+            # get_sub_balances уже записал ошибку в лог
+            raise psycopg.OperationalError("не удалось получить балансы абонентов бенчмарка")
+        conn.rollback()
+        observed_at = time.monotonic()
+        applied = [
+            msisdn for msisdn, money in balances.items()
+            if money is not None and Decimal(str(money)) != self._initial_balance
+        ]
+        if applied:
+            with self._lock:
+                for msisdn in applied:
+                    self.latencies_s.append(observed_at - self._pending.pop(msisdn))
+            self.first_applied_at = self.first_applied_at or observed_at
+            self.last_applied_at = observed_at
+
+    def wait_drained(self, timeout_s: float) -> bool:
+        deadline = time.monotonic() + timeout_s
+        while self.pending_count and self.error is None and time.monotonic() < deadline:
+            time.sleep(self._poll_interval_s)
+        return self.pending_count == 0
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _build_cdr(caller_msisdn: str) -> dict:
+    return {
+        "callType": CALL_TYPE_OUTGOING,
+        "firstSubscriberMsisdn": caller_msisdn,
+        "secondSubscriberMsisdn": BENCH_EXTERNAL_CALLEE,
+        "callStart": BENCH_CALL_START.strftime(CDR_DATETIME_FORMAT),
+        "callEnd": (BENCH_CALL_START + BENCH_CALL_DURATION).strftime(CDR_DATETIME_FORMAT),
+    }
+
+
+def _provision_bench_subscribers(pool: ConnectionPool, msisdns: list[str]):
+    with pool.connection() as conn:
+        provisioned = bulk_create_or_update_subscribers_with_related_data(conn, [
+            SubscriberCreationData(
+                msisdn=msisdn,
+                money=BENCH_INITIAL_BALANCE,
+                tariff_id_logical=BENCH_TARIFF_ID,
+                name_prefix="Bench_",
+            )
+            for msisdn in msisdns
+        ])
+    if len(provisioned) != len(msisdns):
+        raise RuntimeError("Не удалось подготовить абонентов для бенчмарка")
+
+
+def _latency_result(
+        observer: BalanceChangeObserver,
+        cdrs: int,
+        started_at: float,
+        publish_finished_at: float,
+        drained: bool,
+        publish_errors: int,
+        poll_interval_s: float,
+) -> dict:
+    if observer.error is not None:
+        raise RuntimeError(f"Замер задержек прерван ошибкой опроса балансов: {observer.error}")
+    applied = len(observer.latencies_s)
+    elapsed_s = (observer.last_applied_at or publish_finished_at) - started_at
+    return {
+        "cdrs": cdrs,
+        "applied": applied,
+        "missing": observer.pending_count,
+        "drained": drained,
+        "publish_errors": publish_errors,
+        "publish_rate_cdr_s": cdrs / max(publish_finished_at - started_at, 1e-9),
+        "throughput_cdr_s": applied / max(elapsed_s, 1e-9),
+        "poll_interval_ms": poll_interval_s * 1000,
+        "latency": summarize_latencies(observer.latencies_s),
+    }
+
+
+def run_latency_benchmark(
+        batch_size: int,
+        batches: int,
+        allocator: MsisdnAllocator,
+        publisher: RabbitMQPublisher | None = None,
+        pool: ConnectionPool | None = None,
+        poll_interval_s: float = DEFAULT_POLL_INTERVAL_S,
+        drain_timeout_s: float = DEFAULT_DRAIN_TIMEOUT_S,
+) -> dict:
+    publisher = publisher or get_publisher()
+    pool = pool or get_brt_pool()
+
+    msisdns = allocator.allocate_many(batch_size * batches)
+    _provision_bench_subscribers(pool, msisdns)
+
+    observer = BalanceChangeObserver(pool, BENCH_INITIAL_BALANCE, poll_interval_s)
+    observer.start()
+    publish_errors = 0
+    started_at = time.monotonic()
+    try:
+        for batch_index in range(batches):
+            batch_msisdns = msisdns[batch_index * batch_size:(batch_index + 1) * batch_size]
+            body = json.dumps([_build_cdr(msisdn) for msisdn in batch_msisdns]).encode('utf-8')
+            sent_at = time.monotonic()
+            observer.track(batch_msisdns, sent_at)
+            if not publisher.publish_confirmed([body]).ok:
+                publish_errors += 1
+        publish_finished_at = time.monotonic()
+        drained = observer.wait_drained(drain_timeout_s)
+    finally:
+        observer.stop()
+
+    result = {
+        "mode": "closed_loop",
+        "batch_size": batch_size,
+        "batches": batches,
+        **_latency_result(
+            observer, len(msisdns), started_at, publish_finished_at, drained, publish_errors, poll_interval_s
+        ),
+    }
+    logger.info(
+        f"Бенчмарк batch_size={batch_size}: применено {result['applied']}/{len(msisdns)} CDR, "
+        f"p95={result['latency']['p95_ms']:.1f} мс, {result['throughput_cdr_s']:.1f} CDR/с"
+    )
+    return result
+
+
+def run_open_loop_latency_benchmark(
+        schedule: RateSchedule,
+        batch_size: int,
+        allocator: MsisdnAllocator,
+        publisher: RabbitMQPublisher | None = None,
+        pool: ConnectionPool | None = None,
+        burst: int = 1,
+        poll_interval_s: float = DEFAULT_POLL_INTERVAL_S,
+        drain_timeout_s: float = DEFAULT_DRAIN_TIMEOUT_S,
+) -> dict:
+    """
+    Задержка считается от планового времени отправки, поэтому очередь на стороне отправителя
+    (coordinated omission) входит в измерение.
+    """
+    pool = pool or get_brt_pool()
+    msisdns = allocator.allocate_many(schedule.total_cdrs + burst - 1)
+    _provision_bench_subscribers(pool, msisdns)
+
+    observer = BalanceChangeObserver(pool, BENCH_INITIAL_BALANCE, poll_interval_s)
+    run = OpenLoopRun(
+        schedule,
+        publisher,
+        burst=burst,
+        on_scheduled=lambda batch, intended_at: observer.track_each(
+            (cdr["firstSubscriberMsisdn"], sent_at) for cdr, sent_at in zip(batch, intended_at)
+        ),
+    )
+    batches = (
+        [_build_cdr(msisdn) for msisdn in msisdns[offset:offset + batch_size]]
+        for offset in range(0, len(msisdns), batch_size)
+    )
+    observer.start()
+    started_at = time.monotonic()
+    try:
+        open_loop = run.run(batches)
+        publish_finished_at = time.monotonic()
+        drained = observer.wait_drained(drain_timeout_s)
+    finally:
+        observer.stop()
+
+    report = open_loop.publish_report
+    result = {
+        "mode": "open_loop",
+        "batch_size": batch_size,
+        "schedule": schedule.model_dump(),
+        "target_cdrs": open_loop.target_cdrs,
+        "achieved_rate_cdr_s": open_loop.achieved_rate_cdr_s,
+        "send_lag": open_loop.send_lag,
+        **_latency_result(
+            observer, open_loop.cdrs, started_at, publish_finished_at, drained,
+            len(report.nacked) + len(report.returned) + len(report.unconfirmed), poll_interval_s
+        ),
+    }
+    logger.info(
+        f"Открытая нагрузка batch_size={batch_size}: применено {result['applied']}/{open_loop.cdrs} CDR, "
+        f"p95={result['latency']['p95_ms']:.1f} мс, {result['throughput_cdr_s']:.1f} CDR/с"
+    )
+    return result
+
+
+def run_batch_size_sweep(
+        total_cdrs: int,
+        batch_sizes: list[int],
+        allocator: MsisdnAllocator,
+        max_message_bytes: int | None = None,
+        publisher: RabbitMQPublisher | None = None,
+        pool: ConnectionPool | None = None,
+        poll_interval_s: float = DEFAULT_POLL_INTERVAL_S,
+        drain_timeout_s: float = DEFAULT_DRAIN_TIMEOUT_S,
+) -> list[dict]:
+    """
+    Отправляет одинаковый объем CDR, деля его на сообщения по batch_size записей (и не более max_message_bytes),
+    и для каждого размера измеряет сквозную пропускную способность и задержку. Сообщения публикуются
+    конвейером с подтверждениями, как в send_cdr_list_to_rabbitmq.
+    """
+    publisher = publisher or get_publisher()
+    pool = pool or get_brt_pool()
+    results = []
+    for batch_size in batch_sizes:
+        msisdns = allocator.allocate_many(total_cdrs)
+        _provision_bench_subscribers(pool, msisdns)
+        observer = BalanceChangeObserver(pool, BENCH_INITIAL_BALANCE, poll_interval_s)
+        message_sizes: list[int] = []
+
+        def bodies():
+            for chunk, body in iter_cdr_messages(
+                    (_build_cdr(msisdn) for msisdn in msisdns), batch_size, max_message_bytes
+            ):
+                message_sizes.append(len(body))
+                observer.track([cdr["firstSubscriberMsisdn"] for cdr in chunk], time.monotonic())
+                yield body
+
+        observer.start()
+        started_at = time.monotonic()
+        try:
+            report = publisher.publish_confirmed(bodies())
+            publish_finished_at = time.monotonic()
+            drained = observer.wait_drained(drain_timeout_s)
+        finally:
+            observer.stop()
+
+        result = {
+            "mode": "batch_sweep",
+            "batch_size": batch_size,
+            "max_message_bytes": max_message_bytes,
+            "messages": len(message_sizes),
+            "avg_message_bytes": sum(message_sizes) / len(message_sizes) if message_sizes else 0.0,
+            "max_message_bytes_observed": max(message_sizes, default=0),
+            **_latency_result(
+                observer, total_cdrs, started_at, publish_finished_at, drained,
+                len(report.nacked) + len(report.returned) + len(report.unconfirmed), poll_interval_s
+            ),
+        }
+        logger.info(
+            f"Перебор batch_size={batch_size}: {result['messages']} сообщений, "
+            f"p95={result['latency']['p95_ms']:.1f} мс, {result['throughput_cdr_s']:.1f} CDR/с"
+        )
+        results.append(result)
+    return results
+
+
+def _parse_rate_steps(values: list[str], ramp: bool) -> RateSchedule:
+    # Формат шага: "<CDR/с>:<секунды>"; при ramp каждый шаг после первого - плавный переход
+    steps = []
+    for index, value in enumerate(values):
+        rate, duration = value.split(":")
+        steps.append(RateStep(rate_cdr_s=float(rate), duration_s=float(duration), ramp=ramp and index > 0))
+    return RateSchedule(steps=steps)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Задержка BRT от публикации CDR до изменения person.money")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 100],
+                        help="Количество CDR в одном сообщении")
+    parser.add_argument("--batches", type=int, default=20, help="Количество сообщений на каждый размер")
+    parser.add_argument("--rate-steps", nargs="+", default=None,
+                        help="Открытая нагрузка: шаги расписания вида <CDR/с>:<секунды>")
+    parser.add_argument("--ramp", action="store_true", help="Плавно менять скорость между шагами расписания")
+    parser.add_argument("--burst", type=int, default=1, help="Емкость token bucket для открытой нагрузки")
+    parser.add_argument("--sweep-total-cdrs", type=int, default=None,
+                        help="Перебор размеров пачки: объем CDR, который делится на сообщения по каждому --batch-sizes")
+    parser.add_argument("--max-message-bytes", type=int, default=None,
+                        help="Ограничение размера тела сообщения для перебора размеров пачки")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL_S)
+    parser.add_argument("--drain-timeout", type=float, default=DEFAULT_DRAIN_TIMEOUT_S)
+    parser.add_argument("--worker-index", type=int, default=0,
+                        help="Блок MSISDN в диапазоне benchmark_msisdn_* (для одновременных прогонов бенчмарка)")
+    parser.add_argument("--queue-sample-interval", type=float, default=None,
+                        help="Период замера глубины очереди CDR в секундах; без параметра очередь не опрашивается")
+    parser.add_argument("--output", default="-", help="Файл для JSON-результата, '-' - stdout")
+    parser.add_argument("--history", default=None,
+                        help="Файл SQLite истории бенчмарков: результаты записываются для коммита BRT")
+    parser.add_argument("--commit", default=None, help=f"Коммит BRT для истории (по умолчанию ${BRT_COMMIT_ENV})")
+    args = parser.parse_args(argv)
+
+    commit_sha = None
+    if args.history:
+        # Проверяется до прогона, чтобы не потерять результаты многоминутного бенчмарка
+        try:
+            commit_sha = brt_commit(args.commit)
+        except ValueError as e:
+            parser.error(str(e))
+
+    try:
+        msisdn_range = benchmark_msisdn_range(args.worker_index)
+    except ValueError as e:
+        parser.error(str(e))
+    allocator = MsisdnAllocator(args.worker_index, msisdn_range=msisdn_range)
+    sampler = None
+    if args.queue_sample_interval:
+        publisher = get_publisher()
+        sampler = QueueDepthSampler(
+            interval_s=args.queue_sample_interval,
+            published_counter=lambda: publisher.published_count,
+        )
+        sampler.start()
+    try:
+        if args.sweep_total_cdrs:
+            results = run_batch_size_sweep(
+                args.sweep_total_cdrs,
+                args.batch_sizes,
+                allocator,
+                max_message_bytes=args.max_message_bytes,
+                poll_interval_s=args.poll_interval,
+                drain_timeout_s=args.drain_timeout,
+            )
+        elif args.rate_steps:
+            schedule = _parse_rate_steps(args.rate_steps, args.ramp)
+            results = [
+                run_open_loop_latency_benchmark(
+                    schedule,
+                    batch_size,
+                    allocator,
+                    burst=args.burst,
+                    poll_interval_s=args.poll_interval,
+                    drain_timeout_s=args.drain_timeout,
+                )
+                for batch_size in args.batch_sizes
+            ]
+        else:
+            results = [
+                run_latency_benchmark(
+                    batch_size,
+                    args.batches,
+                    allocator,
+                    poll_interval_s=args.poll_interval,
+                    drain_timeout_s=args.drain_timeout,
+                )
+                for batch_size in args.batch_sizes
+            ]
+    finally:
+        if sampler is not None:
+            sampler.stop()
+        shutdown_publisher()
+        close_pools()
+
+    output = {"results": results, "statements": statement_stats()}
+    if sampler is not None:
+        output["queue"] = {"summary": sampler.summary(), "samples": sampler.time_series()}
+    report = json.dumps(output, ensure_ascii=False, indent=2)
+    if args.history:
+        history = connect_history(args.history)
+        try:
+            record_results(history, results, commit_sha)
+        finally:
+            history.close()
+    if args.output == "-":
+        print(report)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+    return 0 if all(result["drained"] and not result["publish_errors"] for result in results) else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(main())
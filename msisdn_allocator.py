@@ -0,0 +1,58 @@
+import logging
+import os
+import threading
+
+from config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+XDIST_WORKER_ENV = "PYTEST_XDIST_WORKER"
+
+
+def get_worker_index() -> int:
+    # pytest-xdist выставляет PYTEST_XDIST_WORKER=gw0, gw1, ...; без xdist работает один воркер с индексом 0
+    worker = os.environ.get(XDIST_WORKER_ENV, "")
+    return int(worker[2:]) if worker.startswith("gw") else 0
+
+
+def worker_msisdn_range(worker_index: int, settings: Settings | None = None) -> tuple[int, int]:
+    settings = settings or get_settings()
+    if not 0 <= worker_index < settings.msisdn_pool_max_workers:
+        raise ValueError(
+            f"Индекс воркера {worker_index} вне диапазона 0..{settings.msisdn_pool_max_workers - 1}"
+        )
+    start = settings.msisdn_pool_base + worker_index * settings.msisdn_pool_block_size
+    return start, start + settings.msisdn_pool_block_size
+
+
+class MsisdnAllocator:
+    """
+    Выдает MSISDN из блока, закрепленного за воркером; блоки разных воркеров не пересекаются.
+    """
+
+    def __init__(
+            self,
+            worker_index: int | None = None,
+            settings: Settings | None = None,
+            msisdn_range: tuple[int, int] | None = None,
+    ):
+        # msisdn_range задает блок явно - для инструментов со своим диапазоном вне пула тестовых воркеров
+        self.worker_index = get_worker_index() if worker_index is None else worker_index
+        self._next, self._end = msisdn_range or worker_msisdn_range(self.worker_index, settings)
+        self._lock = threading.Lock()
+
+    def allocate_range(self, count: int) -> int:
+        with self._lock:
+            if self._next + count > self._end:
+                raise RuntimeError(f"Блок MSISDN воркера {self.worker_index} исчерпан")
+            start = self._next
+            self._next += count
+        logger.debug(f"Воркеру {self.worker_index} выделены MSISDN {start}..{start + count - 1}")
+        return start
+
+    def allocate(self) -> str:
+        return str(self.allocate_range(1))
+
+    def allocate_many(self, count: int) -> list[str]:
+        start = self.allocate_range(count)
+        return [str(msisdn) for msisdn in range(start, start + count)]
@@ -0,0 +1,165 @@
+import json
+import logging
+import math
+import time
+from array import array
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+
+from pydantic import BaseModel, Field
+
+from rabbitmq_sender import DEFAULT_MAX_IN_FLIGHT, PublishReport, RabbitMQPublisher, get_publisher
+from utils import summarize_latencies
+
+logger = logging.getLogger(__name__)
+
+
+class RateStep(BaseModel):
+    duration_s: float = Field(gt=0)
+    rate_cdr_s: float = Field(gt=0)
+    # Плавный переход от скорости предыдущего шага к rate_cdr_s в течение шага
+    ramp: bool = False
+
+
+class RateSchedule(BaseModel):
+    steps: list[RateStep]
+
+    @classmethod
+    def constant(cls, rate_cdr_s: float, duration_s: float) -> "RateSchedule":
+        return cls(steps=[RateStep(duration_s=duration_s, rate_cdr_s=rate_cdr_s)])
+
+    @classmethod
+    def linear_ramp(cls, start_rate: float, end_rate: float, duration_s: float) -> "RateSchedule":
+        # Короткий первый шаг задает начальную скорость, от которой строится рампа
+        return cls(steps=[
+            RateStep(duration_s=1.0 / start_rate, rate_cdr_s=start_rate),
+            RateStep(duration_s=duration_s, rate_cdr_s=end_rate, ramp=True),
+        ])
+
+    @property
+    def duration_s(self) -> float:
+        return sum(step.duration_s for step in self.steps)
+
+    @property
+    def total_cdrs(self) -> int:
+        total = 0.0
+        previous_rate = self.steps[0].rate_cdr_s
+        for step in self.steps:
+            start_rate = previous_rate if step.ramp else step.rate_cdr_s
+            total += (start_rate + step.rate_cdr_s) / 2 * step.duration_s
+            previous_rate = step.rate_cdr_s
+        return int(total)
+
+
+def intended_send_offsets(schedule: RateSchedule, burst: int = 1) -> Iterator[float]:
+    """
+    Token bucket: токены копятся со скоростью расписания, ведро вмещает burst токенов;
+    в начале в нем burst - 1 токенов, так что за все расписание выдается около total_cdrs + burst - 1 токенов.
+    Отдает плановое смещение (с от старта) отправки каждого следующего CDR; от фактических отправок не зависит.
+    """
+    segment_start = 0.0
+    tokens_at_segment_start = float(burst - 1)
+    next_token = 1.0
+    previous_rate = schedule.steps[0].rate_cdr_s
+
+    for step in schedule.steps:
+        start_rate = previous_rate if step.ramp else step.rate_cdr_s
+        slope = (step.rate_cdr_s - start_rate) / step.duration_s
+        tokens_at_segment_end = tokens_at_segment_start + (start_rate + step.rate_cdr_s) / 2 * step.duration_s
+
+        while next_token <= tokens_at_segment_end:
+            need = max(next_token - tokens_at_segment_start, 0.0)
+            if abs(slope) < 1e-12:
+                tau = need / start_rate
+            else:
+                # need = start_rate * tau + slope * tau^2 / 2
+                tau = (-start_rate + math.sqrt(start_rate ** 2 + 2 * slope * need)) / slope
+            yield segment_start + tau
+            next_token += 1.0
+
+        segment_start += step.duration_s
+        tokens_at_segment_start = tokens_at_segment_end
+        previous_rate = step.rate_cdr_s
+
+
+class OpenLoopResult(BaseModel):
+    messages: int
+    cdrs: int
+    duration_s: float
+    target_cdrs: int
+    achieved_rate_cdr_s: float
+    # Отставание фактической отправки от плановой по каждому CDR
+    send_lag: dict[str, float]
+    publish_report: PublishReport
+
+
+class OpenLoopRun:
+    """
+    Открытая нагрузка: сообщения отправляются по заранее рассчитанному расписанию, а не по мере
+    готовности предыдущей отправки. Для каждого CDR запоминаются плановое и фактическое время отправки.
+    """
+
+    def __init__(
+            self,
+            schedule: RateSchedule,
+            publisher: RabbitMQPublisher | None = None,
+            burst: int = 1,
+            max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+            on_scheduled: Callable[[List[Dict[str, Any]], List[float]], None] | None = None,
+    ):
+        self.schedule = schedule
+        self._publisher = publisher or get_publisher()
+        self._burst = burst
+        self._max_in_flight = max_in_flight
+        self._on_scheduled = on_scheduled
+        # Абсолютные отметки time.monotonic() по каждому CDR; array вместо списков, чтобы память росла умеренно
+        self.intended_at = array("d")
+        self.actual_at = array("d")
+        self.messages_sent = 0
+        self.cdrs_sent = 0
+
+    def _paced_bodies(self, batches: Iterable[List[Dict[str, Any]]], started_at: float) -> Iterator[bytes]:
+        offsets = intended_send_offsets(self.schedule, self._burst)
+        for batch in batches:
+            intended = [started_at + offset for offset in islice(offsets, len(batch))]
+            if len(intended) < len(batch):
+                # Расписание исчерпано
+                return
+            # Сообщение из N CDR уходит, когда накоплены токены для последнего из них; пауза идет через
+            # publisher.sleep, чтобы соединение успевало отвечать на heartbeat и принимать подтверждения
+            self._publisher.sleep(intended[-1] - time.monotonic())
+            if self._on_scheduled is not None:
+                self._on_scheduled(batch, intended)
+            actual = time.monotonic()
+            # Плановое время - у каждого CDR свое, фактическое - общее для сообщения
+            self.intended_at.extend(intended)
+            self.actual_at.extend([actual] * len(batch))
+            self.messages_sent += 1
+            self.cdrs_sent += len(batch)
+            yield json.dumps(batch, ensure_ascii=False).encode('utf-8')
+
+    def run(self, batches: Iterable[List[Dict[str, Any]]]) -> OpenLoopResult:
+        logger.info(
+            f"Открытая нагрузка: {self.schedule.total_cdrs} CDR за {self.schedule.duration_s:.1f} с "
+            f"({len(self.schedule.steps)} шагов расписания)."
+        )
+        started_at = time.monotonic()
+        report = self._publisher.publish_confirmed(
+            self._paced_bodies(batches, started_at), max_in_flight=self._max_in_flight
+        )
+        duration_s = time.monotonic() - started_at
+        lags = [actual - intended for intended, actual in zip(self.intended_at, self.actual_at)]
+        result = OpenLoopResult(
+            messages=self.messages_sent,
+            cdrs=self.cdrs_sent,
+            duration_s=duration_s,
+            target_cdrs=self.schedule.total_cdrs,
+            achieved_rate_cdr_s=self.cdrs_sent / max(duration_s, 1e-9),
+            send_lag=summarize_latencies(lags),
+            publish_report=report,
+        )
+        logger.info(
+            f"Открытая нагрузка завершена: {result.cdrs} CDR, {result.achieved_rate_cdr_s:.1f} CDR/с, "
+            f"p99 отставания отправки {result.send_lag['p99_ms']:.1f} мс."
+        )
+        return result
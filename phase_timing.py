@@ -0,0 +1,230 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Путь к JSON-отчету; без переменной окружения инструментирование выключено
+PHASE_TIMING_ENV = "E2E_PHASE_TIMING"
+
+PHASE_PROVISION = "provision"
+PHASE_PUBLISH = "publish"
+PHASE_WAIT = "wait"
+PHASE_VERIFY = "verify"
+
+_DISABLED_SPAN = nullcontext()
+
+
+class PhaseStats:
+    __slots__ = ("calls", "total_s", "max_s")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+
+    def add(self, elapsed: float):
+        self.calls += 1
+        self.total_s += elapsed
+        self.max_s = max(self.max_s, elapsed)
+
+    def merge(self, other: "PhaseStats"):
+        self.calls += other.calls
+        self.total_s += other.total_s
+        self.max_s = max(self.max_s, other.max_s)
+
+    def as_dict(self) -> dict[str, float]:
+        return {"calls": self.calls, "total_ms": self.total_s * 1000, "max_ms": self.max_s * 1000}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PhaseStats":
+        stats = cls()
+        stats.calls = data["calls"]
+        stats.total_s = data["total_ms"] / 1000
+        stats.max_s = data["max_ms"] / 1000
+        return stats
+
+
+class TestTimings:
+    def __init__(self, nodeid: str):
+        self.nodeid = nodeid
+        self.started_at = time.perf_counter()
+        self.duration_s = 0.0
+        self.outcome: str | None = None
+        self.phases: dict[str, PhaseStats] = {}
+        self.statements: dict[str, PhaseStats] = {}
+        self.counters: dict[str, int] = {}
+
+    def as_dict(self) -> dict:
+        covered_s = sum(stats.total_s for stats in self.phases.values())
+        return {
+            "outcome": self.outcome,
+            "duration_ms": self.duration_s * 1000,
+            "phases": {name: stats.as_dict() for name, stats in self.phases.items()},
+            # Время теста вне размеченных фаз: фикстуры, логирование, сам pytest
+            "unaccounted_ms": max(self.duration_s - covered_s, 0.0) * 1000,
+            "statements": {name: stats.as_dict() for name, stats in self.statements.items()},
+            "counters": dict(self.counters),
+        }
+
+    @classmethod
+    def from_dict(cls, nodeid: str, data: dict) -> "TestTimings":
+        timings = cls(nodeid)
+        timings.duration_s = data["duration_ms"] / 1000
+        timings.outcome = data["outcome"]
+        timings.phases = {name: PhaseStats.from_dict(stats) for name, stats in data["phases"].items()}
+        timings.statements = {name: PhaseStats.from_dict(stats) for name, stats in data["statements"].items()}
+        timings.counters = dict(data["counters"])
+        return timings
+
+
+class PhaseRecorder:
+    """
+    Собирает время фаз, запросов и счетчики по тестам. Записи вне теста относятся к псевдотесту "<session>".
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._session = TestTimings("<session>")
+        self._current = self._session
+        self.tests: dict[str, TestTimings] = {}
+
+    def start_test(self, nodeid: str):
+        with self._lock:
+            self._current = self.tests[nodeid] = TestTimings(nodeid)
+
+    def finish_test(self, outcome: str | None):
+        with self._lock:
+            self._current.duration_s = time.perf_counter() - self._current.started_at
+            self._current.outcome = outcome
+            self._current = self._session
+
+    def add_phase(self, name: str, elapsed: float):
+        with self._lock:
+            self._current.phases.setdefault(name, PhaseStats()).add(elapsed)
+
+    def add_statement(self, name: str, elapsed: float):
+        with self._lock:
+            self._current.statements.setdefault(name, PhaseStats()).add(elapsed)
+
+    def add_count(self, name: str, value: int):
+        with self._lock:
+            self._current.counters[name] = self._current.counters.get(name, 0) + value
+
+    def merge_report(self, path: str):
+        """
+        Добавляет тесты и внетестовые записи из отчета другого процесса (воркера pytest-xdist).
+        """
+        with open(path, encoding="utf-8") as f:
+            report = json.load(f)
+        outside = TestTimings.from_dict(self._session.nodeid, report["outside_tests"])
+        with self._lock:
+            for nodeid, data in report["tests"].items():
+                self.tests[nodeid] = TestTimings.from_dict(nodeid, data)
+            for name, stats in outside.phases.items():
+                self._session.phases.setdefault(name, PhaseStats()).merge(stats)
+            for name, stats in outside.statements.items():
+                self._session.statements.setdefault(name, PhaseStats()).merge(stats)
+            for name, value in outside.counters.items():
+                self._session.counters[name] = self._session.counters.get(name, 0) + value
+
+    def summary(self) -> dict:
+        phases: dict[str, PhaseStats] = {}
+        statements: dict[str, PhaseStats] = {}
+        counters: dict[str, int] = {}
+        for timings in (self._session, *self.tests.values()):
+            for name, stats in timings.phases.items():
+                phases.setdefault(name, PhaseStats()).merge(stats)
+            for name, stats in timings.statements.items():
+                statements.setdefault(name, PhaseStats()).merge(stats)
+            for name, value in timings.counters.items():
+                counters[name] = counters.get(name, 0) + value
+        return {
+            "tests": len(self.tests),
+            "duration_ms": sum(timings.duration_s for timings in self.tests.values()) * 1000,
+            "phases": {name: stats.as_dict() for name, stats in phases.items()},
+            "statements": {name: stats.as_dict() for name, stats in statements.items()},
+            "counters": counters,
+            "slowest_tests": sorted(
+                ((timings.nodeid, timings.duration_s * 1000) for timings in self.tests.values()),
+                key=lambda item: item[1],
+                reverse=True,
+            )[:10],
+        }
+
+    def write_report(self, path: str | None = None):
+        with self._lock:
+            report = {
+                "session": self.summary(),
+                "tests": {nodeid: timings.as_dict() for nodeid, timings in self.tests.items()},
+                "outside_tests": self._session.as_dict(),
+            }
+        with open(path or self.path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+_recorder: PhaseRecorder | None = None
+
+
+def enable(path: str) -> PhaseRecorder:
+    global _recorder
+    _recorder = PhaseRecorder(path)
+    return _recorder
+
+
+def enable_from_env() -> PhaseRecorder | None:
+    path = os.environ.get(PHASE_TIMING_ENV)
+    return enable(path) if path else None
+
+
+def disable():
+    global _recorder
+    _recorder = None
+
+
+def get_recorder() -> PhaseRecorder | None:
+    return _recorder
+
+
+@contextmanager
+def _recorded_span(recorder: PhaseRecorder, name: str):
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.add_phase(name, time.perf_counter() - started_at)
+
+
+def span(name: str):
+    # При выключенной записи возвращается общий пустой контекст: одна проверка глобальной переменной
+    recorder = _recorder
+    return _DISABLED_SPAN if recorder is None else _recorded_span(recorder, name)
+
+
+def timed(name: str):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            recorder = _recorder
+            if recorder is None:
+                return func(*args, **kwargs)
+            with _recorded_span(recorder, name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count(name: str, value: int = 1):
+    recorder = _recorder
+    if recorder is not None:
+        recorder.add_count(name, value)
+
+
+def record_statement(name: str, elapsed: float):
+    recorder = _recorder
+    if recorder is not None:
+        recorder.add_statement(name, elapsed)
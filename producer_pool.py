@@ -0,0 +1,204 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pika
+from pydantic import BaseModel
+
+from cdr_generator import CdrGeneratorConfig, encode_cdr_batches
+from config import Settings, get_settings
+from rabbitmq_sender import DEFAULT_MAX_IN_FLIGHT, RabbitMQPublisher
+
+logger = logging.getLogger(__name__)
+
+class ProducerWorkerReport(BaseModel):
+    worker_index: int
+    seed: int
+    cdrs: int
+    published: int = 0
+    acked: int = 0
+    failed: int = 0
+    elapsed_s: float = 0.0
+    error: str | None = None
+
+
+class ProducerPoolReport(BaseModel):
+    workers: list[ProducerWorkerReport]
+    elapsed_s: float
+
+    @property
+    def cdrs(self) -> int:
+        return sum(worker.cdrs for worker in self.workers if worker.error is None)
+
+    @property
+    def published(self) -> int:
+        return sum(worker.published for worker in self.workers)
+
+    @property
+    def acked(self) -> int:
+        return sum(worker.acked for worker in self.workers)
+
+    @property
+    def failed(self) -> int:
+        return sum(worker.failed for worker in self.workers)
+
+    @property
+    def errors(self) -> list[str]:
+        return [f"worker {worker.worker_index}: {worker.error}" for worker in self.workers if worker.error]
+
+    @property
+    def cdr_per_s(self) -> float:
+        return self.cdrs / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+    def summary(self) -> dict:
+        return {
+            "workers": len(self.workers),
+            "cdrs": self.cdrs,
+            "published": self.published,
+            "acked": self.acked,
+            "failed": self.failed,
+            "errors": self.errors,
+            "elapsed_s": self.elapsed_s,
+            "cdr_per_s": self.cdr_per_s,
+        }
+
+
+def producer_msisdn_range(worker_index: int, settings: Settings | None = None) -> tuple[int, int]:
+    settings = settings or get_settings()
+    if not 0 <= worker_index < settings.producer_msisdn_max_workers:
+        raise ValueError(
+            f"Индекс процесса-производителя {worker_index} вне диапазона "
+            f"0..{settings.producer_msisdn_max_workers - 1} (producer_msisdn_max_workers)"
+        )
+    start = settings.producer_msisdn_base + worker_index * settings.producer_msisdn_block_size
+    return start, start + settings.producer_msisdn_block_size
+
+
+def shard_generator_configs(
+        template: CdrGeneratorConfig,
+        processes: int,
+        base_seed: int,
+) -> list[tuple[int, CdrGeneratorConfig]]:
+    """
+    Делит template.total_cdrs между процессами. У каждого шарда свой seed (base_seed + i)
+    и свой блок MSISDN из диапазона producer_msisdn_*, поэтому прогоны воспроизводимы,
+    абоненты шардов не пересекаются между собой и с блоками воркеров pytest-xdist.
+    """
+    settings = get_settings()
+    if not 0 < processes <= settings.producer_msisdn_max_workers:
+        raise ValueError(
+            f"Число процессов {processes} должно быть от 1 до {settings.producer_msisdn_max_workers} "
+            f"(producer_msisdn_max_workers)"
+        )
+    per_worker, remainder = divmod(template.total_cdrs, processes)
+    subscriber_count = min(template.subscriber_count, settings.producer_msisdn_block_size)
+    shards = []
+    for worker_index in range(processes):
+        msisdn_start, _ = producer_msisdn_range(worker_index, settings)
+        shards.append((worker_index, template.model_copy(update={
+            "total_cdrs": per_worker + (1 if worker_index < remainder else 0),
+            "seed": base_seed + worker_index,
+            "subscriber_msisdn_start": msisdn_start,
+            "subscriber_count": subscriber_count,
+        })))
+    return shards
+
+
+def _produce_shard(worker_index: int, config: CdrGeneratorConfig, max_in_flight: int) -> ProducerWorkerReport:
+    # Выполняется в дочернем процессе: у каждого процесса свое соединение с брокером
+    result = ProducerWorkerReport(worker_index=worker_index, seed=config.seed, cdrs=config.total_cdrs)
+    publisher = RabbitMQPublisher(max_channels=1)
+    started_at = time.monotonic()
+    try:
+        report = publisher.publish_confirmed(encode_cdr_batches(config), max_in_flight=max_in_flight)
+        result.published = report.published
+        result.acked = report.acked
+        result.failed = len(report.nacked) + len(report.returned) + len(report.unconfirmed)
+        if not report.ok:
+            result.error = (f"nacked={len(report.nacked)}, returned={len(report.returned)}, "
+                            f"unconfirmed={len(report.unconfirmed)}")
+    except pika.exceptions.AMQPError as e:
+        result.error = repr(e)
+    finally:
+        result.elapsed_s = time.monotonic() - started_at
+        publisher.close()
+    return result
+
+
+def run_producer_pool(
+        template: CdrGeneratorConfig,
+        processes: int,
+        base_seed: int = 0,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+) -> ProducerPoolReport:
+    shards = shard_generator_configs(template, processes, base_seed)
+    logger.info(f"Запуск {processes} процессов-производителей, всего {template.total_cdrs} CDR.")
+
+    workers: list[ProducerWorkerReport] = []
+    started_at = time.monotonic()
+    # spawn: дочерние процессы не наследуют открытые сокеты родителя
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {
+            executor.submit(_produce_shard, worker_index, config, max_in_flight): (worker_index, config)
+            for worker_index, config in shards
+        }
+        for future in as_completed(futures):
+            worker_index, config = futures[future]
+            try:
+                workers.append(future.result())
+            except Exception as e:
+                logger.error(f"Процесс-производитель {worker_index} завершился с ошибкой: {e}", exc_info=True)
+                workers.append(ProducerWorkerReport(
+                    worker_index=worker_index, seed=config.seed, cdrs=config.total_cdrs, error=repr(e)
+                ))
+    report = ProducerPoolReport(
+        workers=sorted(workers, key=lambda worker: worker.worker_index),
+        elapsed_s=time.monotonic() - started_at,
+    )
+    logger.info(f"Отправлено {report.cdrs} CDR за {report.elapsed_s:.2f} с ({report.cdr_per_s:.0f} CDR/с).")
+    return report
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Многопроцессная генерация и отправка CDR в RabbitMQ")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="Число процессов (по умолчанию число ядер, но не больше producer_msisdn_max_workers)")
+    parser.add_argument("--total-cdrs", type=int, required=True)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--subscribers", type=int, default=1000, help="Абонентов своей сети на каждый процесс")
+    parser.add_argument("--seed", type=int, default=0, help="Базовый seed; процесс i использует seed + i")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT)
+    args = parser.parse_args(argv)
+
+    max_workers = get_settings().producer_msisdn_max_workers
+    processes = args.processes or min(multiprocessing.cpu_count(), max_workers)
+    if not 0 < processes <= max_workers:
+        parser.error(
+            f"--processes {processes}: допустимо от 1 до {max_workers}; "
+            f"увеличьте PRODUCER_MSISDN_MAX_WORKERS, если диапазон MSISDN это позволяет"
+        )
+
+    template = CdrGeneratorConfig(
+        total_cdrs=args.total_cdrs,
+        batch_size=args.batch_size,
+        subscriber_msisdn_start=0,
+        subscriber_count=args.subscribers,
+    )
+    report = run_producer_pool(
+        template, processes, args.seed, args.max_in_flight
+    )
+    print(json.dumps(
+        {"summary": report.summary(), "workers": [worker.model_dump() for worker in report.workers]},
+        ensure_ascii=False,
+        indent=2,
+    ))
+    return 0 if not report.errors else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
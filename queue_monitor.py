@@ -0,0 +1,143 @@
+import json
+import logging
+import threading
+import time
+from typing import Callable
+
+import pika
+from pydantic import BaseModel
+
+from config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAMPLE_INTERVAL_S = 1.0
+
+
+class QueueSample(BaseModel):
+    # Секунды от старта сэмплера
+    t_s: float
+    message_count: int | None
+    consumer_count: int | None
+    published_total: int | None = None
+    # Сообщения/с на интервале от предыдущего замера
+    ingress_rate: float | None = None
+    drain_rate: float | None = None
+    # Сколько секунд BRT нужно, чтобы выбрать текущую очередь при текущей скорости разбора
+    lag_s: float | None = None
+    error: str | None = None
+
+
+class QueueDepthSampler(threading.Thread):
+    """
+    Фоново читает глубину и число потребителей очереди CDR через пассивный queue_declare.
+    Работает на собственном соединении: BlockingConnection нельзя делить между потоками.
+    Скорость входа берется из счетчика опубликованных сообщений, скорость разбора - как вход минус прирост очереди.
+    По AMQP привязки exchange не читаются, поэтому очередь задается явно (rabbitmq_cdr_queue) и должна совпадать
+    с очередью, привязанной на брокере к cdr-exchange/cdr-routing-key, которую читает BRT.
+    """
+
+    def __init__(
+            self,
+            queue_name: str | None = None,
+            interval_s: float = DEFAULT_SAMPLE_INTERVAL_S,
+            published_counter: Callable[[], int] | None = None,
+            settings: Settings | None = None,
+    ):
+        super().__init__(name="queue-depth-sampler", daemon=True)
+        self._settings = settings or get_settings()
+        self.queue_name = queue_name or self._settings.rabbitmq_cdr_queue
+        self._interval_s = interval_s
+        self._published_counter = published_counter
+        self._stop_event = threading.Event()
+        self._connection: pika.BlockingConnection | None = None
+        self._channel = None
+        self.samples: list[QueueSample] = []
+
+    def _declare_passive(self) -> tuple[int, int]:
+        if self._connection is None or not self._connection.is_open:
+            self._connection = pika.BlockingConnection(pika.ConnectionParameters(
+                host=self._settings.rabbitmq_host,
+                port=self._settings.rabbitmq_port,
+                credentials=pika.PlainCredentials(self._settings.rabbitmq_user, self._settings.rabbitmq_pass),
+            ))
+            self._channel = None
+        if self._channel is None or not self._channel.is_open:
+            self._channel = self._connection.channel()
+        frame = self._channel.queue_declare(queue=self.queue_name, passive=True)
+        return frame.method.message_count, frame.method.consumer_count
+
+    def _drop_connection(self):
+        try:
+            if self._connection is not None and self._connection.is_open:
+                self._connection.close()
+        except Exception as e:
+            logger.debug(f"Ошибка при закрытии соединения сэмплера: {e}")
+        self._connection = self._channel = None
+
+    def _sample(self, started_at: float) -> QueueSample:
+        t_s = time.monotonic() - started_at
+        published_total = None
+        try:
+            published_total = self._published_counter() if self._published_counter else None
+            message_count, consumer_count = self._declare_passive()
+        except pika.exceptions.ChannelClosed as e:
+            # Например, 404 для несуществующей очереди: брокер закрывает канал, на следующем замере он пересоздается
+            logger.warning(f"Не удалось прочитать очередь {self.queue_name}: {e}")
+            return QueueSample(t_s=t_s, message_count=None, consumer_count=None,
+                               published_total=published_total, error=repr(e))
+        except Exception as e:
+            # Обрыв сокета и прочие ошибки не должны останавливать поток: соединение пересоздается на следующем замере
+            logger.warning(f"Замер очереди {self.queue_name} не удался: {e!r}")
+            self._drop_connection()
+            return QueueSample(t_s=t_s, message_count=None, consumer_count=None,
+                               published_total=published_total, error=repr(e))
+
+        sample = QueueSample(
+            t_s=t_s, message_count=message_count, consumer_count=consumer_count, published_total=published_total
+        )
+        previous = next((s for s in reversed(self.samples) if s.message_count is not None), None)
+        if previous is not None and published_total is not None and previous.published_total is not None:
+            dt = sample.t_s - previous.t_s
+            if dt > 0:
+                sample.ingress_rate = (published_total - previous.published_total) / dt
+                sample.drain_rate = max(sample.ingress_rate - (message_count - previous.message_count) / dt, 0.0)
+                if sample.drain_rate > 0:
+                    sample.lag_s = message_count / sample.drain_rate
+        return sample
+
+    def run(self):
+        started_at = time.monotonic()
+        while not self._stop_event.is_set():
+            self.samples.append(self._sample(started_at))
+            self._stop_event.wait(self._interval_s)
+        self._drop_connection()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def __enter__(self) -> "QueueDepthSampler":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def time_series(self) -> list[dict]:
+        return [sample.model_dump() for sample in self.samples]
+
+    def summary(self) -> dict:
+        depths = [s.message_count for s in self.samples if s.message_count is not None]
+        drains = [s.drain_rate for s in self.samples if s.drain_rate is not None]
+        return {
+            "queue": self.queue_name,
+            "samples": len(self.samples),
+            "max_depth": max(depths, default=None),
+            "final_depth": depths[-1] if depths else None,
+            "max_drain_rate": max(drains, default=None),
+        }
+
+    def dump_json(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"summary": self.summary(), "samples": self.time_series()}, f, ensure_ascii=False, indent=2)
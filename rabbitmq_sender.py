@@ -1,12 +1,23 @@
 import pika
 import json
 import logging
-from typing import List, Dict, Any
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Tuple
 
-from config import get_settings
+from pydantic import BaseModel
+
+import phase_timing
+from config import Settings, get_settings
 
 TEST_CDR_EXCHANGE = "cdr-exchange"
 TEST_CDR_ROUTING_KEY = "cdr-routing-key"
+DEFAULT_CHANNEL_POOL_SIZE = 4
+DEFAULT_PUBLISH_ATTEMPTS = 3
+DEFAULT_MAX_IN_FLIGHT = 256
+DEFAULT_CONFIRM_TIMEOUT_S = 30.0
 logger = logging.getLogger(__name__)
 
 pika_loggers_to_silence = [
@@ -20,38 +31,394 @@ for logger_name in pika_loggers_to_silence:
     logging.getLogger(logger_name).setLevel(logging.WARNING) # или logging.ERROR
 
 
-def send_cdr_list_to_rabbitmq(cdr_list: List[Dict[str, Any]]) -> bool:
-    if not cdr_list:
-        logger.warning("Список CDR для отправки пуст. Отправка отменена.")
-        return False
+class ReturnedMessage(BaseModel):
+    index: int
+    reply_code: int
+    reply_text: str
 
-    settings = get_settings()
-    try:
-        logger.info(f"Подключение к RabbitMQ: host={settings.rabbitmq_host}, port={settings.rabbitmq_port}")
-        parameters = pika.ConnectionParameters(
-            host=settings.rabbitmq_host,
-            port=settings.rabbitmq_port,
-            credentials=pika.PlainCredentials(settings.rabbitmq_user, settings.rabbitmq_pass),
+
+class PublishReport(BaseModel):
+    published: int = 0
+    acked: int = 0
+    # Порядковые номера сообщений (индексы во входной последовательности)
+    nacked: list[int] = []
+    returned: list[ReturnedMessage] = []
+    unconfirmed: list[int] = []
+
+    @property
+    def ok(self) -> bool:
+        return (
+                self.published > 0
+                and self.acked == self.published
+                and not self.nacked
+                and not self.returned
+                and not self.unconfirmed
+        )
+
+
+class _ConfirmTracker:
+    def __init__(self):
+        self.next_delivery_tag = 1
+        # delivery_tag -> индекс сообщения; теги растут монотонно, dict сохраняет порядок вставки
+        self.in_flight: dict[int, int] = {}
+        self.report = PublishReport()
+
+    def on_confirm(self, frame):
+        method = frame.method
+        is_ack = isinstance(method, pika.spec.Basic.Ack)
+        if method.multiple:
+            tags = [tag for tag in self.in_flight if tag <= method.delivery_tag]
+        else:
+            tags = [method.delivery_tag] if method.delivery_tag in self.in_flight else []
+        for tag in tags:
+            index = self.in_flight.pop(tag)
+            if is_ack:
+                self.report.acked += 1
+            else:
+                self.report.nacked.append(index)
+
+    def on_return(self, channel, method, properties, body):
+        index = int(properties.message_id) if properties.message_id is not None else -1
+        self.report.returned.append(
+            ReturnedMessage(index=index, reply_code=method.reply_code, reply_text=method.reply_text)
+        )
+
+
+def _enable_pipelined_confirms(
+        connection: pika.BlockingConnection,
+        channel: pika.adapters.blocking_connection.BlockingChannel,
+        on_confirm: Callable[[pika.frame.Method], None],
+):
+    """
+    Включает publisher confirms с асинхронным обработчиком ack/nack. Публичный BlockingChannel.confirm_delivery
+    ждет подтверждения каждой публикации, что исключает окно неподтвержденных сообщений.
+    Единственное место, где используется внутренний канал BlockingChannel._impl (pika.channel.Channel);
+    проверено на pika 1.3.x, при обновлении pika сверить сигнатуру Channel.confirm_delivery.
+    """
+    selected = []
+    channel._impl.confirm_delivery(
+        ack_nack_callback=on_confirm,
+        callback=lambda _frame: selected.append(True),
+    )
+    while not selected:
+        connection.process_data_events(time_limit=None)
+
+
+class RabbitMQPublisher:
+    """
+    Долгоживущее подключение к RabbitMQ с небольшим пулом каналов.
+    BlockingConnection не потокобезопасен, поэтому все операции с соединением идут под блокировкой.
+    """
+
+    def __init__(
+            self,
+            settings: Settings | None = None,
+            max_channels: int = DEFAULT_CHANNEL_POOL_SIZE,
+            publish_attempts: int = DEFAULT_PUBLISH_ATTEMPTS,
+    ):
+        self._settings = settings or get_settings()
+        self._max_channels = max_channels
+        self._publish_attempts = publish_attempts
+        self._lock = threading.RLock()
+        self._connection: pika.BlockingConnection | None = None
+        self._idle_channels: deque = deque()
+        self._confirm_channel = None
+        self._confirm_tracker: _ConfirmTracker | None = None
+        self._closed = False
+        # Всего опубликовано сообщений за время жизни объекта; читается сэмплером очереди
+        self.published_count = 0
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connection is not None and self._connection.is_open
+
+    def _connection_parameters(self) -> pika.ConnectionParameters:
+        return pika.ConnectionParameters(
+            host=self._settings.rabbitmq_host,
+            port=self._settings.rabbitmq_port,
+            credentials=pika.PlainCredentials(self._settings.rabbitmq_user, self._settings.rabbitmq_pass),
             connection_attempts=3,
             retry_delay=5,
         )
-        connection = pika.BlockingConnection(parameters)
-        channel = connection.channel()
-        logger.info("Канал RabbitMQ успешно создан.")
-
-        message_body = json.dumps(cdr_list, ensure_ascii=False).encode('utf-8')
-        logger.debug(f"Отправка {len(cdr_list)} CDR записей...")
-
-        channel.basic_publish(
-            exchange=TEST_CDR_EXCHANGE,
-            routing_key=TEST_CDR_ROUTING_KEY,
-            body=message_body,
-            properties=pika.BasicProperties(
-                content_type='application/json',
-                delivery_mode=pika.DeliveryMode.Persistent,
+
+    def _ensure_connection(self) -> pika.BlockingConnection:
+        if self._closed:
+            raise RuntimeError("Publisher RabbitMQ уже закрыт.")
+        if not self.is_connected:
+            self._drop_connection()
+            logger.info(
+                f"Подключение к RabbitMQ: host={self._settings.rabbitmq_host}, port={self._settings.rabbitmq_port}"
             )
+            self._connection = pika.BlockingConnection(self._connection_parameters())
+        return self._connection
+
+    def _drop_connection(self):
+        self._idle_channels.clear()
+        self._confirm_channel = None
+        self._confirm_tracker = None
+        if self._connection is not None:
+            try:
+                if self._connection.is_open:
+                    self._connection.close()
+            except Exception as e:
+                logger.debug(f"Ошибка при закрытии соединения RabbitMQ: {e}")
+            self._connection = None
+
+    @contextmanager
+    def channel(self) -> Iterator[pika.adapters.blocking_connection.BlockingChannel]:
+        with self._lock:
+            connection = self._ensure_connection()
+            channel = None
+            while self._idle_channels:
+                candidate = self._idle_channels.popleft()
+                if candidate.is_open:
+                    channel = candidate
+                    break
+            if channel is None:
+                channel = connection.channel()
+                logger.info("Канал RabbitMQ успешно создан.")
+            try:
+                yield channel
+            finally:
+                if channel.is_open and len(self._idle_channels) < self._max_channels:
+                    self._idle_channels.append(channel)
+                elif channel.is_open:
+                    channel.close()
+
+    def publish(
+            self,
+            body: bytes,
+            exchange: str = TEST_CDR_EXCHANGE,
+            routing_key: str = TEST_CDR_ROUTING_KEY,
+            properties: pika.BasicProperties | None = None,
+    ) -> bool:
+        properties = properties or pika.BasicProperties(
+            content_type='application/json',
+            delivery_mode=pika.DeliveryMode.Persistent,
         )
-        logger.info(f"Сообщение с {len(cdr_list)} CDR успешно отправлено.")
+        for attempt in range(1, self._publish_attempts + 1):
+            was_connected = self.is_connected
+            try:
+                with self.channel() as channel:
+                    channel.basic_publish(
+                        exchange=exchange,
+                        routing_key=routing_key,
+                        body=body,
+                        properties=properties,
+                    )
+                    self.published_count += 1
+                phase_timing.count("rabbitmq.messages")
+                phase_timing.count("rabbitmq.bytes", len(body))
+                return True
+            except pika.exceptions.ChannelClosed as e:
+                # Канал закрыт брокером - в пул он не вернется, берем новый
+                logger.warning(f"Канал RabbitMQ закрыт (попытка {attempt}/{self._publish_attempts}): {e}")
+            except pika.exceptions.AMQPConnectionError as e:
+                with self._lock:
+                    self._drop_connection()
+                if not was_connected:
+                    # Подключение не удалось с нуля - повторы уже сделаны внутри pika
+                    logger.error(f"Ошибка подключения к RabbitMQ: {e}")
+                    return False
+                logger.warning(f"Соединение с RabbitMQ потеряно (попытка {attempt}/{self._publish_attempts}): {e}")
+        logger.error(f"Не удалось отправить сообщение в RabbitMQ за {self._publish_attempts} попыток.")
+        return False
+
+    def _ensure_confirm_channel(self):
+        connection = self._ensure_connection()
+        if self._confirm_channel is not None and self._confirm_channel.is_open:
+            return self._confirm_channel, self._confirm_tracker
+
+        channel = connection.channel()
+        tracker = _ConfirmTracker()
+        _enable_pipelined_confirms(connection, channel, tracker.on_confirm)
+        channel.add_on_return_callback(tracker.on_return)
+        logger.info("Канал RabbitMQ в режиме publisher confirms создан.")
+        self._confirm_channel, self._confirm_tracker = channel, tracker
+        return channel, tracker
+
+    def publish_confirmed(
+            self,
+            bodies: Iterable[bytes],
+            exchange: str = TEST_CDR_EXCHANGE,
+            routing_key: str = TEST_CDR_ROUTING_KEY,
+            max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+            confirm_timeout_s: float = DEFAULT_CONFIRM_TIMEOUT_S,
+    ) -> PublishReport:
+        """
+        Публикует сообщения с publisher confirms, держа не более max_in_flight неподтвержденных.
+        Сообщения публикуются с mandatory=True, так что немаршрутизируемые попадают в report.returned.
+        """
+        with self._lock:
+            try:
+                connection = self._ensure_connection()
+                channel, tracker = self._ensure_confirm_channel()
+            except pika.exceptions.AMQPConnectionError as e:
+                logger.error(f"Ошибка подключения к RabbitMQ: {e}")
+                self._drop_connection()
+                return PublishReport()
+
+            report = tracker.report = PublishReport()
+            try:
+                for index, body in enumerate(bodies):
+                    deadline = time.monotonic() + confirm_timeout_s
+                    while len(tracker.in_flight) >= max_in_flight:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise TimeoutError(f"Нет подтверждений от брокера за {confirm_timeout_s} с")
+                        connection.process_data_events(time_limit=remaining)
+
+                    tracker.in_flight[tracker.next_delivery_tag] = index
+                    tracker.next_delivery_tag += 1
+                    channel.basic_publish(
+                        exchange=exchange,
+                        routing_key=routing_key,
+                        body=body,
+                        properties=pika.BasicProperties(
+                            content_type='application/json',
+                            delivery_mode=pika.DeliveryMode.Persistent,
+                            message_id=str(index),
+                        ),
+                        mandatory=True,
+                    )
+                    report.published += 1
+                    self.published_count += 1
+                    phase_timing.count("rabbitmq.messages")
+                    phase_timing.count("rabbitmq.bytes", len(body))
+
+                deadline = time.monotonic() + confirm_timeout_s
+                while tracker.in_flight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"Нет подтверждений от брокера за {confirm_timeout_s} с")
+                    connection.process_data_events(time_limit=remaining)
+                # basic.return приходит раньше ack, но колбэки возврата диспетчеризуются отложенно
+                connection.process_data_events(time_limit=0)
+            except (pika.exceptions.AMQPError, TimeoutError) as e:
+                logger.error(f"Публикация с подтверждениями прервана: {e}")
+                report.unconfirmed = sorted(tracker.in_flight.values())
+                # Состояние тегов канала больше не согласовано - пересоздаем соединение
+                self._drop_connection()
+
+            if report.nacked or report.returned:
+                logger.warning(
+                    f"Брокер отклонил сообщения: nack={report.nacked}, "
+                    f"возвраты={[(r.index, r.reply_code, r.reply_text) for r in report.returned]}"
+                )
+            logger.debug(f"Публикация с подтверждениями: {report.acked}/{report.published} подтверждено.")
+            return report
+
+    def sleep(self, seconds: float):
+        """
+        Пауза, во время которой соединение продолжает обрабатывать heartbeat и подтверждения брокера.
+        Годится для пауз внутри генератора, который потребляет publish_confirmed: блокировка реентерабельна.
+        """
+        deadline = time.monotonic() + seconds
+        with self._lock:
+            if not self.is_connected:
+                time.sleep(max(seconds, 0.0))
+                return
+            connection = self._connection
+            while (remaining := deadline - time.monotonic()) > 0:
+                connection.process_data_events(time_limit=remaining)
+
+    def close(self):
+        with self._lock:
+            self._drop_connection()
+            self._closed = True
+        logger.info("Publisher RabbitMQ закрыт.")
+
+
+_default_publisher: RabbitMQPublisher | None = None
+_default_publisher_lock = threading.Lock()
+
+
+def get_publisher() -> RabbitMQPublisher:
+    global _default_publisher
+    with _default_publisher_lock:
+        if _default_publisher is None:
+            _default_publisher = RabbitMQPublisher()
+        return _default_publisher
+
+
+def set_default_publisher(publisher: RabbitMQPublisher | None):
+    global _default_publisher
+    with _default_publisher_lock:
+        _default_publisher = publisher
+
+
+def shutdown_publisher():
+    global _default_publisher
+    with _default_publisher_lock:
+        if _default_publisher is not None:
+            _default_publisher.close()
+            _default_publisher = None
+
+
+def iter_cdr_messages(
+        cdr_list: Iterable[Dict[str, Any]],
+        max_cdrs: int | None = None,
+        max_bytes: int | None = None,
+) -> Iterator[Tuple[List[Dict[str, Any]], bytes]]:
+    """
+    Делит CDR на сообщения не длиннее max_cdrs записей и max_bytes байт JSON-тела.
+    Каждая запись сериализуется один раз; тело собирается из готовых фрагментов.
+    Запись, которая одна больше max_bytes, уходит отдельным сообщением.
+    """
+    chunk: List[Dict[str, Any]] = []
+    parts: List[bytes] = []
+    # Размер тела с учетом скобок массива и запятых между элементами
+    size = 2
+    for cdr in cdr_list:
+        part = json.dumps(cdr, ensure_ascii=False).encode('utf-8')
+        separator = 1 if parts else 0
+        if parts and (
+                (max_cdrs is not None and len(chunk) >= max_cdrs)
+                or (max_bytes is not None and size + separator + len(part) > max_bytes)
+        ):
+            yield chunk, b"[" + b",".join(parts) + b"]"
+            chunk, parts, size, separator = [], [], 2, 0
+        if max_bytes is not None and 2 + len(part) > max_bytes:
+            logger.warning(f"CDR размером {len(part)} байт превышает лимит сообщения {max_bytes} байт.")
+        chunk.append(cdr)
+        parts.append(part)
+        size += separator + len(part)
+    if parts:
+        yield chunk, b"[" + b",".join(parts) + b"]"
+
+
+@phase_timing.timed(phase_timing.PHASE_PUBLISH)
+def send_cdr_list_to_rabbitmq(
+        cdr_list: List[Dict[str, Any]],
+        publisher: RabbitMQPublisher | None = None,
+        confirm: bool = True,
+        max_cdrs_per_message: int | None = None,
+        max_message_bytes: int | None = None,
+) -> bool:
+    """
+    Отправляет CDR одним сообщением или, если заданы лимиты (аргументами либо в настройках
+    cdr_max_per_message / cdr_max_message_bytes), несколькими сообщениями в пределах лимитов.
+    """
+    if not cdr_list:
+        logger.warning("Список CDR для отправки пуст. Отправка отменена.")
+        return False
+
+    publisher = publisher or get_publisher()
+    settings = get_settings()
+    max_cdrs_per_message = max_cdrs_per_message or settings.cdr_max_per_message
+    max_message_bytes = max_message_bytes or settings.cdr_max_message_bytes
+    try:
+        message_bodies = [
+            body for _, body in iter_cdr_messages(cdr_list, max_cdrs_per_message, max_message_bytes)
+        ]
+        logger.debug(f"Отправка {len(cdr_list)} CDR записей в {len(message_bodies)} сообщениях...")
+
+        if confirm:
+            if not publisher.publish_confirmed(message_bodies).ok:
+                return False
+        elif not all(publisher.publish(body) for body in message_bodies):
+            return False
+        logger.info(f"{len(message_bodies)} сообщений с {len(cdr_list)} CDR успешно отправлено.")
 
         return True
 
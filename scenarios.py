@@ -0,0 +1,196 @@
+from typing import Any, Dict, List
+
+from pydantic import BaseModel
+
+from cdr_generator import CALL_TYPE_INCOMING, CALL_TYPE_OUTGOING
+from subscriber_schema import SubscriberCreationData
+
+CLASSIC_TARIFF_ID = 11
+MONTHLY_TARIFF_ID = 12
+MONTHLY_PACKAGE_S_TYPE_ID = 0
+EXTERNAL_MSISDN = "79888888888"
+EXTERNAL_MSISDN_2 = "79888888889"
+
+
+class ScenarioSubscriber(BaseModel):
+    alias: str
+    money: int
+    tariff_id_logical: int
+    name_prefix: str
+    quant_s_type_id: int = 0
+    quant_amount_left: int = 0
+
+
+class ScenarioCdr(BaseModel):
+    call_type: str
+    # Псевдоним абонента сценария или номер внешней сети
+    first: str
+    second: str
+    call_start: str
+    call_end: str
+
+
+class E2EScenario(BaseModel):
+    """
+    Декларативное описание E2E-сценария: абоненты задаются псевдонимами, реальные MSISDN
+    выдаются аллокатором при запуске, поэтому сценарии можно выполнять одновременно.
+    """
+    name: str
+    subscribers: list[ScenarioSubscriber]
+    cdrs: list[ScenarioCdr]
+    # Псевдоним -> ожидаемый person.money
+    expected_money: dict[str, int]
+    # Псевдоним -> (s_type_id, ожидаемый amount_left)
+    expected_quant: dict[str, tuple[int, int]] = {}
+    timeout_s: float = 15.0
+    stable_for_s: float = 0.0
+
+    @property
+    def aliases(self) -> list[str]:
+        return [subscriber.alias for subscriber in self.subscribers]
+
+    def subscriber_data(self, msisdns: dict[str, str]) -> list[SubscriberCreationData]:
+        return [
+            SubscriberCreationData(
+                msisdn=msisdns[subscriber.alias],
+                money=subscriber.money,
+                tariff_id_logical=subscriber.tariff_id_logical,
+                name_prefix=subscriber.name_prefix,
+                quant_s_type_id=subscriber.quant_s_type_id,
+                quant_amount_left=subscriber.quant_amount_left,
+            )
+            for subscriber in self.subscribers
+        ]
+
+    def cdr_list(self, msisdns: dict[str, str]) -> List[Dict[str, Any]]:
+        return [
+            {
+                "callType": cdr.call_type,
+                "firstSubscriberMsisdn": msisdns.get(cdr.first, cdr.first),
+                "secondSubscriberMsisdn": msisdns.get(cdr.second, cdr.second),
+                "callStart": cdr.call_start,
+                "callEnd": cdr.call_end,
+            }
+            for cdr in self.cdrs
+        ]
+
+    def expected_money_by_msisdn(self, msisdns: dict[str, str]) -> dict[str, int]:
+        return {msisdns[alias]: money for alias, money in self.expected_money.items()}
+
+    def expected_balance_rows(self, msisdns: dict[str, str]) -> list[tuple[str, int | None, int | None, int | None]]:
+        # Строки (msisdn, money, s_type_id, amount_left) для find_balance_mismatches; None - не проверять
+        return [
+            (msisdns[alias], self.expected_money.get(alias), *self.expected_quant.get(alias, (None, None)))
+            for alias in self.aliases
+            if alias in self.expected_money or alias in self.expected_quant
+        ]
+
+    def expected_quant_by_key(
+            self,
+            msisdns: dict[str, str],
+            person_ids: dict[str, int],
+    ) -> dict[tuple[int, int], int]:
+        return {
+            (person_ids[msisdns[alias]], s_type_id): amount_left
+            for alias, (s_type_id, amount_left) in self.expected_quant.items()
+        }
+
+
+# Единственный источник абонентов, CDR и ожиданий для tests/test_e2e_scenarios.py и tests/test_e2e_batched.py
+E2E_CLASSIC_01 = E2EScenario(
+    name="E2E-CLASSIC-01",
+    subscribers=[
+        ScenarioSubscriber(alias="caller", money=50, tariff_id_logical=CLASSIC_TARIFF_ID, name_prefix="CallerE2E_S_"),
+        ScenarioSubscriber(alias="callee", money=60, tariff_id_logical=CLASSIC_TARIFF_ID, name_prefix="CalleeE2E_S_"),
+    ],
+    cdrs=[ScenarioCdr(
+        call_type=CALL_TYPE_OUTGOING, first="caller", second="callee",
+        call_start="2025-05-01T10:00:00", call_end="2025-05-01T10:03:45",
+    )],
+    # 4 мин * 15 внутри сети
+    expected_money={"caller": -10, "callee": 60},
+)
+
+E2E_CLASSIC_02 = E2EScenario(
+    name="E2E-CLASSIC-02",
+    subscribers=[
+        ScenarioSubscriber(alias="caller", money=50, tariff_id_logical=CLASSIC_TARIFF_ID, name_prefix="CallerE2E02_"),
+    ],
+    cdrs=[ScenarioCdr(
+        call_type=CALL_TYPE_OUTGOING, first="caller", second=EXTERNAL_MSISDN,
+        call_start="2025-05-01T11:00:00", call_end="2025-05-01T11:01:10",
+    )],
+    # 2 мин * 25 на внешнюю сеть
+    expected_money={"caller": 0},
+)
+
+E2E_CLASSIC_03 = E2EScenario(
+    name="E2E-CLASSIC-03",
+    subscribers=[
+        ScenarioSubscriber(alias="receiver", money=50, tariff_id_logical=CLASSIC_TARIFF_ID,
+                           name_prefix="ReceiverE2E03_"),
+    ],
+    cdrs=[ScenarioCdr(
+        call_type=CALL_TYPE_INCOMING, first="receiver", second=EXTERNAL_MSISDN,
+        call_start="2025-05-01T12:00:00", call_end="2025-05-01T12:05:00",
+    )],
+    # Входящий бесплатен: баланс не меняется, поэтому ждем окно стабильности
+    expected_money={"receiver": 50},
+    stable_for_s=5.0,
+)
+
+E2E_MONTHLY_01 = E2EScenario(
+    name="E2E-MONTHLY-01",
+    subscribers=[
+        ScenarioSubscriber(
+            alias="subscriber", money=20, tariff_id_logical=MONTHLY_TARIFF_ID, name_prefix="MonthlyE2E01_",
+            quant_s_type_id=MONTHLY_PACKAGE_S_TYPE_ID, quant_amount_left=40,
+        ),
+    ],
+    cdrs=[ScenarioCdr(
+        call_type=CALL_TYPE_OUTGOING, first="subscriber", second=EXTERNAL_MSISDN_2,
+        call_start="2025-05-01T13:00:00", call_end="2025-05-01T13:05:30",
+    )],
+    # 6 мин целиком из пакета
+    expected_money={"subscriber": 20},
+    expected_quant={"subscriber": (MONTHLY_PACKAGE_S_TYPE_ID, 34)},
+)
+
+E2E_MONTHLY_02 = E2EScenario(
+    name="E2E-MONTHLY-02",
+    subscribers=[
+        ScenarioSubscriber(
+            alias="p2", money=200, tariff_id_logical=MONTHLY_TARIFF_ID, name_prefix="P2_Monthly02_",
+            quant_s_type_id=MONTHLY_PACKAGE_S_TYPE_ID, quant_amount_left=3,
+        ),
+        ScenarioSubscriber(alias="p1", money=50, tariff_id_logical=CLASSIC_TARIFF_ID, name_prefix="P1_ClassicM02_"),
+    ],
+    cdrs=[ScenarioCdr(
+        call_type=CALL_TYPE_OUTGOING, first="p2", second="p1",
+        call_start="2025-05-01T14:00:00", call_end="2025-05-01T14:04:59",
+    )],
+    # 5 мин: 3 из пакета, 2 * 15 деньгами
+    expected_money={"p2": 170, "p1": 50},
+    expected_quant={"p2": (MONTHLY_PACKAGE_S_TYPE_ID, 0)},
+    timeout_s=20.0,
+)
+
+E2E_MONTHLY_03 = E2EScenario(
+    name="E2E-MONTHLY-03",
+    subscribers=[
+        ScenarioSubscriber(
+            alias="p2", money=200, tariff_id_logical=MONTHLY_TARIFF_ID, name_prefix="P2_Monthly03_",
+            quant_s_type_id=MONTHLY_PACKAGE_S_TYPE_ID, quant_amount_left=3,
+        ),
+    ],
+    cdrs=[ScenarioCdr(
+        call_type=CALL_TYPE_OUTGOING, first="p2", second=EXTERNAL_MSISDN,
+        call_start="2025-05-01T15:00:00", call_end="2025-05-01T15:04:59",
+    )],
+    # 5 мин: 3 из пакета, 2 * 25 деньгами на внешнюю сеть
+    expected_money={"p2": 150},
+    expected_quant={"p2": (MONTHLY_PACKAGE_S_TYPE_ID, 0)},
+    timeout_s=20.0,
+)
+
+ALL_SCENARIOS = [E2E_CLASSIC_01, E2E_CLASSIC_02, E2E_CLASSIC_03, E2E_MONTHLY_01, E2E_MONTHLY_02, E2E_MONTHLY_03]
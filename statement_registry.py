@@ -0,0 +1,120 @@
+import threading
+import time
+from typing import Any, Sequence
+
+import psycopg
+
+import phase_timing
+
+# Именованные горячие запросы. psycopg готовит их на сервере (prepare=True) один раз на каждое
+# соединение пула и дальше выполняет без повторного разбора и планирования.
+STATEMENTS: dict[str, str] = {
+    "person_balance_by_msisdn": "SELECT money FROM person WHERE msisdn = %s;",
+    "person_balances_by_msisdns": "SELECT msisdn, money FROM person WHERE msisdn = ANY(%s);",
+    "subscriber_states_by_msisdns": """
+                                    SELECT p.id, p.msisdn, p.money, p.is_restricted, p.description, p.name,
+                                           p.tariff_id, pt.t_id, q.s_type_id, q.amount_left
+                                    FROM person p
+                                             LEFT JOIN person_tariff pt ON pt.id = p.tariff_id
+                                             LEFT JOIN quant_services q ON q.p_id = p.id
+                                    WHERE p.msisdn = ANY(%s);
+                                    """,
+    "quant_service_balance": "SELECT amount_left FROM quant_services WHERE p_id = %s AND s_type_id = %s;",
+    "quant_service_balances": """
+                              SELECT k.p_id, k.s_type_id, COALESCE(q.amount_left, 0)
+                              FROM unnest(%s::bigint[], %s::int[]) AS k(p_id, s_type_id)
+                                       LEFT JOIN quant_services q
+                                                 ON q.p_id = k.p_id AND q.s_type_id = k.s_type_id;
+                              """,
+    "person_tariff_insert": """
+                            INSERT INTO person_tariff (t_id, start_date)
+                            VALUES (%s, %s)
+                            RETURNING id;
+                            """,
+    "person_insert": """
+                     INSERT INTO person (msisdn, money, is_restricted, reg_data, description, tariff_id)
+                     VALUES (%s, %s, %s, %s, %s, %s)
+                     RETURNING id;
+                     """,
+    "person_update": """
+                     UPDATE person
+                     SET money         = %s,
+                         is_restricted = %s,
+                         description   = %s,
+                         tariff_id     = %s,
+                         name          = %s
+                     WHERE id = %s;
+                     """,
+    "person_name_update": "UPDATE person SET name = %s WHERE id = %s;",
+    "quant_services_update": "UPDATE quant_services SET amount_left = %s WHERE p_id = %s AND s_type_id = %s;",
+    "quant_services_insert": """
+                             INSERT INTO quant_services (p_id, s_type_id, amount_left)
+                             VALUES (%s, %s, %s)
+                             RETURNING id;
+                             """,
+}
+
+
+class StatementStats:
+    __slots__ = ("calls", "total_s", "max_s")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "calls": self.calls,
+            "total_ms": self.total_s * 1000,
+            "avg_ms": self.total_s * 1000 / self.calls if self.calls else 0.0,
+            "max_ms": self.max_s * 1000,
+        }
+
+
+_stats: dict[str, StatementStats] = {name: StatementStats() for name in STATEMENTS}
+_stats_lock = threading.Lock()
+
+
+def _record(name: str, elapsed: float):
+    with _stats_lock:
+        stats = _stats[name]
+        stats.calls += 1
+        stats.total_s += elapsed
+        stats.max_s = max(stats.max_s, elapsed)
+    phase_timing.record_statement(name, elapsed)
+
+
+def execute_statement(cur: psycopg.Cursor, name: str, params: Sequence[Any] | None = None) -> psycopg.Cursor:
+    query = STATEMENTS[name]
+    started_at = time.perf_counter()
+    try:
+        return cur.execute(query, params, prepare=True)
+    finally:
+        _record(name, time.perf_counter() - started_at)
+
+
+async def execute_statement_async(
+        cur: psycopg.AsyncCursor,
+        name: str,
+        params: Sequence[Any] | None = None,
+) -> psycopg.AsyncCursor:
+    query = STATEMENTS[name]
+    started_at = time.perf_counter()
+    try:
+        return await cur.execute(query, params, prepare=True)
+    finally:
+        _record(name, time.perf_counter() - started_at)
+
+
+def statement_stats() -> dict[str, dict[str, float]]:
+    # Сортировка по суммарному времени: первым идет запрос, который доминирует
+    with _stats_lock:
+        snapshot = {name: stats.as_dict() for name, stats in _stats.items() if stats.calls}
+    return dict(sorted(snapshot.items(), key=lambda item: item[1]["total_ms"], reverse=True))
+
+
+def reset_statement_stats():
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = StatementStats()
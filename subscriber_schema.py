@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 from pydantic import BaseModel
 
 class SubscriberCreationData(BaseModel):
@@ -11,3 +13,28 @@ class SubscriberCreationData(BaseModel):
 
     quant_s_type_id: int = 0
     quant_amount_left: int = 0
+
+
+class ProvisioningReport(BaseModel):
+    created: int = 0
+    updated: int = 0
+    # Абоненты, уже находящиеся в запрошенном состоянии: person не изменялся
+    unchanged: int = 0
+    # Тариф совпал - новая строка person_tariff не создавалась
+    person_tariff_skipped: int = 0
+    # Остаток quant_services совпал - строка не изменялась
+    quant_skipped: int = 0
+
+    @property
+    def skipped_rows(self) -> int:
+        return self.unchanged + self.person_tariff_skipped + self.quant_skipped
+
+
+class BalanceMismatch(BaseModel):
+    msisdn: str
+    expected_money: Decimal | None
+    actual_money: Decimal | None
+    s_type_id: int | None
+    expected_amount_left: int | None
+    actual_amount_left: int | None
+    person_found: bool
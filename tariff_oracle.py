@@ -0,0 +1,121 @@
+import logging
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator
+
+from pydantic import BaseModel
+
+from cdr_generator import CALL_TYPE_INCOMING
+from subscriber_schema import SubscriberCreationData
+from utils import calculate_billed_minutes, calculate_billed_minutes_batch
+
+logger = logging.getLogger(__name__)
+
+# Столько CDR apply_many разбирает одним векторным вызовом
+APPLY_CHUNK_SIZE = 10_000
+
+
+class TariffPlan(BaseModel):
+    tariff_id: int
+    in_network_rate: int
+    external_rate: int
+    incoming_rate: int = 0
+    # Тип услуги quant_services с пакетом минут; None - тариф без пакета
+    package_s_type_id: int | None = None
+
+
+CLASSIC_TARIFF = TariffPlan(tariff_id=11, in_network_rate=15, external_rate=25)
+MONTHLY_TARIFF = TariffPlan(tariff_id=12, in_network_rate=15, external_rate=25, package_s_type_id=0)
+DEFAULT_TARIFF_PLANS = {plan.tariff_id: plan for plan in (CLASSIC_TARIFF, MONTHLY_TARIFF)}
+
+
+class SubscriberState:
+    __slots__ = ("plan", "money", "quant_s_type_id", "quant_amount_left")
+
+    def __init__(self, plan: TariffPlan, money: int, quant_s_type_id: int, quant_amount_left: int):
+        self.plan = plan
+        self.money = money
+        self.quant_s_type_id = quant_s_type_id
+        self.quant_amount_left = quant_amount_left
+
+
+class TariffOracle:
+    """
+    Модель тарификации BRT: по потоку CDR считает ожидаемые person.money и quant_services.amount_left.
+    Память пропорциональна числу абонентов, каждый CDR обрабатывается за O(1).
+    """
+
+    def __init__(self, plans: dict[int, TariffPlan] | None = None):
+        self._plans = plans or DEFAULT_TARIFF_PLANS
+        self._subscribers: dict[str, SubscriberState] = {}
+        self.applied_cdrs = 0
+        self.ignored_cdrs = 0
+
+    def add_subscriber(self, data: SubscriberCreationData):
+        plan = self._plans.get(data.tariff_id_logical)
+        if plan is None:
+            raise ValueError(f"Неизвестный тариф {data.tariff_id_logical} для MSISDN {data.msisdn}")
+        self._subscribers[data.msisdn] = SubscriberState(
+            plan, data.money, data.quant_s_type_id, data.quant_amount_left
+        )
+
+    def add_subscribers(self, subscribers: Iterable[SubscriberCreationData]):
+        for data in subscribers:
+            self.add_subscriber(data)
+
+    def apply(self, cdr: Dict[str, Any]) -> int:
+        """
+        Применяет один CDR и возвращает списанную сумму.
+        """
+        state = self._subscribers.get(cdr["firstSubscriberMsisdn"])
+        if state is None:
+            # CDR по абоненту другого оператора BRT не тарифицирует
+            self.ignored_cdrs += 1
+            return 0
+        return self._charge(state, cdr, calculate_billed_minutes(cdr["callStart"], cdr["callEnd"]))
+
+    def _charge(self, state: SubscriberState, cdr: Dict[str, Any], minutes: int) -> int:
+        self.applied_cdrs += 1
+        plan = state.plan
+        if cdr["callType"] == CALL_TYPE_INCOMING:
+            cost = minutes * plan.incoming_rate
+        else:
+            if plan.package_s_type_id is not None and state.quant_s_type_id == plan.package_s_type_id:
+                from_package = min(state.quant_amount_left, minutes)
+                state.quant_amount_left -= from_package
+                minutes -= from_package
+            in_network = cdr["secondSubscriberMsisdn"] in self._subscribers
+            cost = minutes * (plan.in_network_rate if in_network else plan.external_rate)
+
+        state.money -= cost
+        return cost
+
+    def apply_many(self, cdrs: Iterable[Dict[str, Any]]):
+        # Длительности считаются пачками через calculate_billed_minutes_batch; списания затем применяются
+        # по порядку, так как расход пакета зависит от предыдущих звонков абонента
+        cdrs = iter(cdrs)
+        while chunk := list(islice(cdrs, APPLY_CHUNK_SIZE)):
+            billed = []
+            for cdr in chunk:
+                state = self._subscribers.get(cdr["firstSubscriberMsisdn"])
+                if state is None:
+                    self.ignored_cdrs += 1
+                else:
+                    billed.append((state, cdr))
+            if not billed:
+                continue
+            minutes = calculate_billed_minutes_batch(
+                [cdr["callStart"] for _, cdr in billed], [cdr["callEnd"] for _, cdr in billed]
+            )
+            for (state, cdr), cdr_minutes in zip(billed, minutes.tolist()):
+                self._charge(state, cdr, cdr_minutes)
+
+    def expected_money(self, msisdn: str) -> int:
+        return self._subscribers[msisdn].money
+
+    def expected_amount_left(self, msisdn: str) -> int:
+        return self._subscribers[msisdn].quant_amount_left
+
+    def expected_balances(self) -> Iterator[tuple[str, int, int, int]]:
+        # Строки (msisdn, money, s_type_id, amount_left) в порядке добавления абонентов
+        for msisdn, state in self._subscribers.items():
+            yield msisdn, state.money, state.quant_s_type_id, state.quant_amount_left
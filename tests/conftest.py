@@ -1,36 +1,202 @@
+import glob
+import logging
+import os
+
+import psycopg
 import pytest
+from psycopg_pool import ConnectionPool, PoolTimeout
 
+import phase_timing
 from config import get_settings
-from database import connect_db
+from db_pool import get_brt_pool, get_hrs_pool, wait_pool_ready
+from db_state import DbStateManager, reset_all_sequences
+from msisdn_allocator import XDIST_WORKER_ENV, MsisdnAllocator
+from rabbitmq_sender import PublishReport, RabbitMQPublisher, set_default_publisher
 
+logger = logging.getLogger(__name__)
 
-@pytest.fixture(scope="function")
-def db_connection():
-    settings = get_settings()
-    conn = connect_db(settings.brt_db_name, settings.get_brt_db_url())
-    if conn is None:
-        pytest.fail(f"Не удалось подключиться к БД {settings.brt_db_name}")
+# E2E-сценарии выполняются либо одним пакетным прогоном (по умолчанию), либо каждый в своем цикле
+# тарификации (E2E_SCENARIO_MODE=separate - удобно для отладки одного сценария); оба режима сразу не запускаются
+E2E_SCENARIO_MODE_ENV = "E2E_SCENARIO_MODE"
+E2E_SCENARIO_MODES = ("batched", "separate")
+
+# Ключ pg_advisory_lock, под которым воркеры по очереди проверяют, сброшены ли последовательности
+RESET_SEQUENCES_LOCK_ID = 0x42525430
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "scenario_mode(mode): тест выполняется только в режиме E2E_SCENARIO_MODE=mode")
+    # E2E_PHASE_TIMING=<path> включает разметку фаз; под xdist каждый воркер пишет свой файл <path>.<worker>,
+    # а контроллер в конце сессии сводит их в <path>
+    recorder = phase_timing.enable_from_env()
+    worker = os.environ.get(XDIST_WORKER_ENV)
+    if recorder is not None and worker:
+        recorder.path = f"{recorder.path}.{worker}"
+    elif recorder is not None:
+        # Файлы воркеров прошлого прогона не должны попасть в сводку
+        for stale_path in _worker_phase_reports(recorder.path):
+            os.remove(stale_path)
+
+
+def pytest_collection_modifyitems(config, items):
+    mode = os.environ.get(E2E_SCENARIO_MODE_ENV, E2E_SCENARIO_MODES[0])
+    if mode not in E2E_SCENARIO_MODES:
+        raise pytest.UsageError(f"{E2E_SCENARIO_MODE_ENV}={mode}: допустимо одно из {E2E_SCENARIO_MODES}")
+    selected, deselected = [], []
+    for item in items:
+        marker = item.get_closest_marker("scenario_mode")
+        (deselected if marker is not None and marker.args[0] != mode else selected).append(item)
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+        items[:] = selected
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_protocol(item, nextitem):
+    recorder = phase_timing.get_recorder()
+    if recorder is None:
+        yield
+        return
+    recorder.start_test(item.nodeid)
+    yield
+    reports = item.__dict__.pop("_phase_timing_reports", {})
+    recorder.finish_test(next(
+        (report.outcome for report in reports.values() if report.outcome != "passed"),
+        "passed" if reports else None,
+    ))
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    outcome = yield
+    if phase_timing.get_recorder() is not None:
+        item.__dict__.setdefault("_phase_timing_reports", {})[call.when] = outcome.get_result()
+
+
+def _worker_phase_reports(path: str) -> list[str]:
+    return sorted(glob.glob(f"{glob.escape(path)}.gw*"))
+
+
+def pytest_sessionfinish(session, exitstatus):
+    recorder = phase_timing.get_recorder()
+    if recorder is None:
+        return
+    if not os.environ.get(XDIST_WORKER_ENV):
+        # Воркеры к этому моменту уже записали свои отчеты; без xdist файлов воркеров нет
+        worker_reports = _worker_phase_reports(recorder.path)
+        for worker_path in worker_reports:
+            recorder.merge_report(worker_path)
+        if worker_reports:
+            logger.info(f"Отчет о фазах {recorder.path} сведен из {len(worker_reports)} воркеров")
+    recorder.write_report()
+    phase_timing.disable()
+
+
+@pytest.fixture(scope="session")
+def brt_pool():
+    pool = get_brt_pool()
+    if not wait_pool_ready(pool):
+        pytest.fail(f"Не удалось подключиться к БД {get_settings().brt_db_name}")
+    yield pool
+    pool.close()
+
+
+@pytest.fixture(scope="session")
+def hrs_pool():
+    pool = get_hrs_pool()
+    if not wait_pool_ready(pool):
+        pytest.fail(f"Не удалось подключиться к БД {get_settings().hrs_db_name}")
+    yield pool
+    pool.close()
+
+
+def _borrow_connection(pool: ConnectionPool, db_name: str):
+    try:
+        conn = pool.getconn()
+    except PoolTimeout:
+        pytest.fail(f"Не удалось получить соединение с БД {db_name} из пула")
     yield conn
-    if conn and not conn.closed:
+    if not conn.closed:
         conn.rollback()
-        conn.close()
+    pool.putconn(conn)
 
 
-@pytest.fixture(scope="session", autouse=True)
-def reset_sequences_after_migrations():
-    print("\n[Pytest Session Setup] Попытка сброса последовательностей ID...")
-    settings = get_settings()
-    conn = None
+@pytest.fixture(scope="function")
+def db_connection(brt_pool, reset_sequences_after_migrations):
+    yield from _borrow_connection(brt_pool, get_settings().brt_db_name)
+
+
+@pytest.fixture(scope="function")
+def hrs_db_connection(hrs_pool):
+    yield from _borrow_connection(hrs_pool, get_settings().hrs_db_name)
+
+
+@pytest.fixture(scope="session")
+def reset_sequences_after_migrations(brt_pool, tmp_path_factory):
+    # setval на MAX + 1 может откатить последовательность под вставками другого воркера, поэтому
+    # под xdist сброс выполняет только первый воркер, взявший блокировку: остальные видят метку в общем basetemp
+    worker = os.environ.get(XDIST_WORKER_ENV)
+    done_marker = tmp_path_factory.getbasetemp().parent / "sequences_reset.done" if worker else None
     try:
-        conn = connect_db(settings.brt_db_name, settings.get_brt_db_url())
-        with conn.cursor() as cur:
-            seq_name_pt = 'public.person_tariff_id_seq'
-            cur.execute(
-                f"SELECT setval('{seq_name_pt}', COALESCE((SELECT MAX(id) FROM public.person_tariff), 0) + 1, false);"
-            )
-            conn.commit()
-        print("Не удалось подключиться к БД BRT для сброса последовательностей.")
-    except Exception as e:
-        print(f"Ошибка при сбросе последовательностей: {e}")
-    if conn:
-        conn.rollback()
+        with brt_pool.connection() as conn:
+            conn.execute("SELECT pg_advisory_lock(%s)", (RESET_SEQUENCES_LOCK_ID,))
+            try:
+                if done_marker is None or not done_marker.exists():
+                    reset_all_sequences(conn)
+                    conn.commit()
+                    logger.info("Последовательности ID сброшены после миграций.")
+                    if done_marker is not None:
+                        done_marker.touch()
+            finally:
+                conn.execute("SELECT pg_advisory_unlock(%s)", (RESET_SEQUENCES_LOCK_ID,))
+    except psycopg.Error as e:
+        logger.exception("Ошибка при сбросе последовательностей ID")
+        pytest.fail(f"Не удалось сбросить последовательности ID: {e}")
+
+
+@pytest.fixture(scope="session")
+def brt_state(brt_pool, reset_sequences_after_migrations) -> DbStateManager:
+    state = DbStateManager(brt_pool)
+    state.capture_baseline()
+    return state
+
+
+@pytest.fixture(scope="function")
+def restored_brt_state(brt_state: DbStateManager) -> DbStateManager:
+    # Восстановление очищает все таблицы схемы, поэтому фикстура не совместима с параллельным запуском (-n)
+    brt_state.restore_baseline()
+    return brt_state
+
+
+@pytest.fixture(scope="session")
+def msisdn_allocator() -> MsisdnAllocator:
+    # Сессия каждого xdist-воркера получает свой непересекающийся блок номеров
+    return MsisdnAllocator()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def rabbitmq_publisher():
+    publisher = RabbitMQPublisher()
+    set_default_publisher(publisher)
+    yield publisher
+    set_default_publisher(None)
+    publisher.close()
+
+
+class PacingPublisher:
+    # Публикует без брокера; паузы только записываются
+    def __init__(self):
+        self.sleeps: list[float] = []
+        self.bodies: list[bytes] = []
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+
+    def publish_confirmed(self, bodies, *args, **kwargs) -> PublishReport:
+        self.bodies = list(bodies)
+        return PublishReport(published=len(self.bodies), acked=len(self.bodies))
+
+
+@pytest.fixture(scope="function")
+def pacing_publisher() -> PacingPublisher:
+    return PacingPublisher()
@@ -0,0 +1,52 @@
+import pytest
+
+from bench_history import BRT_COMMIT_ENV, brt_commit, compare_commits, connect_history, mann_whitney_u, record_results
+
+
+def _result(p95_ms: float, throughput: float) -> dict:
+    return {
+        "mode": "closed_loop",
+        "batch_size": 10,
+        "latency": {"p95_ms": p95_ms},
+        "throughput_cdr_s": throughput,
+    }
+
+
+def test_mann_whitney_exact_and_normal():
+    """
+    Точное p-value для разделенных выборок и близкое к 0.5 для одинаковых.
+    """
+    u, p_value = mann_whitney_u([6, 7, 8, 9, 10], [1, 2, 3, 4, 5])
+    assert u == 25
+    assert p_value == pytest.approx(1 / 252)
+    _, p_value = mann_whitney_u([1, 2, 3, 4, 5], [6, 7, 8, 9, 10])
+    assert p_value == pytest.approx(1.0)
+    _, p_value = mann_whitney_u([1.0] * 20 + [2.0] * 20, [1.0] * 20 + [2.0] * 20)
+    assert 0.4 < p_value < 0.6
+
+
+def test_compare_flags_only_significant_regressions(tmp_path):
+    """
+    Рост p95 на 50% при повторах регрессия; изменение пропускной способности в пределах порога - нет.
+    """
+    conn = connect_history(str(tmp_path / "history.sqlite"))
+    record_results(conn, [_result(100 + i, 1000 + i) for i in range(5)], "base")
+    record_results(conn, [_result(150 + i, 980 + i) for i in range(5)], "cand")
+
+    comparisons = {c.metric: c for c in compare_commits(conn, "cand", threshold=0.1)}
+    assert comparisons["p95_ms"].regressed
+    assert comparisons["p95_ms"].p_value < 0.05
+    assert not comparisons["throughput_cdr_s"].regressed
+    conn.close()
+
+
+def test_brt_commit_requires_explicit_value_or_env(monkeypatch):
+    """
+    Коммит BRT берется из аргумента или BRT_COMMIT; без них ошибка, а не git HEAD харнесса.
+    """
+    monkeypatch.delenv(BRT_COMMIT_ENV, raising=False)
+    with pytest.raises(ValueError):
+        brt_commit()
+    monkeypatch.setenv(BRT_COMMIT_ENV, "abc123")
+    assert brt_commit() == "abc123"
+    assert brt_commit("def456") == "def456"
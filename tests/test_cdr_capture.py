@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+from cdr_capture import CdrCaptureReader, CdrCaptureWriter, index_ndjson, replay_capture
+
+
+def _cdr(msisdn: str, start: str) -> dict:
+    return {
+        "callType": "01",
+        "firstSubscriberMsisdn": msisdn,
+        "secondSubscriberMsisdn": "79888888888",
+        "callStart": start,
+        "callEnd": start,
+    }
+
+
+def test_capture_roundtrip(tmp_path):
+    """
+    Записанные сообщения читаются через mmap в том же порядке, с теми же телами и временем.
+    """
+    path = str(tmp_path / "capture.ndjson")
+    messages = [[_cdr(str(79500000000 + i), "2025-05-01T10:00:00")] * (i + 1) for i in range(5)]
+    with CdrCaptureWriter(path) as writer:
+        for i, cdr_list in enumerate(messages):
+            writer.write_cdrs(cdr_list, t_s=i * 0.5)
+
+    with CdrCaptureReader(path) as reader:
+        assert len(reader) == len(messages)
+        replayed = list(reader.iter_messages())
+    assert [json.loads(body) for _, body in replayed] == messages
+    assert [t_s for t_s, _ in replayed] == [0.0, 0.5, 1.0, 1.5, 2.0]
+
+
+def test_discarded_messages_are_not_replayed(tmp_path):
+    """
+    Сообщения без подтверждения убираются из индекса, а запись после них продолжается с новыми номерами.
+    """
+    path = str(tmp_path / "capture.ndjson")
+    with CdrCaptureWriter(path) as writer:
+        for i in range(4):
+            writer.write(f"[{i}]".encode(), t_s=float(i))
+        writer.discard([1, 3])
+        writer.write(b"[4]", t_s=4.0)
+
+    with CdrCaptureReader(path) as reader:
+        assert [(t_s, bytes(body)) for t_s, body in reader.iter_messages()] == [
+            (0.0, b"[0]"), (2.0, b"[2]"), (4.0, b"[4]")
+        ]
+
+
+def test_reader_rejects_index_past_end_of_data(tmp_path):
+    """
+    Индекс с записями при пустом (обрезанном) файле данных отклоняется при открытии, а не на первом чтении.
+    """
+    path = str(tmp_path / "capture.ndjson")
+    with CdrCaptureWriter(path) as writer:
+        writer.write(b"[]", t_s=0.0)
+    open(path, "wb").close()
+
+    with pytest.raises(ValueError, match="за конец файла данных"):
+        CdrCaptureReader(path)
+
+
+def test_index_existing_ndjson_with_call_start_timing(tmp_path):
+    """
+    Индекс строится по готовому NDJSON; пустые строки пропускаются, время берется из callStart.
+    """
+    path = tmp_path / "prod.ndjson"
+    lines = [
+        json.dumps([_cdr("79500000001", "2025-05-01T10:00:00")]),
+        "",
+        json.dumps([_cdr("79500000002", "2025-05-01T10:00:30"), _cdr("79500000003", "2025-05-01T10:00:10")]),
+    ]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    assert index_ndjson(str(path), time_from_call_start=True) == 2
+    with CdrCaptureReader(str(path)) as reader:
+        assert [reader.t_s(i) for i in range(len(reader))] == [0.0, 10.0]
+        assert json.loads(reader.message(1))[0]["firstSubscriberMsisdn"] == "79500000002"
+
+
+def test_replay_waits_through_publisher(tmp_path, pacing_publisher):
+    """
+    Паузы воспроизведения идут через publisher.sleep (с обработкой heartbeat), а не через time.sleep.
+    """
+    path = str(tmp_path / "capture.ndjson")
+    with CdrCaptureWriter(path) as writer:
+        for i in range(3):
+            writer.write_cdrs([_cdr(str(79500000000 + i), "2025-05-01T10:00:00")], t_s=i * 100.0)
+
+    result = replay_capture(path, pacing_publisher, speed=10.0)
+
+    assert result.messages == len(pacing_publisher.bodies) == 3
+    assert result.capture_duration_s == 200.0
+    assert len(pacing_publisher.sleeps) == 3
+    assert pacing_publisher.sleeps[1] > 9.0 and pacing_publisher.sleeps[2] > 19.0
@@ -0,0 +1,58 @@
+from cdr_generator import CdrGeneratorConfig, generate_cdr_batches, generate_cdrs
+from utils import calculate_billed_minutes
+
+SUBSCRIBER_MSISDN_START = 79500000000
+SUBSCRIBER_COUNT = 50
+
+CDR_KEYS = {"callType", "firstSubscriberMsisdn", "secondSubscriberMsisdn", "callStart", "callEnd"}
+
+
+def _config(**overrides) -> CdrGeneratorConfig:
+    params = dict(
+        total_cdrs=1000,
+        batch_size=64,
+        seed=42,
+        subscriber_msisdn_start=SUBSCRIBER_MSISDN_START,
+        subscriber_count=SUBSCRIBER_COUNT,
+    )
+    params.update(overrides)
+    return CdrGeneratorConfig(**params)
+
+
+def test_generator_is_deterministic_for_seed():
+    """
+    Одинаковый seed дает одинаковый поток CDR, другой seed - другой.
+    """
+    assert list(generate_cdrs(_config())) == list(generate_cdrs(_config()))
+    assert list(generate_cdrs(_config())) != list(generate_cdrs(_config(seed=43)))
+
+
+def test_generated_cdr_shape_and_batches():
+    """
+    CDR имеют формат, который ждет BRT, а пачки не превышают batch_size.
+    """
+    config = _config()
+    batches = list(generate_cdr_batches(config))
+
+    assert [len(batch) for batch in batches[:-1]] == [config.batch_size] * (len(batches) - 1)
+    assert sum(len(batch) for batch in batches) == config.total_cdrs
+
+    subscribers = {str(SUBSCRIBER_MSISDN_START + i) for i in range(SUBSCRIBER_COUNT)}
+    for cdr in (cdr for batch in batches for cdr in batch):
+        assert set(cdr) == CDR_KEYS, f"Неожиданный набор полей CDR: {cdr}"
+        assert cdr["firstSubscriberMsisdn"] in subscribers
+        assert cdr["firstSubscriberMsisdn"] != cdr["secondSubscriberMsisdn"]
+        assert calculate_billed_minutes(cdr["callStart"], cdr["callEnd"]) >= 1
+
+
+def test_in_network_ratio_extremes():
+    """
+    in_network_ratio=0 дает только внешних собеседников, 1 - только абонентов своей сети.
+    """
+    subscribers = {str(SUBSCRIBER_MSISDN_START + i) for i in range(SUBSCRIBER_COUNT)}
+
+    external_only = list(generate_cdrs(_config(in_network_ratio=0.0)))
+    assert not any(cdr["secondSubscriberMsisdn"] in subscribers for cdr in external_only)
+
+    in_network_only = list(generate_cdrs(_config(in_network_ratio=1.0)))
+    assert all(cdr["secondSubscriberMsisdn"] in subscribers for cdr in in_network_only)
@@ -0,0 +1,32 @@
+import logging
+
+import psycopg
+import pytest
+
+from batched_runner import run_batched_scenarios
+from msisdn_allocator import MsisdnAllocator
+from scenarios import ALL_SCENARIOS
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.mark.scenario_mode("batched")
+def test_e2e_all_scenarios_batched(
+        db_connection: psycopg.Connection,
+        msisdn_allocator: MsisdnAllocator,
+):
+    """
+    Все E2E-сценарии за один цикл тарификации: общий провижининг, общая отправка и одно ожидание,
+    затем независимая проверка каждого сценария.
+    """
+    result = run_batched_scenarios(db_connection, ALL_SCENARIOS, msisdn_allocator)
+
+    assert result.published, "Ошибка отправки CDR в RabbitMQ"
+    assert len(result.verdicts) == len(ALL_SCENARIOS)
+    for verdict in result.failed:
+        logger.error(
+            f"{verdict.name}: money {verdict.money_mismatches}, quant_services {verdict.quant_mismatches}"
+        )
+    assert result.passed, f"Не прошли сценарии: {[verdict.name for verdict in result.failed]}"
+
+    logger.info(f"Пакетный прогон {len(ALL_SCENARIOS)} сценариев: ожидание {result.wait.elapsed_s:.2f} с")
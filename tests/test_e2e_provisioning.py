@@ -0,0 +1,80 @@
+from datetime import datetime
+
+import psycopg
+
+from database import bulk_create_or_update_subscribers_with_related_data, create_or_update_subscribers_with_related_data
+from msisdn_allocator import MsisdnAllocator
+from subscriber_schema import ProvisioningReport, SubscriberCreationData
+
+MONTHLY_TARIFF_ID = 12
+CLASSIC_TARIFF_ID = 11
+PACKAGE_S_TYPE_ID = 0
+
+
+def _person_tariffs(conn: psycopg.Connection, msisdns: list[str]) -> dict[str, tuple[int, datetime]]:
+    # Только записи person_tariff абонентов теста: воркеры xdist параллельно вставляют свои
+    rows = conn.execute(
+        """
+        SELECT p.msisdn, pt.id, pt.start_date
+        FROM person p
+                 JOIN person_tariff pt ON pt.id = p.tariff_id
+        WHERE p.msisdn = ANY(%s);
+        """,
+        (msisdns,),
+    ).fetchall()
+    conn.rollback()
+    return {msisdn: (person_tariff_id, start_date) for msisdn, person_tariff_id, start_date in rows}
+
+
+def _person_tariff_ids(conn: psycopg.Connection, msisdns: list[str]) -> dict[str, int]:
+    return {msisdn: person_tariff_id for msisdn, (person_tariff_id, _) in _person_tariffs(conn, msisdns).items()}
+
+
+def _subscribers(msisdns: list[str], tariff_id: int, money: int = 100) -> list[SubscriberCreationData]:
+    return [
+        SubscriberCreationData(
+            msisdn=msisdn,
+            money=money,
+            tariff_id_logical=tariff_id,
+            name_prefix="Idempotent_",
+            quant_s_type_id=PACKAGE_S_TYPE_ID,
+            quant_amount_left=10,
+        )
+        for msisdn in msisdns
+    ]
+
+
+def test_repeated_provisioning_skips_unchanged_rows(
+        db_connection: psycopg.Connection,
+        msisdn_allocator: MsisdnAllocator,
+):
+    """
+    Повторный провижининг того же состояния ничего не пишет и не создает новых person_tariff;
+    смена тарифа создает ровно по одной записи person_tariff на абонента. Оба пути следуют одному правилу
+    start_date: прежний тариф сохраняет свою дату, новые записи вызова получают общую метку времени.
+    """
+    msisdns = msisdn_allocator.allocate_many(3)
+    for provision in (create_or_update_subscribers_with_related_data,
+                      bulk_create_or_update_subscribers_with_related_data):
+        first = ProvisioningReport()
+        assert len(provision(db_connection, _subscribers(msisdns, MONTHLY_TARIFF_ID), first)) == 3
+        tariffs_before = _person_tariff_ids(db_connection, msisdns)
+        assert len(tariffs_before) == 3
+        person_tariffs_before = _person_tariffs(db_connection, msisdns)
+
+        repeated = ProvisioningReport()
+        assert len(provision(db_connection, _subscribers(msisdns, MONTHLY_TARIFF_ID), repeated)) == 3
+        assert repeated.created == repeated.updated == 0
+        assert repeated.unchanged == repeated.person_tariff_skipped == repeated.quant_skipped == 3
+        assert _person_tariffs(db_connection, msisdns) == person_tariffs_before
+
+        changed = ProvisioningReport()
+        provision(db_connection, _subscribers(msisdns, CLASSIC_TARIFF_ID, money=50), changed)
+        assert changed.updated == 3 and changed.person_tariff_skipped == 0 and changed.quant_skipped == 3
+        tariffs_changed = _person_tariff_ids(db_connection, msisdns)
+        assert tariffs_changed.keys() == tariffs_before.keys()
+        assert len(set(tariffs_changed.values()) | set(tariffs_before.values())) == 6
+        assert len({start_date for _, start_date in _person_tariffs(db_connection, msisdns).values()}) == 1
+
+        # Следующий проход начинает с исходного тарифа
+        provision(db_connection, _subscribers(msisdns, MONTHLY_TARIFF_ID), ProvisioningReport())
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+import psycopg
+
+from database import bulk_create_or_update_subscribers_with_related_data
+from hrs_database import ChargeReconciler
+from msisdn_allocator import MsisdnAllocator
+from subscriber_schema import SubscriberCreationData
+
+CLASSIC_TARIFF_ID = 11
+INITIAL_BALANCE = 100
+
+
+def test_reconciler_reads_only_run_subscribers(
+        db_connection: psycopg.Connection,
+        hrs_db_connection: psycopg.Connection,
+        msisdn_allocator: MsisdnAllocator,
+):
+    """
+    Сверка без звонков: у подготовленных абонентов списание в BRT и начисления HRS нулевые,
+    абонент без строки person сообщается как missing_in_brt.
+    """
+    since = datetime.now()
+    provisioned = msisdn_allocator.allocate_many(3)
+    missing = msisdn_allocator.allocate()
+    assert len(bulk_create_or_update_subscribers_with_related_data(db_connection, [
+        SubscriberCreationData(
+            msisdn=msisdn, money=INITIAL_BALANCE, tariff_id_logical=CLASSIC_TARIFF_ID, name_prefix="Reconcile_"
+        )
+        for msisdn in provisioned
+    ])) == 3
+
+    reconciler = ChargeReconciler(db_connection, hrs_db_connection, since)
+    initial_balances = sorted((msisdn, INITIAL_BALANCE) for msisdn in [*provisioned, missing])
+    mismatches = list(reconciler.iter_mismatches(initial_balances))
+    db_connection.rollback()
+    hrs_db_connection.rollback()
+
+    assert [(m.msisdn, m.reason) for m in mismatches] == [(missing, "missing_in_brt")]
+    assert reconciler.checked == 4
@@ -0,0 +1,55 @@
+import logging
+
+import psycopg
+import pytest
+
+from balance_waiter import wait_for_balances
+from database import create_or_update_subscribers_with_related_data, get_quant_service_balance, get_sub_balance
+from msisdn_allocator import MsisdnAllocator
+from rabbitmq_sender import send_cdr_list_to_rabbitmq
+from scenarios import ALL_SCENARIOS, E2EScenario
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.mark.scenario_mode("separate")
+@pytest.mark.parametrize("scenario", ALL_SCENARIOS, ids=lambda scenario: scenario.name)
+def test_e2e_scenario(
+        db_connection: psycopg.Connection,
+        msisdn_allocator: MsisdnAllocator,
+        scenario: E2EScenario,
+):
+    """
+    Один E2E-сценарий в собственном цикле тарификации: абоненты, CDR и ожидания берутся из scenarios.py.
+    """
+    msisdns = dict(zip(scenario.aliases, msisdn_allocator.allocate_many(len(scenario.aliases))))
+    person_ids = create_or_update_subscribers_with_related_data(db_connection, scenario.subscriber_data(msisdns))
+    assert len(person_ids) == len(msisdns), f"Не удалось подготовить абонентов сценария {scenario.name}"
+
+    assert send_cdr_list_to_rabbitmq(scenario.cdr_list(msisdns)), "Ошибка отправки CDR в RabbitMQ"
+
+    wait = wait_for_balances(
+        db_connection,
+        expected_money=scenario.expected_money_by_msisdn(msisdns),
+        expected_quant=scenario.expected_quant_by_key(msisdns, person_ids),
+        timeout_s=scenario.timeout_s,
+        stable_for_s=scenario.stable_for_s,
+    )
+    assert wait.converged, (
+        f"Балансы сценария {scenario.name} не сошлись за {wait.elapsed_s:.1f} с: "
+        f"money {wait.money_mismatches}, quant_services {wait.quant_mismatches}"
+    )
+
+    for alias, expected_money in scenario.expected_money.items():
+        actual_money = get_sub_balance(db_connection, msisdns[alias])
+        assert actual_money is not None, f"Не удалось получить баланс для {msisdns[alias]} ({alias})"
+        assert actual_money == expected_money, \
+            f"Баланс {alias} {msisdns[alias]}: {actual_money}, ожидалось: {expected_money}"
+    for alias, (s_type_id, expected_amount_left) in scenario.expected_quant.items():
+        p_id = person_ids[msisdns[alias]]
+        actual_amount_left = get_quant_service_balance(db_connection, p_id, s_type_id)
+        assert actual_amount_left is not None, f"Не удалось получить остаток пакета для p_id {p_id} ({alias})"
+        assert actual_amount_left == expected_amount_left, \
+            f"Остаток пакета {alias} (s_type_id={s_type_id}): {actual_amount_left}, ожидалось: {expected_amount_left}"
+
+    logger.info(f"Сценарий {scenario.name} пройден: {msisdns}")
@@ -0,0 +1,66 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from hrs_database import ChargeReconciler
+
+
+def _reconciler() -> ChargeReconciler:
+    # Слиянию соединения не нужны: потоки передаются напрямую
+    return ChargeReconciler(brt_conn=None, hrs_conn=None, since=datetime(2025, 5, 1))
+
+
+def test_merge_reports_mismatched_and_missing_msisdns():
+    """
+    Совпавший абонент не попадает в отчет; расхождение суммы, отсутствие в BRT и абонент без начислений HRS
+    сообщаются; начисления HRS по абонентам вне прогона только считаются.
+    """
+    initial_balances = [
+        ("79500000001", 100),
+        ("79500000002", 100),
+        ("79500000003", 100),
+        ("79500000004", 100),
+    ]
+    brt_rows = iter([
+        ("79500000000", Decimal("7")),
+        ("79500000001", Decimal("40")),
+        ("79500000002", Decimal("75")),
+        ("79500000004", Decimal("90")),
+    ])
+    hrs_rows = iter([
+        ("79400000000", Decimal("5")),
+        ("79500000001", Decimal("60")),
+        ("79500000002", Decimal("30")),
+        ("79500000003", Decimal("15")),
+        ("79600000000", Decimal("1")),
+        ("79600000001", Decimal("2")),
+    ])
+    reconciler = _reconciler()
+
+    mismatches = list(reconciler.merge(initial_balances, brt_rows, hrs_rows))
+
+    assert [(m.msisdn, m.brt_delta, m.hrs_charge, m.reason) for m in mismatches] == [
+        ("79500000002", Decimal("25"), Decimal("30"), "amount_mismatch"),
+        ("79500000003", None, Decimal("15"), "missing_in_brt"),
+        ("79500000004", Decimal("10"), Decimal("0"), "amount_mismatch"),
+    ]
+    assert reconciler.checked == 4
+    assert reconciler.mismatched == 3
+    # 79400000000 пропущен до абонентов прогона; после последнего абонента поток HRS дальше не читается
+    assert reconciler.untracked_hrs_rows == 1
+    assert next(hrs_rows) == ("79600000001", Decimal("2"))
+
+
+def test_merge_treats_null_brt_balance_as_missing():
+    reconciler = _reconciler()
+    mismatches = list(reconciler.merge(
+        [("79500000001", 100)], iter([("79500000001", None)]), iter([])
+    ))
+    assert [(m.msisdn, m.reason) for m in mismatches] == [("79500000001", "missing_in_brt")]
+
+
+def test_merge_rejects_unsorted_initial_balances():
+    reconciler = _reconciler()
+    with pytest.raises(ValueError):
+        list(reconciler.merge([("79500000002", 100), ("79500000001", 100)], iter([]), iter([])))
@@ -0,0 +1,50 @@
+import time
+
+import psycopg
+import pytest
+
+from config import get_settings
+from latency_benchmark import BENCH_INITIAL_BALANCE, BalanceChangeObserver, _latency_result, benchmark_msisdn_range
+from msisdn_allocator import MsisdnAllocator, worker_msisdn_range
+from producer_pool import producer_msisdn_range
+
+
+def _span(range_fn, max_workers: int) -> tuple[int, int]:
+    return range_fn(0)[0], range_fn(max_workers - 1)[1]
+
+
+def test_benchmark_range_is_disjoint_from_tests_and_producers():
+    """
+    Абоненты бенчмарка не пересекаются с блоками воркеров pytest и процессов-производителей.
+    """
+    settings = get_settings()
+    bench = _span(benchmark_msisdn_range, settings.benchmark_msisdn_max_workers)
+    for other in (
+            _span(worker_msisdn_range, settings.msisdn_pool_max_workers),
+            _span(producer_msisdn_range, settings.producer_msisdn_max_workers),
+    ):
+        assert bench[1] <= other[0] or other[1] <= bench[0]
+
+    allocator = MsisdnAllocator(0, msisdn_range=benchmark_msisdn_range(0))
+    assert int(allocator.allocate()) == settings.benchmark_msisdn_base
+
+
+class _BrokenPool:
+    def connection(self):
+        raise psycopg.OperationalError("connection refused")
+
+
+def test_observer_database_error_fails_the_measurement():
+    """
+    Ошибка БД в фоновом опросе записывается в observer.error, ожидание не тянется до таймаута,
+    а результат не собирается из неполных задержек.
+    """
+    observer = BalanceChangeObserver(_BrokenPool(), BENCH_INITIAL_BALANCE, poll_interval_s=0.01)
+    observer.track(["77000000000"], time.monotonic())
+    observer.start()
+    assert not observer.wait_drained(timeout_s=5.0)
+    observer.stop()
+
+    assert "connection refused" in observer.error
+    with pytest.raises(RuntimeError, match="connection refused"):
+        _latency_result(observer, 1, 0.0, 1.0, False, 0, 0.01)
@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+from open_loop_load import OpenLoopRun, RateSchedule, RateStep, intended_send_offsets
+
+
+def test_constant_rate_schedule_is_evenly_spaced():
+    """
+    Постоянная скорость 10 CDR/с: плановые отправки идут ровно через 100 мс, всего rate * duration.
+    """
+    schedule = RateSchedule.constant(rate_cdr_s=10, duration_s=2)
+    offsets = list(intended_send_offsets(schedule))
+
+    assert len(offsets) == schedule.total_cdrs == 20
+    assert offsets == pytest.approx([0.1 * (i + 1) for i in range(20)])
+
+
+def test_burst_allows_initial_back_to_back_sends():
+    """
+    Ведро емкостью 5 токенов позволяет отправить первые сообщения сразу, дальше - со скоростью расписания.
+    """
+    offsets = list(intended_send_offsets(RateSchedule.constant(rate_cdr_s=10, duration_s=1), burst=5))
+
+    assert offsets[:5] == pytest.approx([0.0, 0.0, 0.0, 0.0, 0.1])
+    assert len(offsets) == 14
+
+
+def test_ramp_schedule_accelerates_monotonically():
+    """
+    Рампа 10 -> 30 CDR/с: интервалы между отправками сокращаются, общее число совпадает с расписанием.
+    """
+    schedule = RateSchedule(steps=[
+        RateStep(duration_s=1, rate_cdr_s=10),
+        RateStep(duration_s=1, rate_cdr_s=30, ramp=True),
+    ])
+    offsets = list(intended_send_offsets(schedule))
+    ramp_gaps = [b - a for a, b in zip(offsets[10:], offsets[11:])]
+
+    assert len(offsets) == schedule.total_cdrs == 30
+    assert all(later < earlier for earlier, later in zip(ramp_gaps, ramp_gaps[1:]))
+    assert offsets[-1] == pytest.approx(2.0)
+
+
+def test_open_loop_records_intended_time_per_cdr(pacing_publisher):
+    """
+    Паузы между сообщениями идут через publisher.sleep, а плановое время запоминается для каждого CDR,
+    а не только для последнего CDR сообщения; неполное сообщение в конце расписания не отправляется.
+    """
+    run = OpenLoopRun(RateSchedule.constant(rate_cdr_s=10, duration_s=0.5), pacing_publisher)
+    started_at = time.monotonic()
+
+    result = run.run([[{"n": i}, {"n": i + 1}] for i in range(0, 6, 2)])
+
+    assert result.messages == len(pacing_publisher.bodies) == 2
+    assert result.cdrs == 4
+    assert len(pacing_publisher.sleeps) == 2
+    offsets = [intended - started_at for intended in run.intended_at]
+    assert offsets == pytest.approx([0.1, 0.2, 0.3, 0.4], abs=0.05)
+    assert len(run.actual_at) == 4
+    assert run.actual_at[0] == run.actual_at[1]
@@ -0,0 +1,52 @@
+import json
+
+import phase_timing
+
+
+def test_spans_and_counters_are_attributed_to_current_test(tmp_path, monkeypatch):
+    """
+    Фазы и счетчики попадают в текущий тест, а при выключенной записи span и count ничего не делают.
+    """
+    path = tmp_path / "phases.json"
+    # Запись сессии (если включена через E2E_PHASE_TIMING) вернется после теста
+    monkeypatch.setattr(phase_timing, "_recorder", None)
+    recorder = phase_timing.enable(str(path))
+    recorder.start_test("t1")
+    with phase_timing.span(phase_timing.PHASE_PUBLISH):
+        phase_timing.count("rabbitmq.messages", 3)
+    phase_timing.timed(phase_timing.PHASE_WAIT)(lambda: None)()
+    recorder.finish_test("passed")
+    recorder.write_report()
+    phase_timing.disable()
+
+    with phase_timing.span(phase_timing.PHASE_PUBLISH):
+        phase_timing.count("rabbitmq.messages")
+    assert recorder.tests["t1"].counters == {"rabbitmq.messages": 3}
+
+    report = json.loads(path.read_text(encoding="utf-8"))
+    assert set(report["tests"]["t1"]["phases"]) == {phase_timing.PHASE_PUBLISH, phase_timing.PHASE_WAIT}
+    assert report["session"]["counters"] == {"rabbitmq.messages": 3}
+
+
+def test_worker_reports_merge_into_one_session(tmp_path):
+    """
+    Отчеты воркеров xdist сводятся в один: тесты объединяются, счетчики и фазы суммируются.
+    """
+    for worker, nodeid in (("gw0", "t1"), ("gw1", "t2")):
+        recorder = phase_timing.PhaseRecorder(str(tmp_path / f"phases.json.{worker}"))
+        recorder.start_test(nodeid)
+        recorder.add_phase(phase_timing.PHASE_PUBLISH, 0.5)
+        recorder.add_count("rabbitmq.messages", 2)
+        recorder.finish_test("passed")
+        recorder.add_statement("reset_sequences", 0.1)
+        recorder.write_report()
+
+    controller = phase_timing.PhaseRecorder(str(tmp_path / "phases.json"))
+    for worker in ("gw0", "gw1"):
+        controller.merge_report(str(tmp_path / f"phases.json.{worker}"))
+
+    summary = controller.summary()
+    assert summary["tests"] == 2
+    assert summary["counters"] == {"rabbitmq.messages": 4}
+    assert summary["phases"][phase_timing.PHASE_PUBLISH]["calls"] == 2
+    assert summary["statements"]["reset_sequences"]["calls"] == 2
@@ -0,0 +1,40 @@
+import pytest
+
+from cdr_generator import CdrGeneratorConfig, generate_cdrs
+from config import get_settings
+from msisdn_allocator import worker_msisdn_range
+from producer_pool import producer_msisdn_range, shard_generator_configs
+
+
+def test_shards_split_total_with_distinct_seeds_and_ranges():
+    """
+    Шарды в сумме дают исходное число CDR, а seed и блоки MSISDN у процессов различаются.
+    """
+    template = CdrGeneratorConfig(total_cdrs=1003, subscriber_msisdn_start=0, subscriber_count=20)
+    shards = shard_generator_configs(template, processes=4, base_seed=100)
+
+    assert sum(config.total_cdrs for _, config in shards) == 1003
+    assert [config.seed for _, config in shards] == [100, 101, 102, 103]
+    for worker_index, config in shards:
+        start, end = producer_msisdn_range(worker_index)
+        msisdns = {int(cdr["firstSubscriberMsisdn"]) for cdr in generate_cdrs(config)}
+        assert all(start <= msisdn < end for msisdn in msisdns)
+
+
+def test_producer_range_does_not_overlap_xdist_worker_blocks():
+    """
+    Диапазон производителей целиком лежит вне блоков всех возможных воркеров pytest-xdist.
+    """
+    settings = get_settings()
+    producers_start, _ = producer_msisdn_range(0)
+    _, producers_end = producer_msisdn_range(settings.producer_msisdn_max_workers - 1)
+    workers_start, _ = worker_msisdn_range(0)
+    _, workers_end = worker_msisdn_range(settings.msisdn_pool_max_workers - 1)
+
+    assert producers_end <= workers_start or workers_end <= producers_start
+
+
+def test_too_many_processes_are_rejected():
+    template = CdrGeneratorConfig(total_cdrs=10, subscriber_msisdn_start=0, subscriber_count=20)
+    with pytest.raises(ValueError, match="producer_msisdn_max_workers"):
+        shard_generator_configs(template, processes=get_settings().producer_msisdn_max_workers + 1, base_seed=0)
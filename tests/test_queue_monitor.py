@@ -0,0 +1,31 @@
+from queue_monitor import QueueDepthSampler
+
+
+class _FlakySampler(QueueDepthSampler):
+    """
+    Сэмплер, у которого первый замер падает на сокете, а следующие возвращают фиксированную глубину.
+    """
+
+    def __init__(self):
+        super().__init__(queue_name="cdr-queue")
+        self.calls = 0
+
+    def _declare_passive(self) -> tuple[int, int]:
+        self.calls += 1
+        if self.calls == 1:
+            raise ConnectionResetError("connection reset by peer")
+        return 5, 1
+
+
+def test_sampler_records_socket_error_and_recovers_on_next_tick():
+    """
+    Ошибка, отличная от AMQPError, попадает в QueueSample.error и не мешает следующему замеру.
+    """
+    sampler = _FlakySampler()
+
+    failed = sampler._sample(started_at=0.0)
+    sampler.samples.append(failed)
+    recovered = sampler._sample(started_at=0.0)
+
+    assert failed.message_count is None and "ConnectionResetError" in failed.error
+    assert recovered.error is None and recovered.message_count == 5
@@ -0,0 +1,32 @@
+import json
+
+from rabbitmq_sender import iter_cdr_messages
+
+CDRS = [
+    {
+        "callType": "01",
+        "firstSubscriberMsisdn": str(79500000000 + i),
+        "secondSubscriberMsisdn": "79888888888",
+        "callStart": "2025-05-01T10:00:00",
+        "callEnd": "2025-05-01T10:03:45",
+    }
+    for i in range(25)
+]
+
+
+def test_split_by_count_and_bytes():
+    """
+    Сообщения не превышают лимиты по числу CDR и байтам, вместе содержат все CDR в исходном порядке.
+    """
+    single_size = len(json.dumps([CDRS[0]], ensure_ascii=False).encode('utf-8'))
+    max_bytes = single_size * 3
+
+    messages = list(iter_cdr_messages(CDRS, max_cdrs=10, max_bytes=max_bytes))
+    assert all(len(chunk) <= 10 and len(body) <= max_bytes for chunk, body in messages)
+    assert [cdr for _, body in messages for cdr in json.loads(body)] == CDRS
+    assert [cdr for chunk, _ in messages for cdr in chunk] == CDRS
+
+    assert [len(chunk) for chunk, _ in iter_cdr_messages(CDRS, max_cdrs=10)] == [10, 10, 5]
+    assert len(list(iter_cdr_messages(CDRS))) == 1
+    # Запись больше лимита не теряется, а уходит отдельным сообщением
+    assert [len(chunk) for chunk, _ in iter_cdr_messages(CDRS[:2], max_bytes=10)] == [1, 1]
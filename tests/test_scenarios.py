@@ -0,0 +1,31 @@
+import pytest
+
+from scenarios import ALL_SCENARIOS, E2E_MONTHLY_02, MONTHLY_PACKAGE_S_TYPE_ID, E2EScenario
+from tariff_oracle import TariffOracle
+
+
+@pytest.mark.parametrize("scenario", ALL_SCENARIOS, ids=lambda scenario: scenario.name)
+def test_scenario_expectations_match_tariff_oracle(scenario: E2EScenario):
+    """
+    Ожидания, записанные в декларативных сценариях, совпадают с расчетом эталонной модели тарификации.
+    """
+    msisdns = {alias: str(79500000000 + i) for i, alias in enumerate(scenario.aliases)}
+    oracle = TariffOracle()
+    oracle.add_subscribers(scenario.subscriber_data(msisdns))
+    oracle.apply_many(scenario.cdr_list(msisdns))
+
+    for alias, money in scenario.expected_money.items():
+        assert oracle.expected_money(msisdns[alias]) == money, alias
+    for alias, (_, amount_left) in scenario.expected_quant.items():
+        assert oracle.expected_amount_left(msisdns[alias]) == amount_left, alias
+
+
+def test_expected_balance_rows_skip_unchecked_columns():
+    """
+    Строки для set-based сверки: money без пакета проверяется без quant_services, пакет - вместе с остатком.
+    """
+    msisdns = {"p2": "79500000001", "p1": "79500000002"}
+    assert E2E_MONTHLY_02.expected_balance_rows(msisdns) == [
+        ("79500000001", 170, MONTHLY_PACKAGE_S_TYPE_ID, 0),
+        ("79500000002", 50, None, None),
+    ]
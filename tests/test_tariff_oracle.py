@@ -0,0 +1,101 @@
+from subscriber_schema import SubscriberCreationData
+from tariff_oracle import TariffOracle
+
+MSISDN_CLASSIC = "79500000001"
+MSISDN_CLASSIC_2 = "79500000002"
+MSISDN_MONTHLY = "79500000003"
+MSISDN_EXTERNAL = "79888888888"
+
+
+def _cdr(call_type: str, first: str, second: str, start: str, end: str) -> dict:
+    return {
+        "callType": call_type,
+        "firstSubscriberMsisdn": first,
+        "secondSubscriberMsisdn": second,
+        "callStart": start,
+        "callEnd": end,
+    }
+
+
+def _oracle(monthly_package_minutes: int = 3) -> TariffOracle:
+    oracle = TariffOracle()
+    oracle.add_subscribers([
+        SubscriberCreationData(msisdn=MSISDN_CLASSIC, money=50, tariff_id_logical=11),
+        SubscriberCreationData(msisdn=MSISDN_CLASSIC_2, money=60, tariff_id_logical=11),
+        SubscriberCreationData(
+            msisdn=MSISDN_MONTHLY, money=200, tariff_id_logical=12,
+            quant_s_type_id=0, quant_amount_left=monthly_package_minutes,
+        ),
+    ])
+    return oracle
+
+
+def test_classic_in_network_external_and_incoming():
+    """
+    Классика: 15/мин внутри сети (E2E-CLASSIC-01), 25/мин на внешнюю сеть (E2E-CLASSIC-02), входящий бесплатно.
+    """
+    oracle = _oracle()
+    assert oracle.apply(_cdr("01", MSISDN_CLASSIC, MSISDN_CLASSIC_2, "2025-05-01T10:00:00", "2025-05-01T10:03:45")) == 60
+    assert oracle.apply(_cdr("01", MSISDN_CLASSIC, MSISDN_EXTERNAL, "2025-05-01T11:00:00", "2025-05-01T11:01:10")) == 50
+    assert oracle.apply(_cdr("02", MSISDN_CLASSIC, MSISDN_EXTERNAL, "2025-05-01T12:00:00", "2025-05-01T12:05:00")) == 0
+
+    assert oracle.expected_money(MSISDN_CLASSIC) == 50 - 60 - 50
+    assert oracle.expected_money(MSISDN_CLASSIC_2) == 60
+
+
+def test_monthly_package_then_money():
+    """
+    Помесячный: сначала расходуется пакет (E2E-MONTHLY-01), остаток оплачивается деньгами
+    по ставке внутри сети (E2E-MONTHLY-02) или на внешнюю сеть (E2E-MONTHLY-03).
+    """
+    within_package = _oracle(monthly_package_minutes=40)
+    within_package.apply(_cdr("01", MSISDN_MONTHLY, MSISDN_EXTERNAL, "2025-05-01T13:00:00", "2025-05-01T13:05:30"))
+    assert within_package.expected_amount_left(MSISDN_MONTHLY) == 34
+    assert within_package.expected_money(MSISDN_MONTHLY) == 200
+
+    in_network = _oracle()
+    in_network.apply(_cdr("01", MSISDN_MONTHLY, MSISDN_CLASSIC, "2025-05-01T14:00:00", "2025-05-01T14:04:59"))
+    assert in_network.expected_amount_left(MSISDN_MONTHLY) == 0
+    assert in_network.expected_money(MSISDN_MONTHLY) == 170
+
+    external = _oracle()
+    external.apply(_cdr("01", MSISDN_MONTHLY, MSISDN_EXTERNAL, "2025-05-01T15:00:00", "2025-05-01T15:04:59"))
+    assert external.expected_amount_left(MSISDN_MONTHLY) == 0
+    assert external.expected_money(MSISDN_MONTHLY) == 150
+
+
+def test_cdr_of_unknown_subscriber_is_ignored():
+    """
+    CDR, где первый абонент не обслуживается в BRT, не меняет состояние модели.
+    """
+    oracle = _oracle()
+    assert oracle.apply(_cdr("01", MSISDN_EXTERNAL, MSISDN_CLASSIC, "2025-05-01T10:00:00", "2025-05-01T10:03:00")) == 0
+    assert oracle.ignored_cdrs == 1
+    assert list(oracle.expected_balances()) == [
+        (MSISDN_CLASSIC, 50, 0, 0),
+        (MSISDN_CLASSIC_2, 60, 0, 0),
+        (MSISDN_MONTHLY, 200, 0, 3),
+    ]
+
+
+def test_apply_many_matches_per_cdr_apply():
+    """
+    Пакетное применение дает те же балансы, что и поштучное, включая расход пакета по порядку звонков.
+    """
+    cdrs = [
+        _cdr("01", MSISDN_MONTHLY, MSISDN_CLASSIC, "2025-05-01T14:00:00", "2025-05-01T14:02:01"),
+        _cdr("01", MSISDN_EXTERNAL, MSISDN_CLASSIC, "2025-05-01T14:10:00", "2025-05-01T14:13:00"),
+        _cdr("01", MSISDN_MONTHLY, MSISDN_EXTERNAL, "2025-05-01T15:00:00", "2025-05-01T15:04:59"),
+        _cdr("01", MSISDN_CLASSIC, MSISDN_CLASSIC_2, "2025-05-01T10:00:00", "2025-05-01T10:03:45"),
+        _cdr("02", MSISDN_CLASSIC_2, MSISDN_EXTERNAL, "2025-05-01T12:00:00", "2025-05-01T12:05:00"),
+    ]
+    one_by_one = _oracle()
+    for cdr in cdrs:
+        one_by_one.apply(cdr)
+    batched = _oracle()
+    batched.apply_many(cdrs)
+
+    assert list(batched.expected_balances()) == list(one_by_one.expected_balances())
+    assert (batched.applied_cdrs, batched.ignored_cdrs) == (4, 1)
+    assert batched.expected_amount_left(MSISDN_MONTHLY) == 0
+    assert batched.expected_money(MSISDN_MONTHLY) == 200 - 5 * 25
@@ -0,0 +1,44 @@
+import numpy as np
+
+from cdr_generator import CdrGeneratorConfig, DurationDistribution, generate_cdrs
+from utils import calculate_billed_minutes, calculate_billed_minutes_batch
+
+EDGE_CASE_CALLS = [
+    ("2025-05-01T10:00:00", "2025-05-01T10:00:00"),  # нулевая длительность
+    ("2025-05-01T10:00:00", "2025-05-01T10:01:00"),  # ровно минута
+    ("2025-05-01T10:00:00", "2025-05-01T10:01:01"),  # секунда сверх минуты
+    ("2025-05-01T10:00:00", "2025-05-01T10:00:00.000001"),
+    ("2025-05-01T10:00:00", "2025-05-01T10:03:45"),
+    ("2025-05-01T23:59:30", "2025-05-02T00:00:31"),  # переход через полночь
+    ("2025-05-01T10:01:30", "2025-05-01T10:00:00"),  # конец раньше начала
+]
+
+
+def test_batch_matches_scalar_on_edge_cases():
+    """
+    Пакетный расчет совпадает со скалярным calculate_billed_minutes на граничных случаях.
+    """
+    starts, ends = zip(*EDGE_CASE_CALLS)
+    expected = [calculate_billed_minutes(start, end) for start, end in EDGE_CASE_CALLS]
+
+    assert calculate_billed_minutes_batch(starts, ends).tolist() == expected
+
+
+def test_batch_matches_scalar_on_generated_cdrs():
+    """
+    Пакетный расчет совпадает со скалярным на потоке сгенерированных CDR.
+    """
+    config = CdrGeneratorConfig(
+        total_cdrs=5000,
+        seed=7,
+        subscriber_msisdn_start=79500000000,
+        subscriber_count=100,
+        durations=DurationDistribution(kind="lognormal", mean_s=200, sigma=1.2),
+    )
+    cdrs = list(generate_cdrs(config))
+    starts = np.array([cdr["callStart"] for cdr in cdrs])
+    ends = np.array([cdr["callEnd"] for cdr in cdrs])
+
+    expected = [calculate_billed_minutes(cdr["callStart"], cdr["callEnd"]) for cdr in cdrs]
+
+    assert calculate_billed_minutes_batch(starts, ends).tolist() == expected
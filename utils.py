@@ -1,6 +1,10 @@
 from datetime import datetime
 import math
 
+import numpy as np
+
+MICROSECONDS_PER_MINUTE = 60_000_000
+
 def calculate_billed_minutes(call_start_str: str, call_end_str: str) -> int:
     start_time = datetime.fromisoformat(call_start_str)
     end_time = datetime.fromisoformat(call_end_str)
@@ -8,3 +12,33 @@ def calculate_billed_minutes(call_start_str: str, call_end_str: str) -> int:
     duration_seconds = duration_timedelta.total_seconds()
     billed_minutes = math.ceil(duration_seconds / 60.0)
     return int(billed_minutes)
+
+
+def calculate_billed_minutes_batch(call_starts, call_ends) -> np.ndarray:
+    # Строки ISO разбираются один раз в datetime64; округление вверх до минуты в целых микросекундах
+    start_times = np.asarray(call_starts, dtype="datetime64[us]")
+    end_times = np.asarray(call_ends, dtype="datetime64[us]")
+    duration_us = (end_times - start_times).astype(np.int64)
+    return -(-duration_us // MICROSECONDS_PER_MINUTE)
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    # Линейная интерполяция между соседними рангами; sorted_values должен быть отсортирован
+    if not sorted_values:
+        return float("nan")
+    position = (len(sorted_values) - 1) * q / 100.0
+    lower = math.floor(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = position - lower
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction
+
+
+def summarize_latencies(latencies_s: list[float]) -> dict[str, float]:
+    values = sorted(latencies_s)
+    return {
+        "count": len(values),
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "max_ms": values[-1] * 1000 if values else float("nan"),
+    }